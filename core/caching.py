@@ -0,0 +1,135 @@
+"""
+Capa de caché compartida (cache-aside) para las vistas de ambas apps.
+
+El backend se elige por entorno en ``core/settings.py`` (``CACHE_BACKEND``:
+``file``, ``db``, ``redis`` o ``locmem``). Debe ser compartido por todos los
+procesos: con ``locmem`` cada uno tendría sus propias versiones y un
+``bump`` en uno no invalidaría los demás (``core/checks.py`` lo impide fuera
+de DEBUG). Sobre él:
+
+- **Etiquetas versionadas**: cada etiqueta (``product``, ``ingredient``,
+  ``order``, ``company``, ``menu``…) tiene una versión en caché. Las claves
+  que dependen de una etiqueta incluyen su versión, así que ``bump(tag)``
+  invalida todas a la vez sin recorrerlas; las copias viejas expiran solas.
+  ``orders/signals.py`` sube las versiones al guardar o eliminar modelos.
+- **Un solo cálculo por clave** (single-flight): ante un fallo, solo quien
+  obtiene el candado (``cache.add``) reconstruye el valor; el resto espera a
+  que aparezca en caché en vez de repetir la misma consulta en estampida.
+"""
+
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+TAG_PRODUCT = "product"
+TAG_CATEGORY = "category"
+TAG_DISPATCH_AREA = "dispatch_area"
+TAG_TABLE = "table"
+TAG_WAREHOUSE = "warehouse"
+TAG_INGREDIENT = "ingredient"
+TAG_ORDER = "order"
+TAG_COMPANY = "company"
+TAG_MENU = "menu"
+
+TAG_KEY = "tag:{tag}"
+LOCK_KEY = "lock:{key}"
+DEFAULT_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def versions(*tags):
+    """Devuelve ``{etiqueta: versión}`` creando las que falten."""
+    keys = {TAG_KEY.format(tag=tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        # Se relee en bloque: otro proceso pudo crearla primero.
+        found.update(cache.get_many(missing))
+    return {tag: found[key] for key, tag in keys.items()}
+
+
+def version(tag):
+    """Versión actual de una etiqueta."""
+    return versions(tag)[tag]
+
+
+def stamp(*tags):
+    """
+    Sello de cambios de las etiquetas, útil como ETag: cambia en cuanto se
+    sube la versión de cualquiera de ellas.
+    """
+    return ".".join(f"{tag}{v}" for tag, v in sorted(versions(*tags).items()))
+
+
+def last_modified(*tags):
+    """
+    Fecha del último cambio de las etiquetas (``Last-Modified``).
+
+    Las versiones son ``time.time_ns()`` del momento en que se subieron.
+    """
+    latest = max(int(v) for v in versions(*tags).values())
+    return datetime.fromtimestamp(latest / 1e9, tz=dt_timezone.utc)
+
+
+def _set_new_versions(tags):
+    cache.set_many({TAG_KEY.format(tag=tag): _new_version() for tag in tags}, None)
+
+
+def bump(*tags):
+    """
+    Invalida todo lo guardado bajo las etiquetas indicadas.
+
+    Dentro de una transacción se vuelve a subir al confirmarla: mientras el
+    cambio no era visible, otra petición pudo guardar filas viejas (o
+    responder 304) bajo la versión intermedia.
+    """
+    _set_new_versions(tags)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_new_versions(tags))
+
+
+def cached(key, build, timeout=DEFAULT_TIMEOUT, tags=()):
+    """
+    Devuelve el valor de ``key``; si no está, lo calcula con ``build()``.
+
+    Con ``tags`` la clave real incluye la versión de cada etiqueta. ``None``
+    también se guarda como valor válido.
+    """
+    if tags:
+        key = f"{key}@{stamp(*tags)}"
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock = LOCK_KEY.format(key=key)
+    if not cache.add(lock, 1, timeout=LOCK_TIMEOUT):
+        # Otro proceso está calculando el mismo valor: esperarlo.
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        # El otro cálculo tarda demasiado o murió: calcularlo aquí.
+        return build()
+
+    try:
+        value = build()
+        cache.set(key, value, timeout=timeout)
+    finally:
+        cache.delete(lock)
+    return value
@@ -0,0 +1,40 @@
+"""Verificaciones de ``manage.py check`` para la configuración del proyecto."""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+FILE_BACKEND = "django.core.cache.backends.filebased.FileBasedCache"
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fuera de DEBUG la caché debe ser compartida entre procesos: las versiones
+    de ``core.caching`` (ETags, menú, tickets, permisos) viven en ella. La de
+    archivos se comparte, pero su ``add()`` no es atómico: se advierte.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DEBUG or backend not in (LOCMEM_BACKEND, FILE_BACKEND):
+        return []
+    if backend == FILE_BACKEND:
+        return [
+            Warning(
+                "La caché de archivos no tiene un add() atómico entre procesos.",
+                hint=(
+                    "Con varios workers, caching.cached() puede repetir un "
+                    "cálculo; usa CACHE_BACKEND=db o redis en producción."
+                ),
+                id="core.W001",
+            )
+        ]
+    return [
+        Error(
+            "La caché locmem no se comparte entre procesos del servidor.",
+            hint=(
+                "Usa CACHE_BACKEND=file, db o redis; locmem solo sirve con "
+                "DJANGO_DEBUG=True."
+            ),
+            id="core.E001",
+        )
+    ]
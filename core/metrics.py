@@ -0,0 +1,239 @@
+"""
+Métricas en formato de exposición de Prometheus (``/metrics``).
+
+Los contadores e histogramas se actualizan en memoria en el momento de la
+escritura (crear una comanda, registrar un movimiento, atender una
+petición); exponerlos no consulta la base de datos. Para reunir a todos los
+procesos del servidor, cada uno publica una instantánea de sus valores en la
+caché compartida como mucho cada ``METRICS_FLUSH_INTERVAL`` segundos, y
+``render()`` suma las instantáneas vivas. Cada proceso se identifica por
+equipo y pid: con una caché compartida entre equipos o contenedores los pid
+se repiten. Con ``CACHE_BACKEND=locmem`` cada
+proceso solo ve las suyas.
+
+Los indicadores (``Gauge``) se calculan con una función al exponer; quien la
+define debe cachearla (por ejemplo con ``core.caching.cached`` y etiquetas)
+para que un scrape cada 15 s no cueste consultas mientras nada cambie.
+
+La instantánea de un proceso que termina se conserva
+``METRICS_PROCESS_TIMEOUT`` segundos; cuando expira, la suma baja y
+Prometheus lo trata como un reinicio del contador (``rate()`` lo tolera).
+"""
+
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+PROCESS_KEY = "metrics:process:{process}"
+PROCESSES_KEY = "metrics:processes"
+
+_lock = threading.Lock()
+_registry = {}
+_last_flush = 0.0
+
+
+def _label_key(names, labels):
+    return tuple(str(labels[name]) for name in names)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = settings.METRICS_PREFIX + name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        _registry[self.name] = self
+
+    def snapshot(self):
+        with _lock:
+            return {key: self._copy(value) for key, value in self.values.items()}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    """Valor que solo crece; por convención su nombre termina en ``_total``."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labels, labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        flush()
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def samples(self, key, value):
+        yield self.name, key, value
+
+
+class Histogram(Metric):
+    """
+    Distribución de observaciones en ``buckets`` (límites superiores).
+
+    Cada serie guarda la cuenta de cada bucket (más ``+Inf``) y la suma.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labels, labels)
+        with _lock:
+            counts = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+        flush()
+
+    def _copy(self, value):
+        return list(value)
+
+    def merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), value[:-1]):
+            cumulative += count
+            yield self.name + "_bucket", (*key, _format(bound)), cumulative
+        yield self.name + "_sum", key, value[-1]
+        yield self.name + "_count", key, cumulative
+
+
+class Gauge(Metric):
+    """
+    Valor instantáneo calculado al exponer con ``collect()``, que devuelve un
+    número o ``{(etiqueta, ...): número}``.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, collect, labels=()):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def current(self):
+        value = self.collect()
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self, key, value):
+        yield self.name, key, value
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _aggregable():
+    return [metric for metric in _registry.values() if metric.kind != "gauge"]
+
+
+def process_id():
+    """Identificador de este proceso entre todos los equipos: ``equipo:pid``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def flush(force=False):
+    """
+    Publica la instantánea de este proceso en la caché compartida si pasó
+    ``METRICS_FLUSH_INTERVAL`` desde la última vez.
+    """
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+
+    process = process_id()
+    timeout = settings.METRICS_PROCESS_TIMEOUT
+    cache.set(
+        PROCESS_KEY.format(process=process),
+        {metric.name: metric.snapshot() for metric in _aggregable()},
+        timeout=timeout,
+    )
+    processes = cache.get(PROCESSES_KEY) or set()
+    if process not in processes:
+        # Dos procesos que se registran a la vez pueden pisarse; el que se
+        # pierda vuelve a registrarse en su siguiente publicación.
+        cache.set(PROCESSES_KEY, processes | {process}, timeout=None)
+
+
+def collect_all():
+    """``{métrica: {etiquetas: valor}}`` sumando los procesos vivos."""
+    flush(force=True)
+    processes = cache.get(PROCESSES_KEY) or set()
+    snapshots = cache.get_many([PROCESS_KEY.format(process=p) for p in processes])
+    alive = {p for p in processes if PROCESS_KEY.format(process=p) in snapshots}
+    if alive != processes:
+        cache.set(PROCESSES_KEY, alive, timeout=None)
+
+    totals = {}
+    for metric in _aggregable():
+        series = totals.setdefault(metric.name, {})
+        for snapshot in snapshots.values():
+            for key, value in snapshot.get(metric.name, {}).items():
+                series[key] = metric.merge(series.get(key), value)
+    return totals
+
+
+def render():
+    """Texto de exposición de Prometheus (versión 0.0.4)."""
+    totals = collect_all()
+    lines = []
+    for metric in _registry.values():
+        series = metric.current() if metric.kind == "gauge" else totals[metric.name]
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        names = metric.labels + (("le",) if metric.kind == "histogram" else ())
+        for key, value in sorted(series.items()):
+            for sample, label_values, number in metric.samples(key, value):
+                label_names = names[: len(label_values)]
+                labels = ",".join(
+                    f'{name}="{_escape(label)}"'
+                    for name, label in zip(label_names, label_values)
+                )
+                lines.append(
+                    f"{sample}{{{labels}}} {_format(number)}"
+                    if labels
+                    else f"{sample} {_format(number)}"
+                )
+    return "\n".join(lines) + "\n"
+
+
+# ==========================
+# 🌐 PETICIONES
+# ==========================
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Tiempo de respuesta por vista.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    labels=("route",),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_queries",
+    "Consultas SQL por petición y vista.",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+    labels=("route",),
+)
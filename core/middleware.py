@@ -0,0 +1,137 @@
+"""
+Middleware del proyecto.
+
+``CompressionMiddleware`` comprime las respuestas JSON de las APIs según
+``Accept-Encoding``: brotli si el cliente lo acepta y el paquete ``brotli``
+está instalado, si no gzip. Se limita a JSON a propósito: las páginas HTML
+llevan el token CSRF y comprimirlas abre la puerta a ataques tipo BREACH.
+
+``ProfilingMiddleware`` mide tiempos y consultas de cada petición cuando
+``PROFILING_ENABLED`` está activo (ver ``core/profiling.py``).
+
+``MetricsMiddleware`` alimenta las métricas de peticiones de ``/metrics``
+(ver ``core/metrics.py``).
+
+``QueryCheckMiddleware`` busca consultas lentas y N+1 según ``QUERY_CHECK``
+(ver ``core/queries.py``).
+"""
+
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from core import metrics, profiling, queries
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+MIN_LENGTH = 200
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def _accepts(request, encoding):
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return re.search(rf"\b{encoding}\b(?!;q=0(\.0*)?\b)", header) is not None
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < MIN_LENGTH
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if brotli is not None and _accepts(request, "br"):
+            encoding, content = "br", brotli.compress(response.content, quality=4)
+        elif _accepts(request, "gzip"):
+            encoding, content = "gzip", compress_string(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # El cuerpo comprimido ya no es byte a byte el mismo: ETag débil.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Va primero en ``MIDDLEWARE`` para medir la petición completa y el tamaño
+    de la respuesta tal como sale (ya comprimida).
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        settings.PROFILING_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = profiling.QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        profiling.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+
+class QueryCheckMiddleware:
+    def __init__(self, get_response):
+        if settings.QUERY_CHECK not in (queries.MODE_LOG, queries.MODE_RAISE):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with queries.inspect_queries() as inspector:
+            response = self.get_response(request)
+        label = f"{request.method} {request.path}"
+        inspector.log(label)
+        if settings.QUERY_CHECK == queries.MODE_RAISE:
+            inspector.check(label)
+        return response
+
+
+class MetricsMiddleware:
+    """Tiempo de respuesta y número de consultas por vista."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        route = profiling.route_name(request)
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, route=route)
+        metrics.REQUEST_QUERIES.observe(queries, route=route)
+        return response
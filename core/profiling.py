@@ -0,0 +1,154 @@
+"""
+Perfilado de peticiones (opcional: ``PROFILING_ENABLED=1``).
+
+``core.middleware.ProfilingMiddleware`` mide cada petición: vista, tiempo
+total, número y tiempo de las consultas SQL (con
+``connection.execute_wrapper``), consultas repetidas y tamaño de la
+respuesta. Cada registro se guarda:
+
+- en un búfer circular en memoria (``PROFILING_BUFFER_SIZE`` registros por
+  proceso);
+- como una línea JSON en el logger ``core.profiling``, que en settings
+  escribe a un archivo rotativo (``PROFILING_LOG_FILE``).
+
+``summarize()`` agrupa los registros por nombre de URL (los alias ``_alt``
+cuentan con su ruta original) y calcula p50/p95/p99; la página de
+rendimiento lo muestra a los administradores.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SOURCE_MEMORY = "memory"
+SOURCE_LOG = "log"
+
+_buffer = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` que cuenta y cronometra las consultas de una petición."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        """Ejecuciones repetidas de la misma consulta con los mismos parámetros."""
+        return sum(times - 1 for times in self.statements.values() if times > 1)
+
+
+def route_name(request):
+    """Nombre de la URL resuelta; los alias en español cuentan como la original."""
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return "—"
+    return match.url_name.removesuffix("_alt")
+
+
+def record(request, response, duration, queries):
+    """Guarda la medición de una petición en el búfer y en el log."""
+    entry = {
+        "at": timezone.now().isoformat(timespec="seconds"),
+        "route": route_name(request),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "ms": round(duration * 1000, 2),
+        "queries": queries.count,
+        "query_ms": round(queries.duration * 1000, 2),
+        "duplicates": queries.duplicates,
+        "bytes": None if response.streaming else len(response.content),
+    }
+    with _lock:
+        _buffer.append(entry)
+    logger.info(json.dumps(entry, ensure_ascii=False))
+    return entry
+
+
+def recent():
+    """Copia de los registros del búfer de este proceso."""
+    with _lock:
+        return list(_buffer)
+
+
+def read_log(limit=None):
+    """
+    Registros del archivo de log actual (todos los procesos escriben ahí).
+
+    Las líneas dañadas, por ejemplo por una escritura cortada, se ignoran.
+    """
+    limit = limit or settings.PROFILING_BUFFER_SIZE
+    try:
+        with open(settings.PROFILING_LOG_FILE, encoding="utf-8") as log_file:
+            lines = deque(log_file, maxlen=limit)
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano de una lista no vacía."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(entries):
+    """
+    Estadísticas por ruta, de la más lenta (p95) a la más rápida.
+
+    Devuelve una lista de dicts con ``route``, ``count``, ``p50``, ``p95``,
+    ``p99``, ``max`` (ms), ``queries`` y ``query_ms`` promedio,
+    ``max_queries``, ``duplicates`` y ``bytes`` promedio.
+    """
+    by_route = defaultdict(list)
+    for entry in entries:
+        by_route[entry["route"]].append(entry)
+
+    rows = []
+    for route, group in by_route.items():
+        times = [entry["ms"] for entry in group]
+        sizes = [entry["bytes"] for entry in group if entry["bytes"] is not None]
+        rows.append(
+            {
+                "route": route,
+                "count": len(group),
+                "p50": percentile(times, 50),
+                "p95": percentile(times, 95),
+                "p99": percentile(times, 99),
+                "max": max(times),
+                "queries": sum(entry["queries"] for entry in group) / len(group),
+                "max_queries": max(entry["queries"] for entry in group),
+                "query_ms": sum(entry["query_ms"] for entry in group) / len(group),
+                "duplicates": sum(entry["duplicates"] for entry in group),
+                "bytes": sum(sizes) / len(sizes) if sizes else None,
+            }
+        )
+    rows.sort(key=lambda row: row["p95"], reverse=True)
+    return rows
@@ -0,0 +1,173 @@
+"""
+Detector de consultas lentas y N+1 (desarrollo, staging y pruebas).
+
+Cada consulta se reduce a su forma (``fingerprint``): sin literales y con
+las listas ``IN (...)`` colapsadas, así que ``SELECT ... WHERE id = 3`` y
+``... WHERE id = 7`` cuentan como la misma. Si una forma se repite
+``QUERY_CHECK_THRESHOLD`` veces o más en una petición, casi seguro es un
+N+1: una consulta por fila dentro de un ciclo o de una plantilla.
+
+De cada forma repetida se guarda dónde se repitió: los marcos de código del
+proyecto (por ejemplo ``orders/views.py:80 en table_orders``) desde la vista
+hasta la línea que disparó la consulta.
+
+Modos (``QUERY_CHECK``):
+
+- ``off``: no se instala ``QueryCheckMiddleware`` (por defecto).
+- ``log``: los N+1 y las consultas más lentas que ``SLOW_QUERY_MS`` se
+  registran en el logger ``core.queries``.
+- ``raise``: además la petición falla con ``NPlusOneError``. Con el cliente
+  de pruebas de Django la excepción llega al test, así que un N+1 nuevo
+  rompe la CI.
+
+Para un bloque concreto (por ejemplo en un test)::
+
+    with assert_no_n_plus_one():
+        client.get("/pos/")
+"""
+
+import logging
+import re
+import sys
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_LOG = "log"
+MODE_RAISE = "raise"
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+# Marcos que no dicen nada sobre el origen: el propio detector y el resto
+# del paquete core (middleware, caché).
+_SKIPPED_DIRS = (Path(__file__).resolve().parent,)
+
+
+class NPlusOneError(AssertionError):
+    """Una forma de consulta se repitió más veces que el umbral."""
+
+
+def fingerprint(sql):
+    """Forma normalizada de una consulta: sin literales ni listas ``IN``."""
+    sql = _LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _is_project_file(filename):
+    if filename.startswith("<"):
+        return False
+    path = Path(filename).resolve()
+    if "site-packages" in path.parts or not path.is_relative_to(settings.BASE_DIR):
+        return False
+    return not any(path.is_relative_to(skipped) for skipped in _SKIPPED_DIRS)
+
+
+def origin(max_frames=4):
+    """
+    Marcos del proyecto de la pila actual, de afuera hacia adentro:
+    ``orders/views.py:80 en table_orders → orders/models.py:310 en save``.
+    Si son muchos se conservan el primero (la vista) y los más internos.
+    """
+    frames = [
+        f"{Path(frame.f_code.co_filename).resolve().relative_to(settings.BASE_DIR)}"
+        f":{lineno} en {frame.f_code.co_name}"
+        for frame, lineno in traceback.walk_stack(sys._getframe(1))
+        if _is_project_file(frame.f_code.co_filename)
+    ]
+    frames.reverse()
+    if len(frames) > max_frames:
+        frames = [frames[0], "…", *frames[-(max_frames - 1) :]]
+    return " → ".join(frames) or "—"
+
+
+class QueryInspector:
+    """
+    ``execute_wrapper`` que agrupa las consultas por forma y guarda las
+    lentas.
+    """
+
+    def __init__(self, threshold=None, slow_ms=None):
+        self.threshold = threshold or settings.QUERY_CHECK_THRESHOLD
+        self.slow_ms = settings.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        self.shapes = Counter()
+        self.origins = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            shape = fingerprint(sql)
+            self.shapes[shape] += 1
+            # El origen se toma en la primera repetición: la primera vez suele
+            # ser una consulta legítima (por ejemplo el usuario de la sesión
+            # en AuthenticationMiddleware) y no el ciclo que la repite.
+            if self.shapes[shape] == 2:
+                self.origins[shape] = origin()
+            if duration >= self.slow_ms:
+                self.slow.append(
+                    {"sql": sql, "ms": round(duration, 2), "origin": origin()}
+                )
+
+    @property
+    def repeated(self):
+        """Formas que alcanzan el umbral, de la más repetida a la menos."""
+        return [
+            {"sql": shape, "count": count, "origin": self.origins.get(shape, "—")}
+            for shape, count in self.shapes.most_common()
+            if count >= self.threshold
+        ]
+
+    def report(self, label=""):
+        """Texto con los N+1 detectados, uno por forma."""
+        lines = [f"Consultas repetidas {label}".rstrip() + ":"]
+        for query in self.repeated:
+            lines.append(f"  {query['count']}× {query['sql']}")
+            lines.append(f"     desde {query['origin']}")
+        return "\n".join(lines)
+
+    def log(self, label=""):
+        for query in self.slow:
+            logger.warning(
+                "Consulta lenta %s (%.1f ms): %s\n     desde %s",
+                label,
+                query["ms"],
+                query["sql"],
+                query["origin"],
+            )
+        if self.repeated:
+            logger.warning(self.report(label))
+
+    def check(self, label=""):
+        """Lanza ``NPlusOneError`` si alguna forma alcanzó el umbral."""
+        if self.repeated:
+            raise NPlusOneError(self.report(label))
+
+
+@contextmanager
+def inspect_queries(threshold=None, slow_ms=None):
+    """Inspecciona las consultas del bloque; entrega el ``QueryInspector``."""
+    inspector = QueryInspector(threshold, slow_ms)
+    with connection.execute_wrapper(inspector):
+        yield inspector
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None):
+    """Falla con ``NPlusOneError`` si el bloque ejecuta consultas N+1."""
+    with inspect_queries(threshold) as inspector:
+        yield inspector
+    inspector.check()
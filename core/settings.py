@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -51,8 +52,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.QueryCheckMiddleware",
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -138,6 +143,124 @@ LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/users/login/"
 
 
+# Caché compartida (ver core/caching.py). Las versiones de las etiquetas
+# viven en la caché, así que todos los procesos del servidor deben verla:
+# CACHE_BACKEND file (por defecto, varios procesos en un mismo equipo), db
+# (varios equipos; requiere manage.py createcachetable) o redis
+# (CACHE_LOCATION=redis://127.0.0.1:6379/0, requiere el paquete redis).
+# locmem es solo para un proceso; con DEBUG desactivado, check lo rechaza.
+# El add() de file no es atómico entre procesos: el candado de un solo
+# cálculo de caching.cached() puede tomarse dos veces y repetir la consulta
+# (nunca da datos incorrectos). Con varios workers en producción usa db o
+# redis; check lo advierte.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "file")
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND={CACHE_BACKEND!r} no es válido; usa uno de: "
+        f"{', '.join(CACHE_BACKENDS)}."
+    )
+CACHE_LOCATIONS = {
+    "locmem": "boa-pos",
+    "file": str(BASE_DIR / ".cache"),
+    "db": "boa_cache",
+    "redis": "redis://127.0.0.1:6379/0",
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_LOCATIONS[CACHE_BACKEND]),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 60 * 60)),
+        "KEY_PREFIX": os.environ.get("CACHE_KEY_PREFIX", "boa"),
+    }
+}
+
+
+# Vigencia (segundos) de los tokens de idempotencia de comandas
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 60 * 60 * 24))
+
+# Versión del service worker del POS; cambiarla invalida su caché offline
+SERVICE_WORKER_VERSION = os.environ.get("SERVICE_WORKER_VERSION", "1")
+
+# Impresión directa ESC/POS (ver orders/printing.py). La impresora general
+# recibe los productos sin área de despacho; vacía, no se imprimen.
+PRINTER_DEFAULT_HOST = os.environ.get("PRINTER_DEFAULT_HOST", "")
+PRINTER_DEFAULT_PORT = int(os.environ.get("PRINTER_DEFAULT_PORT", 9100))
+PRINTER_LINE_WIDTH = int(os.environ.get("PRINTER_LINE_WIDTH", 42))
+PRINTER_TIMEOUT = float(os.environ.get("PRINTER_TIMEOUT", 5))
+PRINT_JOB_MAX_ATTEMPTS = int(os.environ.get("PRINT_JOB_MAX_ATTEMPTS", 5))
+
+# Exportaciones en segundo plano (ver orders/jobs.py). Una solicitud con los
+# mismos parámetros dentro de REPORT_JOB_REUSE_SECONDS reutiliza el archivo;
+# los archivos se borran pasadas REPORT_JOB_RETENTION_HOURS. Un trabajo que
+# lleva más de REPORT_JOB_TIMEOUT segundos generándose se da por abandonado.
+REPORT_JOB_REUSE_SECONDS = int(os.environ.get("REPORT_JOB_REUSE_SECONDS", 300))
+REPORT_JOB_RETENTION_HOURS = int(os.environ.get("REPORT_JOB_RETENTION_HOURS", 24))
+REPORT_JOB_TIMEOUT = int(os.environ.get("REPORT_JOB_TIMEOUT", 60 * 30))
+# El reporte de ventas por producto se calcula en la petición salvo con
+# ?background=1 o para rangos de más de SALES_REPORT_INLINE_DAYS días.
+SALES_REPORT_INLINE_DAYS = int(os.environ.get("SALES_REPORT_INLINE_DAYS", 31))
+
+# Perfilado de peticiones (ver core/profiling.py). Desactivado por defecto;
+# con PROFILING_ENABLED=1 cada petición se mide y se escribe como JSON en un
+# log rotativo, además de un búfer en memoria por proceso.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+PROFILING_BUFFER_SIZE = int(os.environ.get("PROFILING_BUFFER_SIZE", 5000))
+PROFILING_LOG_FILE = Path(
+    os.environ.get("PROFILING_LOG_FILE", BASE_DIR / "logs" / "profiling.jsonl")
+)
+
+# Detector de consultas lentas y N+1 (ver core/queries.py): off, log o raise.
+QUERY_CHECK = os.environ.get("QUERY_CHECK", "off")
+QUERY_CHECK_THRESHOLD = int(os.environ.get("QUERY_CHECK_THRESHOLD", 5))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Métricas de Prometheus en /metrics (ver core/metrics.py). Sin METRICS_TOKEN
+# solo las ve un administrador con sesión; Prometheus debe usar el token.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_PREFIX = os.environ.get("METRICS_PREFIX", "pos_")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+METRICS_PROCESS_TIMEOUT = int(os.environ.get("METRICS_PROCESS_TIMEOUT", 60 * 60 * 24))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "raw": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "profiling": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": PROFILING_LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+            "formatter": "raw",
+        },
+    },
+    "loggers": {
+        "core.profiling": {
+            "handlers": ["profiling"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "core.queries": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
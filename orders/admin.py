@@ -1,8 +1,10 @@
 from django.contrib import admin
 
+from . import printing
 from .models import (Company, DispatchArea, Ingredient, IngredientMovement,
-                     Order, OrderItem, Product, ProductCategory,
-                     ProductIngredient, Table, Warehouse)
+                     Order, OrderEvent, OrderItem, Payment, PrintJob, Product,
+                     ProductCategory, ProductIngredient, ReportJob, Shift,
+                     Table, Warehouse)
 
 
 @admin.register(Table)
@@ -19,7 +21,7 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(DispatchArea)
 class DispatchAreaAdmin(admin.ModelAdmin):
-    list_display = ("name",)
+    list_display = ("name", "printer_host", "printer_port")
     search_fields = ("name",)
 
 
@@ -59,8 +61,9 @@ class ProductIngredientAdmin(admin.ModelAdmin):
 
 @admin.register(IngredientMovement)
 class IngredientMovementAdmin(admin.ModelAdmin):
-    list_display = ("ingredient", "quantity", "reason", "user", "created_at")
-    list_filter = ("ingredient", "user", "created_at")
+    list_display = ("ingredient", "quantity", "kind", "reason", "user", "created_at")
+    list_filter = ("kind", "ingredient", "user", "created_at")
+    raw_id_fields = ("order", "order_item")
     search_fields = ("ingredient__name", "reason", "user__username")
     ordering = ("-created_at",)
     readonly_fields = ("created_at",)
@@ -102,6 +105,115 @@ class OrderItemAdmin(admin.ModelAdmin):
     get_total_display.short_description = "Subtotal"
 
 
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    """Historial de solo lectura: los eventos no se editan ni se borran."""
+
+    list_display = (
+        "id",
+        "order",
+        "kind",
+        "table",
+        "product",
+        "quantity",
+        "amount",
+        "user",
+        "created_at",
+    )
+    list_filter = ("kind", "created_at")
+    search_fields = ("order__id",)
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "table",
+        "tender",
+        "amount",
+        "tip",
+        "change",
+        "user",
+        "created_at",
+    )
+    list_filter = ("tender", "created_at")
+    search_fields = ("reference", "table__name")
+    raw_id_fields = ("shift",)
+    date_hierarchy = "created_at"
+
+
+@admin.register(Shift)
+class ShiftAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "opened_at",
+        "closed_at",
+        "payment_count",
+        "opening_cash",
+        "counted_cash",
+    )
+    list_filter = ("user", "opened_at")
+    date_hierarchy = "opened_at"
+
+
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "order",
+        "dispatch_area",
+        "status",
+        "attempts",
+        "created_at",
+        "printed_at",
+    )
+    list_filter = ("status", "dispatch_area")
+    raw_id_fields = ("order",)
+    readonly_fields = ("payload", "attempts", "last_error", "printed_at")
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Reintentar impresión")
+    def retry_jobs(self, request, queryset):
+        count = printing.retry(queryset)
+        self.message_user(request, f"✅ {count} trabajos devueltos a la cola.")
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "status",
+        "progress",
+        "rows",
+        "user",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status", "kind")
+    readonly_fields = (
+        "params",
+        "params_hash",
+        "progress",
+        "rows",
+        "result",
+        "error",
+        "started_at",
+        "finished_at",
+    )
+
+
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ("name", "ruc", "phone", "email")
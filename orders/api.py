@@ -0,0 +1,151 @@
+"""
+Serialización de las APIs JSON (Grid.js).
+
+Las vistas entregan filas como tuplas (``values_list``) y nombres de
+columna; ``respond()`` arma la respuesta en uno de dos formatos:
+
+- registros (por defecto, compatible con Grid.js)::
+
+      [{"id": 1, "name": "Arroz"}, ...]
+
+- columnar (``?format=columnar``): los nombres van una sola vez::
+
+      {"columns": ["id", "name"], "rows": [[1, "Arroz"], ...]}
+
+El JSON se codifica compacto y en UTF-8; si ``orjson`` está instalado se usa
+ese codificador. Los ``Decimal`` se envían como texto (``"12.50"``). La compresión gzip/brotli la negocia
+``core.middleware.CompressionMiddleware``.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import IngredientMovement, Order
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+FORMAT_RECORDS = "records"
+FORMAT_COLUMNAR = "columnar"
+
+
+def _default(value):
+    # Los montos y cantidades van como texto exacto ("12.50"): un float
+    # binario no representa todos los decimales.
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable a JSON")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def dumps(data):
+    """Codifica ``data`` como JSON compacto (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return _encoder.encode(data).encode()
+
+
+def serialize(columns, rows, fmt=FORMAT_RECORDS):
+    """Arma el cuerpo en el formato pedido a partir de columnas y tuplas."""
+    if fmt == FORMAT_COLUMNAR:
+        return dumps({"columns": list(columns), "rows": list(rows)})
+    return dumps([dict(zip(columns, row)) for row in rows])
+
+
+def respond(request, columns, rows):
+    """Respuesta JSON en el formato que pide ``?format=`` (registros por defecto)."""
+    fmt = request.GET.get("format", FORMAT_RECORDS)
+    return HttpResponse(serialize(columns, rows, fmt), content_type="application/json")
+
+
+def local_datetime(value, formatter="%Y-%m-%d %H:%M:%S"):
+    """Fecha y hora local como texto, o ``None``."""
+    return timezone.localtime(value).strftime(formatter) if value else None
+
+
+# ==========================
+# 📋 FILAS DE LAS APIS
+# ==========================
+
+CENT = Decimal("0.01")
+ORDER_COLUMNS = ("id", "table", "user", "created_at", "status", "total")
+MOVEMENT_COLUMNS = (
+    "id",
+    "ingredient",
+    "quantity",
+    "kind",
+    "order",
+    "reason",
+    "user",
+    "created_at",
+)
+
+
+def order_rows():
+    """Filas de ``api_orders``; el total se agrega en la misma consulta."""
+    orders = (
+        Order.objects.order_by("-created_at")
+        .annotate(total=Sum(F("orderitem__quantity") * F("orderitem__product__price")))
+        .values_list(
+            "id",
+            "table__name",
+            "user__username",
+            "created_at",
+            "is_void",
+            "is_paid",
+            "total",
+        )
+    )
+    return (
+        (
+            pk,
+            table,
+            user,
+            local_datetime(created_at),
+            "Anulada" if is_void else "Pagada" if is_paid else "Pendiente",
+            # SQLite no redondea los agregados decimales: "200" -> "200.00".
+            (total or Decimal(0)).quantize(CENT),
+        )
+        for pk, table, user, created_at, is_void, is_paid, total in orders
+    )
+
+
+def movement_rows():
+    """Filas de ``api_movements``."""
+    kinds = dict(IngredientMovement.KINDS)
+    movements = IngredientMovement.objects.order_by("-created_at").values_list(
+        "id",
+        "ingredient__name",
+        "quantity",
+        "kind",
+        "order_id",
+        "reason",
+        "user__username",
+        "created_at",
+    )
+    return (
+        (
+            pk,
+            ingredient,
+            quantity,
+            kinds.get(kind, kind),
+            order_id,
+            reason or "",
+            user,
+            local_datetime(created_at),
+        )
+        for pk, ingredient, quantity, kind, order_id, reason, user, created_at in (
+            movements
+        )
+    )
@@ -0,0 +1,45 @@
+"""
+Rangos de fechas para reportes y exportaciones.
+
+Todos los rangos son conscientes de zona horaria (``TIME_ZONE``, es decir
+``America/Managua``) y semiabiertos: ``[inicio, fin)``. Se filtran con
+``created_at__gte=inicio, created_at__lt=fin`` para que la base de datos use
+el índice de ``created_at``; ``created_at__date=`` envuelve la columna en una
+función y obliga a recorrer toda la tabla.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+INPUT_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def day_range(day):
+    """Devuelve ``(inicio, fin)`` del día local ``day``: de medianoche a medianoche."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def days_ago_range(days_ago):
+    """Rango del día local que fue hace ``days_ago`` días."""
+    return day_range(timezone.localdate() - timedelta(days=days_ago))
+
+
+def parse_range(start_str, end_str):
+    """
+    Convierte dos valores de ``<input type="datetime-local">`` en un rango
+    consciente. Si falta alguno o no es válido se usa el día de hoy.
+    """
+    try:
+        start = timezone.make_aware(datetime.strptime(start_str, INPUT_FORMAT))
+        end = timezone.make_aware(datetime.strptime(end_str, INPUT_FORMAT))
+    except (TypeError, ValueError):
+        return days_ago_range(0)
+    return start, end
+
+
+def in_range(field, start, end):
+    """Filtro ``{campo__gte: inicio, campo__lt: fin}`` para ``filter(**...)``."""
+    return {f"{field}__gte": start, f"{field}__lt": end}
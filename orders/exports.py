@@ -0,0 +1,403 @@
+"""
+Exportaciones CSV de los reportes por rango de fechas.
+
+Cada exportación de ``EXPORTS`` indica su título, el prefijo del archivo,
+los filtros de ``GET`` que acepta, el permiso que exige y una función
+``build(start, end, params)`` que devuelve ``(encabezado, filas, convertir)``:
+``filas`` es un queryset (se recorre con ``iterator()`` para no cargarlo
+entero) o una lista, y ``convertir`` pasa cada fila a sus celdas.
+
+Las vistas ``export_*_csv`` escriben el CSV directamente en la respuesta;
+con ``?background=1`` lo encolan como ``ReportJob`` y el comando
+``run_worker`` lo genera en ``MEDIA_ROOT`` (ver ``orders/jobs.py``).
+
+Las entradas con ``"format": "json"`` son páginas de reporte que el worker
+calcula para rangos grandes: su ``build`` devuelve el contexto de la página,
+que se guarda como JSON (montos como texto exacto) y la vista vuelve a leer.
+"""
+
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from users.utils import (
+    user_can_view_inventory,
+    user_can_view_reports,
+    user_can_view_sales_report,
+)
+
+from . import dates
+from . import search as text_search
+from .models import (
+    Ingredient,
+    IngredientMovement,
+    OrderItem,
+    ProductIngredient,
+    ReportJob,
+)
+
+CHUNK_SIZE = 2000
+PROGRESS_EVERY = 1000
+# Campos de los reportes JSON que son montos; se leen de vuelta como Decimal.
+DECIMAL_KEYS = {"price", "total_sales", "area_total_sales"}
+
+
+# ==========================
+# 🔎 CONSULTAS
+# ==========================
+
+
+def filter_movements(start, end, kind=None, search=None):
+    """
+    Movimientos del rango filtrados por tipo y búsqueda.
+
+    Una búsqueda como ``#123`` o ``123`` filtra por comanda usando la llave
+    foránea; el resto de búsquedas usan el índice de texto completo.
+    Devuelve ``(movimientos, búsqueda, tipo)``; un tipo inválido se ignora.
+    """
+    moves = IngredientMovement.objects.filter(
+        **dates.in_range("created_at", start, end)
+    ).select_related("ingredient", "user")
+
+    if kind in dict(IngredientMovement.KINDS):
+        moves = moves.filter(kind=kind)
+    else:
+        kind = None
+
+    if search:
+        order_number = search.strip().lstrip("#")
+        movement_ids = text_search.matching_ids(text_search.KIND_MOVEMENT, search)
+        if order_number.isdigit():
+            moves = moves.filter(order_id=int(order_number))
+        elif movement_ids is not None:
+            ingredient_ids = text_search.matching_ids(
+                text_search.KIND_INGREDIENT, search
+            )
+            moves = moves.filter(
+                Q(id__in=movement_ids) | Q(ingredient_id__in=ingredient_ids)
+            )
+        else:
+            moves = moves.filter(
+                Q(reason__icontains=search) | Q(ingredient__name__icontains=search)
+            )
+    return moves, search, kind
+
+
+def sales_by_product(start, end):
+    """Unidades y monto vendidos por producto en comandas pagadas del rango."""
+    return (
+        OrderItem.objects.filter(
+            order__is_paid=True, **dates.in_range("order__created_at", start, end)
+        )
+        .values("product__name", "product__dispatch_area__name")
+        .annotate(
+            total_qty=Sum("quantity"),
+            total_sales=Sum(F("quantity") * F("product__price")),
+            price=F("product__price"),
+        )
+        .order_by("product__dispatch_area__name", "product__name")
+    )
+
+
+def sales_by_dispatch_area(start, end):
+    """Unidades y monto vendidos por área de despacho en comandas pagadas."""
+    return (
+        OrderItem.objects.filter(
+            order__is_paid=True, **dates.in_range("order__created_at", start, end)
+        )
+        .values("product__dispatch_area__name")
+        .annotate(
+            area_total_qty=Sum("quantity"),
+            area_total_sales=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by("product__dispatch_area__name")
+    )
+
+
+def compute_ingredient_variance(start, end):
+    """
+    Compara el uso teórico (ventas × recetas) contra el uso real de cada
+    ingrediente en el rango.
+
+    El uso real se obtiene del conteo inicial y final más las compras:
+    ``inicial + compras - final``. Todos los saldos salen de una sola
+    agregación sobre los movimientos agrupados por tipo.
+    """
+    in_range = Q(**dates.in_range("ingredientmovement__created_at", start, end))
+    ingredients = Ingredient.objects.annotate(
+        period_net=Sum("ingredientmovement__quantity", filter=in_range, default=0),
+        purchases=Sum(
+            "ingredientmovement__quantity",
+            filter=in_range
+            & Q(ingredientmovement__kind=IngredientMovement.KIND_PURCHASE),
+            default=0,
+        ),
+        after_end=Sum(
+            "ingredientmovement__quantity",
+            filter=Q(ingredientmovement__created_at__gte=end),
+            default=0,
+        ),
+    ).order_by("name")
+
+    theoretical = dict(
+        ProductIngredient.objects.filter(
+            **dates.in_range("product__orderitem__order__created_at", start, end)
+        )
+        .values("ingredient")
+        .annotate(total=Sum(F("quantity") * F("product__orderitem__quantity")))
+        .values_list("ingredient", "total")
+    )
+
+    rows = []
+    for ing in ingredients:
+        closing = ing.stock_quantity - ing.after_end
+        opening = closing - ing.period_net
+        actual = ing.purchases - ing.period_net
+        expected = theoretical.get(ing.id) or Decimal("0")
+        if not (opening or closing or actual or expected):
+            continue
+        variance = actual - expected
+        rows.append(
+            {
+                "ingredient": ing,
+                "opening": opening,
+                "purchases": ing.purchases,
+                "closing": closing,
+                "actual": actual,
+                "theoretical": expected,
+                "variance": variance,
+                "variance_pct": (variance / expected * 100) if expected else None,
+            }
+        )
+    return rows
+
+
+# ==========================
+# 📄 EXPORTACIONES
+# ==========================
+
+
+def _orders(start, end, params):
+    items = (
+        OrderItem.objects.filter(**dates.in_range("order__created_at", start, end))
+        .select_related("order", "product", "order__table", "order__user")
+        .order_by("id")
+    )
+    if params.get("table"):
+        items = items.filter(order__table=params["table"])
+    header = [
+        "Fecha",
+        "Comanda",
+        "Servicio",
+        "Mesa",
+        "Cantidad",
+        "Producto",
+        "Precio",
+        "Total",
+    ]
+    return (
+        header,
+        items,
+        lambda i: [
+            timezone.localtime(i.order.created_at).strftime("%Y-%m-%d %H:%M"),
+            i.order.id,
+            i.order.user.username if i.order.user else "—",
+            i.order.table.name if i.order.table else "—",
+            i.quantity,
+            i.product.name,
+            i.product.price,
+            i.get_total(),
+        ],
+    )
+
+
+def _movements(start, end, params):
+    moves, _, _ = filter_movements(start, end, params.get("kind"), params.get("search"))
+    header = ["Fecha", "Cantidad", "Ingrediente", "Tipo", "Comanda", "Razón", "Usuario"]
+    return (
+        header,
+        moves.order_by("id"),
+        lambda m: [
+            timezone.localtime(m.created_at).strftime("%Y-%m-%d %H:%M"),
+            m.quantity,
+            m.ingredient.name,
+            m.get_kind_display(),
+            m.order_id or "—",
+            m.reason or "—",
+            m.user.username if m.user else "—",
+        ],
+    )
+
+
+def _sales_by_product(start, end, params):
+    header = ["Producto", "Precio Unitario", "Cantidad", "Total"]
+    return (
+        header,
+        sales_by_product(start, end),
+        lambda i: [
+            i["product__name"],
+            i["price"],
+            i["total_qty"],
+            i["total_sales"],
+        ],
+    )
+
+
+def _variance(start, end, params):
+    header = [
+        "Ingrediente",
+        "Unidad",
+        "Inicial",
+        "Compras",
+        "Final",
+        "Uso real",
+        "Uso teórico",
+        "Variación",
+    ]
+    return (
+        header,
+        compute_ingredient_variance(start, end),
+        lambda r: [
+            r["ingredient"].name,
+            r["ingredient"].unit,
+            r["opening"],
+            r["purchases"],
+            r["closing"],
+            r["actual"],
+            r["theoretical"],
+            r["variance"],
+        ],
+    )
+
+
+def sales_report(start, end, params=None):
+    """Contexto del reporte de ventas por producto: detalle, áreas y total."""
+    items = list(sales_by_product(start, end))
+    return {
+        "items": items,
+        "totals_by_dispatch_area": list(sales_by_dispatch_area(start, end)),
+        "total_sales": sum((i["total_sales"] or 0) for i in items),
+    }
+
+
+EXPORTS = {
+    ReportJob.KIND_ORDERS: {
+        "prefix": "comandas",
+        "filters": ("table",),
+        "allowed": user_can_view_reports,
+        "build": _orders,
+    },
+    ReportJob.KIND_MOVEMENTS: {
+        "prefix": "movimientos",
+        "filters": ("kind", "search"),
+        "allowed": user_can_view_inventory,
+        "build": _movements,
+    },
+    ReportJob.KIND_SALES_BY_PRODUCT: {
+        "prefix": "ventas_por_producto",
+        "filters": (),
+        "allowed": user_can_view_sales_report,
+        "build": _sales_by_product,
+    },
+    ReportJob.KIND_VARIANCE: {
+        "prefix": "variacion",
+        "filters": (),
+        "allowed": user_can_view_inventory,
+        "build": _variance,
+    },
+    ReportJob.KIND_SALES_REPORT: {
+        "prefix": "reporte_ventas",
+        "filters": (),
+        "allowed": user_can_view_sales_report,
+        "format": "json",
+        "view": "sales_report_by_product",
+        "build": sales_report,
+    },
+}
+
+
+def request_params(kind, request):
+    """Parámetros de la exportación tomados de ``GET`` (rango y filtros)."""
+    start, end = dates.parse_range(request.GET.get("start"), request.GET.get("end"))
+    params = {"start": start.isoformat(), "end": end.isoformat()}
+    for name in EXPORTS[kind]["filters"]:
+        params[name] = request.GET.get(name) or ""
+    return params
+
+
+def file_format(kind):
+    return EXPORTS[kind].get("format", "csv")
+
+
+def filename(kind):
+    prefix = EXPORTS[kind]["prefix"]
+    return f"{prefix}_{timezone.localtime():%Y%m%d_%H%M}.{file_format(kind)}"
+
+
+def allowed(kind, user):
+    return kind in EXPORTS and EXPORTS[kind]["allowed"](user)
+
+
+def params_range(params):
+    """El rango ``(inicio, fin)`` guardado en los parámetros de la exportación."""
+    return (
+        datetime.fromisoformat(params["start"]),
+        datetime.fromisoformat(params["end"]),
+    )
+
+
+def write(file, kind, params, progress=None):
+    """Escribe la exportación en su formato (CSV o JSON); ver ``write_csv``."""
+    writer = write_json if file_format(kind) == "json" else write_csv
+    return writer(file, kind, params, progress)
+
+
+def write_csv(file, kind, params, progress=None):
+    """
+    Escribe la exportación en ``file`` y devuelve las filas escritas.
+
+    ``progress(escritas, total)`` se llama cada ``PROGRESS_EVERY`` filas; solo
+    entonces se cuenta el total con una consulta aparte.
+    """
+    start, end = params_range(params)
+    header, source, convert = EXPORTS[kind]["build"](start, end, params)
+
+    if isinstance(source, list):
+        total, rows = len(source), source
+    else:
+        total = source.count() if progress else None
+        rows = source.iterator(chunk_size=CHUNK_SIZE)
+
+    writer = csv.writer(file)
+    writer.writerow(header)
+    written = 0
+    for written, row in enumerate(rows, 1):
+        writer.writerow(convert(row))
+        if progress and written % PROGRESS_EVERY == 0:
+            progress(written, total)
+    return written
+
+
+def write_json(file, kind, params, progress=None):
+    """Escribe el reporte en ``file`` como JSON y devuelve sus filas (``items``)."""
+    start, end = params_range(params)
+    report = EXPORTS[kind]["build"](start, end, params)
+    json.dump(report, file, cls=DjangoJSONEncoder)
+    return len(report["items"])
+
+
+def _decimals(record):
+    for key in DECIMAL_KEYS & record.keys():
+        if record[key] is not None:
+            record[key] = Decimal(record[key])
+    return record
+
+
+def read_json(file):
+    """Lee un reporte de ``write_json``; los montos vuelven a ``Decimal``."""
+    return json.load(file, object_hook=_decimals)
@@ -0,0 +1,143 @@
+"""
+Cola de exportaciones en segundo plano.
+
+Los CSV grandes (``export_*_csv`` con rangos largos) pueden tardar más que
+el tiempo de espera del proxy. Con ``?background=1`` la vista crea un
+``ReportJob`` y redirige a su página de estado; el comando ``run_worker``
+toma los trabajos de la base de datos, escribe el archivo en
+``MEDIA_ROOT/reports/`` e informa el avance. El reporte de ventas por
+producto también puede generarse así (como JSON) y su página lo muestra
+al terminar.
+
+Los resultados se reutilizan por parámetros: si hay un trabajo igual en
+cola, generándose, o terminado hace menos de ``REPORT_JOB_REUSE_SECONDS``,
+se devuelve ese en lugar de crear otro.
+"""
+
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from . import exports
+from .models import ReportJob
+
+
+def params_hash(kind, params):
+    raw = json.dumps([kind, params], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def enqueue(kind, params, user):
+    """
+    Devuelve ``(trabajo, creado)``: uno reutilizable con los mismos
+    parámetros o uno nuevo en cola.
+    """
+    digest = params_hash(kind, params)
+    fresh = timezone.now() - timedelta(seconds=settings.REPORT_JOB_REUSE_SECONDS)
+    existing = (
+        ReportJob.objects.filter(kind=kind, params_hash=digest)
+        .filter(
+            Q(status__in=[ReportJob.STATUS_PENDING, ReportJob.STATUS_RUNNING])
+            | Q(status=ReportJob.STATUS_DONE, finished_at__gte=fresh)
+        )
+        .order_by("-created_at")
+        .first()
+    )
+    if existing:
+        return existing, False
+    job = ReportJob.objects.create(
+        kind=kind, params=params, params_hash=digest, user=user
+    )
+    return job, True
+
+
+def claim():
+    """
+    Reclama el trabajo más antiguo listo para generar, o ``None``.
+
+    Igual que la cola de impresión, el reclamo es un ``UPDATE`` condicionado
+    al estado leído; un trabajo ``running`` cuyo worker murió se vuelve a
+    tomar pasado ``REPORT_JOB_TIMEOUT``.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    candidates = (
+        ReportJob.objects.filter(
+            Q(status=ReportJob.STATUS_PENDING)
+            | Q(status=ReportJob.STATUS_RUNNING, started_at__lt=stale)
+        )
+        .order_by("created_at", "id")
+        .values_list("id", "status", "started_at")[:10]
+    )
+    for job_id, status, started_at in candidates:
+        if ReportJob.objects.filter(
+            id=job_id, status=status, started_at=started_at
+        ).update(status=ReportJob.STATUS_RUNNING, started_at=now, progress=0):
+            return ReportJob.objects.get(id=job_id)
+    return None
+
+
+def run(job):
+    """Genera el archivo del trabajo. Devuelve ``True`` si terminó bien."""
+
+    def progress(written, total):
+        ReportJob.objects.filter(id=job.id).update(
+            rows=written, progress=min(written * 100 // total, 99) if total else 0
+        )
+
+    try:
+        with tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="") as output:
+            job.rows = exports.write(output, job.kind, job.params, progress)
+            output.seek(0)
+            job.result.save(exports.filename(job.kind), File(output), save=False)
+    except Exception as e:
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return False
+
+    job.status = ReportJob.STATUS_DONE
+    job.progress = 100
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(
+        update_fields=["status", "progress", "rows", "result", "error", "finished_at"]
+    )
+    return True
+
+
+def process_jobs(limit=5):
+    """Genera hasta ``limit`` trabajos. Devuelve ``(listos, fallidos)``."""
+    done = failed = 0
+    for _ in range(limit):
+        job = claim()
+        if job is None:
+            break
+        if run(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def purge_expired():
+    """Borra los trabajos terminados hace más de ``REPORT_JOB_RETENTION_HOURS``."""
+    limit = timezone.now() - timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS)
+    expired = ReportJob.objects.filter(
+        status__in=[ReportJob.STATUS_DONE, ReportJob.STATUS_FAILED],
+        finished_at__lt=limit,
+    )
+    count = 0
+    for job in expired:
+        if job.result:
+            job.result.delete(save=False)
+        job.delete()
+        count += 1
+    return count
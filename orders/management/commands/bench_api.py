@@ -0,0 +1,139 @@
+import json
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.text import compress_string
+
+from core.middleware import brotli
+from orders import api
+from orders.models import (
+    Ingredient,
+    IngredientMovement,
+    Order,
+    OrderItem,
+    Product,
+    Table,
+)
+
+
+def seed(count):
+    """Inserta ``count`` comandas (con un ítem) y ``count`` movimientos."""
+    user = User.objects.order_by("pk").first() or User.objects.create_user("bench")
+    table = Table.objects.get_or_create(name="Mesa bench")[0]
+    product = Product.objects.create(name="Producto bench", price=Decimal("85.50"))
+    ingredient = Ingredient.objects.get_or_create(name="Ingrediente bench")[0]
+    orders = Order.objects.bulk_create(
+        (
+            Order(table=table, user=user, is_paid=i % 3 == 0, is_void=i % 3 == 2)
+            for i in range(count)
+        ),
+        batch_size=1000,
+    )
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(order=order, product=product, quantity=1 + i % 4)
+            for i, order in enumerate(orders)
+        ),
+        batch_size=1000,
+    )
+    kinds = [kind for kind, _ in IngredientMovement.KINDS]
+    IngredientMovement.objects.bulk_create(
+        (
+            IngredientMovement(
+                ingredient=ingredient,
+                quantity=Decimal(-(i % 17)) / 4,
+                kind=kinds[i % len(kinds)],
+                order=order,
+                reason=f"Uso en {product.name}, Comanda #{order.pk}",
+                user=user,
+            )
+            for i, order in enumerate(orders)
+        ),
+        batch_size=1000,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide consulta, tamaño y tiempo de serialización de api_movements y "
+        "api_orders sobre las filas reales de la base: formato anterior "
+        "(JsonResponse), registros compactos y columnar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help=(
+                "Inserta N comandas y N movimientos de prueba; se revierten "
+                "al terminar."
+            ),
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Se reporta el mejor tiempo."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed"] > 0:
+                seed(options["seed"])
+            try:
+                self.measure(options["repeat"])
+            finally:
+                transaction.set_rollback(True)
+
+    def measure(self, repeat):
+        encoder = "orjson" if api.orjson else "json"
+        self.stdout.write(f"Codificador: {encoder}")
+        for name, columns, build in (
+            ("api_movements", api.MOVEMENT_COLUMNS, api.movement_rows),
+            ("api_orders", api.ORDER_COLUMNS, api.order_rows),
+        ):
+            started = time.perf_counter()
+            rows = list(build())
+            elapsed = time.perf_counter() - started
+            if not rows:
+                raise CommandError(
+                    f"{name} no tiene filas; usa --seed N para medir con datos "
+                    "de prueba."
+                )
+            self.stdout.write(
+                f"\n{name} · {len(rows):,} filas · consulta {elapsed * 1000:.1f} ms"
+            )
+            self.stdout.write(
+                f"  {'formato':<10}{'ms':>9}{'bytes':>13}{'gzip':>12}{'brotli':>12}"
+            )
+            variants = {
+                "anterior": lambda: json.dumps(
+                    [
+                        {
+                            k: float(v) if isinstance(v, Decimal) else v
+                            for k, v in zip(columns, row)
+                        }
+                        for row in rows
+                    ],
+                    cls=DjangoJSONEncoder,
+                ).encode(),
+                "registros": lambda: api.serialize(columns, rows),
+                "columnar": lambda: api.serialize(columns, rows, api.FORMAT_COLUMNAR),
+            }
+            for label, serialize in variants.items():
+                best, body = None, b""
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    body = serialize()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                gzip_size = f"{len(compress_string(body)):,}"
+                br_size = (
+                    f"{len(brotli.compress(body, quality=4)):,}" if brotli else "—"
+                )
+                self.stdout.write(
+                    f"  {label:<10}{best * 1000:>9.1f}{len(body):>13,}"
+                    f"{gzip_size:>12}{br_size:>12}"
+                )
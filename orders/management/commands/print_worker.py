@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders import printing
+
+
+class Command(BaseCommand):
+    help = "Envía a las impresoras ESC/POS los tickets de comanda en cola."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Procesa la cola una sola vez y termina.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2,
+            help="Segundos de espera cuando la cola está vacía.",
+        )
+        parser.add_argument("--limit", type=int, default=20, help="Trabajos por ronda.")
+
+    def handle(self, *args, **options):
+        while True:
+            printed, failed = printing.process_jobs(options["limit"])
+            if printed or failed:
+                self.stdout.write(f"✅ {printed} impresos, ⚠️ {failed} con error.")
+            if options["once"]:
+                return
+            if not printed and not failed:
+                time.sleep(options["interval"])
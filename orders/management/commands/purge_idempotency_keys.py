@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Elimina los tokens de idempotencia de comandas ya vencidos."
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.purge_expired()
+        self.stdout.write(f"✅ {deleted} tokens vencidos eliminados.")
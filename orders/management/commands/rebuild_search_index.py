@@ -0,0 +1,19 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de texto completo."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write("⚠️ El motor de base de datos no soporta el índice.")
+            return
+        with transaction.atomic():
+            search.create_tables()
+            counts = search.rebuild_all(apps)
+        for kind, count in counts.items():
+            self.stdout.write(f"✅ {kind}: {count} documentos indexados.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import projections
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye desde cero las proyecciones del historial de comandas "
+        "(todas si no se indica ninguna)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "projections",
+            nargs="*",
+            help="Proyecciones a reconstruir: "
+            + ", ".join(projections.PROJECTIONS)
+            + ".",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["projections"]) - projections.PROJECTIONS.keys()
+        if unknown:
+            raise CommandError(
+                f"Proyecciones desconocidas: {', '.join(sorted(unknown))}"
+            )
+        counts = projections.rebuild(options["projections"] or None)
+        for name, count in counts.items():
+            self.stdout.write(f"✅ {name}: {count} filas reconstruidas.")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders import jobs
+
+
+class Command(BaseCommand):
+    help = "Genera en segundo plano las exportaciones de reportes en cola."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Procesa la cola una sola vez y termina.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2,
+            help="Segundos de espera cuando la cola está vacía.",
+        )
+        parser.add_argument("--limit", type=int, default=5, help="Trabajos por ronda.")
+
+    def handle(self, *args, **options):
+        while True:
+            purged = jobs.purge_expired()
+            if purged:
+                self.stdout.write(f"ℹ️ {purged} exportaciones vencidas eliminadas.")
+            done, failed = jobs.process_jobs(options["limit"])
+            if done or failed:
+                self.stdout.write(f"✅ {done} generadas, ⚠️ {failed} con error.")
+            if options["once"]:
+                return
+            if not done and not failed:
+                time.sleep(options["interval"])
@@ -0,0 +1,63 @@
+"""
+Instantánea versionada del menú para el POS.
+
+El menú (productos, categorías, precios, áreas de despacho y disponibilidad)
+se serializa una sola vez por versión y se guarda en caché. La versión cambia
+cada vez que se modifica un producto, una categoría o un área de despacho
+(ver ``orders/signals.py``) y sirve como ETag de ``api_menu``. Es la versión
+de la etiqueta ``menu`` de ``core.caching``.
+"""
+
+from core import caching
+
+SNAPSHOT_KEY = "menu:snapshot:{version}"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+def get_version():
+    """Devuelve la versión actual del menú, creándola si no existe."""
+    return caching.version(caching.TAG_MENU)
+
+
+def bump_version():
+    """Invalida la instantánea actual del menú."""
+    caching.bump(caching.TAG_MENU)
+
+
+def build_snapshot(version):
+    """Serializa el menú completo con tres consultas."""
+    from .models import DispatchArea, Product, ProductCategory
+
+    products = Product.objects.order_by("category__name", "name").values(
+        "id", "name", "category_id", "dispatch_area_id", "price", "is_available"
+    )
+    return {
+        "version": version,
+        "categories": list(
+            ProductCategory.objects.order_by("name").values("id", "name")
+        ),
+        "dispatch_areas": list(
+            DispatchArea.objects.order_by("name").values("id", "name")
+        ),
+        "products": [
+            {
+                "id": p["id"],
+                "name": p["name"],
+                "category": p["category_id"],
+                "dispatch_area": p["dispatch_area_id"],
+                "price": str(p["price"]),
+                "available": p["is_available"],
+            }
+            for p in products
+        ],
+    }
+
+
+def get_snapshot():
+    """Devuelve la instantánea de la versión actual, construyéndola una vez."""
+    version = get_version()
+    return caching.cached(
+        SNAPSHOT_KEY.format(version=version),
+        lambda: build_snapshot(version),
+        timeout=SNAPSHOT_TIMEOUT,
+    )
@@ -0,0 +1,83 @@
+"""
+Métricas de negocio del POS (ver ``core/metrics.py``).
+
+Los contadores se actualizan donde ocurre la escritura: ``sync.create_orders``
+(comandas, líneas, latencia de la transacción) e ``IngredientMovement``
+(movimientos de inventario). Las mesas pendientes y los ingredientes con
+stock bajo se cuentan al exponer, pero en caché bajo las etiquetas ``order``
+e ``ingredient``: solo se vuelven a consultar después de un cambio.
+"""
+
+from core import caching
+from core.metrics import Counter, Gauge, Histogram
+
+LOW_STOCK_THRESHOLD = 5
+
+ORDERS_CREATED = Counter("orders_created_total", "Comandas creadas.")
+ORDER_ITEMS = Histogram(
+    "order_items",
+    "Unidades por comanda.",
+    buckets=(1, 2, 3, 5, 8, 13, 20, 50),
+)
+ORDER_COMMIT_SECONDS = Histogram(
+    "order_commit_seconds",
+    "Duración de la transacción que guarda un lote de comandas.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MOVEMENTS_WRITTEN = Counter(
+    "inventory_movements_total",
+    "Movimientos de inventario registrados, por tipo.",
+    labels=("kind",),
+)
+
+
+def observe_orders(orders, items, duration):
+    """Registra un lote de comandas recién guardado."""
+    units = {}
+    for item in items:
+        units[item.order_id] = units.get(item.order_id, 0) + item.quantity
+    ORDERS_CREATED.inc(len(orders))
+    for order in orders:
+        ORDER_ITEMS.observe(units.get(order.id, 0))
+    ORDER_COMMIT_SECONDS.observe(duration)
+
+
+def observe_movements(movements):
+    """Cuenta movimientos de inventario ya guardados."""
+    kinds = {}
+    for movement in movements:
+        kinds[movement.kind] = kinds.get(movement.kind, 0) + 1
+    for kind, count in kinds.items():
+        MOVEMENTS_WRITTEN.inc(count, kind=kind)
+
+
+def pending_tables():
+    from .models import TableBalance
+
+    return caching.cached(
+        "metrics:pending_tables",
+        lambda: TableBalance.objects.filter(balance__gt=0).count(),
+        tags=(caching.TAG_ORDER,),
+    )
+
+
+def low_stock_ingredients():
+    from .models import Ingredient
+
+    return caching.cached(
+        "metrics:low_stock",
+        lambda: Ingredient.objects.filter(
+            stock_quantity__lt=LOW_STOCK_THRESHOLD
+        ).count(),
+        tags=(caching.TAG_INGREDIENT,),
+    )
+
+
+PENDING_TABLES = Gauge(
+    "pending_tables", "Mesas con saldo pendiente.", collect=pending_tables
+)
+LOW_STOCK = Gauge(
+    "low_stock_ingredients",
+    f"Ingredientes con stock menor a {LOW_STOCK_THRESHOLD}.",
+    collect=low_stock_ingredients,
+)
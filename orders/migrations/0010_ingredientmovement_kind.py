@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+def classify_movements(apps, schema_editor):
+    """Clasifica los movimientos existentes según el texto de la razón."""
+    IngredientMovement = apps.get_model("orders", "IngredientMovement")
+    IngredientMovement.objects.filter(reason__startswith="Uso en").update(kind="sale")
+    IngredientMovement.objects.filter(reason__startswith="Compra").update(
+        kind="purchase"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0009_ingredient_minimum_stock"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredientmovement",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("sale", "Venta"),
+                    ("purchase", "Compra"),
+                    ("adjustment", "Ajuste"),
+                ],
+                default="adjustment",
+                max_length=20,
+                verbose_name="Tipo",
+            ),
+        ),
+        migrations.RunPython(classify_movements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:03
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SALE_REASON = re.compile(r"^Uso en (?P<product>.+), Comanda #(?P<order>\d+)$")
+
+
+def link_movements_to_orders(apps, schema_editor):
+    """Enlaza los movimientos de venta existentes con su comanda y línea."""
+    IngredientMovement = apps.get_model("orders", "IngredientMovement")
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+
+    parsed = {}
+    for mov_id, reason in IngredientMovement.objects.filter(
+        kind="sale", order__isnull=True
+    ).values_list("id", "reason"):
+        match = SALE_REASON.match(reason or "")
+        if match:
+            parsed[mov_id] = (int(match["order"]), match["product"])
+
+    order_ids = set(
+        Order.objects.filter(
+            id__in={order_id for order_id, _ in parsed.values()}
+        ).values_list("id", flat=True)
+    )
+    items = {
+        (order_id, product_name): item_id
+        for item_id, order_id, product_name in OrderItem.objects.filter(
+            order_id__in=order_ids
+        ).values_list("id", "order_id", "product__name")
+    }
+
+    movements = []
+    for mov in IngredientMovement.objects.filter(id__in=parsed):
+        order_id, product_name = parsed[mov.id]
+        if order_id not in order_ids:
+            continue
+        mov.order_id = order_id
+        mov.order_item_id = items.get((order_id, product_name))
+        movements.append(mov)
+    IngredientMovement.objects.bulk_update(
+        movements, ["order", "order_item"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0010_ingredientmovement_kind"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredientmovement",
+            name="order",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="orders.order",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredientmovement",
+            name="order_item",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="orders.orderitem",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ingredientmovement",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("sale", "Venta"),
+                    ("purchase", "Compra"),
+                    ("adjustment", "Ajuste"),
+                    ("waste", "Merma"),
+                    ("transfer", "Traslado"),
+                    ("reversal", "Reversión"),
+                ],
+                default="adjustment",
+                max_length=20,
+                verbose_name="Tipo",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ingredientmovement",
+            index=models.Index(
+                fields=["kind", "created_at"], name="orders_ingr_kind_155450_idx"
+            ),
+        ),
+        migrations.RunPython(link_movements_to_orders, migrations.RunPython.noop),
+    ]
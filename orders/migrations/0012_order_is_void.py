@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0011_ingredientmovement_order_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="is_void",
+            field=models.BooleanField(default=False, verbose_name="Anulada"),
+        ),
+    ]
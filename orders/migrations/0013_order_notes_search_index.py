@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+from orders import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_tables(schema_editor.connection)
+    search.rebuild_all(apps, schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_tables(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0012_order_is_void"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="notes",
+            field=models.TextField(blank=True, null=True, verbose_name="Notas"),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
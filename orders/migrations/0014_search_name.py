@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+from orders import search
+
+
+def fill_search_names(apps, schema_editor):
+    for model_name in ("Product", "Ingredient"):
+        model = apps.get_model("orders", model_name)
+        objects = list(model.objects.only("id", "name"))
+        for obj in objects:
+            obj.search_name = search.normalize(obj.name)
+        model.objects.bulk_update(objects, ["search_name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0013_order_notes_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="search_name",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="search_name",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0014_search_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="is_available",
+            field=models.BooleanField(default=True, verbose_name="Disponible"),
+        ),
+    ]
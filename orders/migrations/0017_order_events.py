@@ -0,0 +1,345 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:16
+
+from collections import defaultdict
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+BATCH_SIZE = 500
+
+
+def backfill_events(apps, schema_editor):
+    """
+    Crea el historial inicial a partir del estado actual de las comandas:
+    ``created``, un ``item_added`` por línea y ``paid`` si ya estaba pagada.
+
+    Usa solo los modelos históricos: las proyecciones se calculan aquí con
+    consultas agregadas en lugar de importar ``orders.projections``, que puede
+    cambiar después de esta migración.
+    """
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+
+    def write(orders):
+        items = defaultdict(list)
+        for item in (
+            OrderItem.objects.filter(order__in=orders)
+            .select_related("product")
+            .order_by("id")
+        ):
+            items[item.order_id].append(item)
+        events = []
+        # created → item_added → paid, como habrían ocurrido.
+        for order in orders:
+            fields = {
+                "order_id": order.id,
+                "table_id": order.table_id,
+                "user_id": order.user_id,
+                "created_at": order.created_at,
+            }
+            events.append(OrderEvent(kind="created", **fields))
+            total = 0
+            for item in items[order.id]:
+                amount = item.quantity * item.product.price
+                total += amount
+                events.append(
+                    OrderEvent(
+                        kind="item_added",
+                        product_id=item.product_id,
+                        quantity=item.quantity,
+                        amount=amount,
+                        **fields,
+                    )
+                )
+            if order.is_paid:
+                events.append(OrderEvent(kind="paid", amount=total, **fields))
+        OrderEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+    batch = []
+    for order in Order.objects.order_by("id").iterator(chunk_size=BATCH_SIZE):
+        batch.append(order)
+        if len(batch) == BATCH_SIZE:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+
+    build_projections(apps)
+
+
+def build_projections(apps):
+    """
+    Saldos por mesa, ventas diarias y cola de despacho a partir de los eventos
+    recién creados (solo hay ``created``, ``item_added`` y ``paid``).
+    """
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+    TableBalance = apps.get_model("orders", "TableBalance")
+    DailySales = apps.get_model("orders", "DailySales")
+    DispatchQueueItem = apps.get_model("orders", "DispatchQueueItem")
+    added = OrderEvent.objects.filter(kind="item_added")
+
+    balances = (
+        OrderEvent.objects.filter(table__isnull=False)
+        .values("table")
+        .annotate(
+            total=Sum(
+                Case(
+                    When(kind="item_added", then=F("amount")),
+                    When(kind="paid", then=-F("amount")),
+                    default=Value(0),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+        )
+        .values_list("table", "total")
+    )
+    TableBalance.objects.bulk_create(
+        (
+            TableBalance(table_id=table_id, balance=total)
+            for table_id, total in balances.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    sales = (
+        added.filter(product__isnull=False)
+        .annotate(
+            date=TruncDate("order__created_at", tzinfo=timezone.get_current_timezone())
+        )
+        .values("date", "product")
+        .annotate(total_quantity=Sum("quantity"), total=Sum("amount"))
+        .values_list("date", "product", "total_quantity", "total")
+    )
+    DailySales.objects.bulk_create(
+        (
+            DailySales(
+                date=date, product_id=product_id, quantity=quantity, amount=total
+            )
+            for date, product_id, quantity, total in sales.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    pending = (
+        added.filter(product__isnull=False)
+        .exclude(order__in=OrderEvent.objects.filter(kind="paid").values("order"))
+        .values("order", "product", "product__dispatch_area")
+        .annotate(total_quantity=Sum("quantity"))
+        .filter(total_quantity__gt=0)
+        .values_list("order", "product", "product__dispatch_area", "total_quantity")
+    )
+    DispatchQueueItem.objects.bulk_create(
+        (
+            DispatchQueueItem(
+                order_id=order_id,
+                product_id=product_id,
+                dispatch_area_id=area_id,
+                quantity=quantity,
+            )
+            for order_id, product_id, area_id, quantity in pending.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0016_idempotencykey"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TableBalance",
+            fields=[
+                (
+                    "table",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="orders.table",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="orders.product"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "product"), name="unique_daily_sales_product"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DispatchQueueItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "dispatch_area",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="orders.dispatcharea",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="orders.order"
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="orders.product"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("order", "product"), name="unique_dispatch_queue_item"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="OrderEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("created", "Creada"),
+                            ("item_added", "Producto agregado"),
+                            ("item_voided", "Producto anulado"),
+                            ("paid", "Pagada"),
+                            ("reopened", "Pago revertido"),
+                            ("moved_table", "Cambio de mesa"),
+                        ],
+                        max_length=20,
+                        verbose_name="Tipo",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "from_table",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="orders.table",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="orders.order"
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="orders.product",
+                    ),
+                ),
+                (
+                    "table",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="orders.table",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["order", "kind"], name="orders_orde_order_i_0e5f06_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
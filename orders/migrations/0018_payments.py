@@ -0,0 +1,172 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, Value, When
+
+
+def build_order_balances(apps, schema_editor):
+    """
+    Saldo pendiente de cada comanda según su historial, con los signos de los
+    eventos que existen en esta migración (sin importar ``orders.projections``).
+    """
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+    OrderBalance = apps.get_model("orders", "OrderBalance")
+    signs = {"item_added": 1, "item_voided": -1, "paid": -1, "reopened": 1}
+    balances = (
+        OrderEvent.objects.values("order")
+        .annotate(
+            total=Sum(
+                Case(
+                    *[
+                        When(kind=kind, then=F("amount") * sign)
+                        for kind, sign in signs.items()
+                    ],
+                    default=Value(0),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+        )
+        .values_list("order", "total")
+    )
+    OrderBalance.objects.bulk_create(
+        (
+            OrderBalance(order_id=order_id, balance=total)
+            for order_id, total in balances.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0017_order_events"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderBalance",
+            fields=[
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="orders.order",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="orderevent",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("created", "Creada"),
+                    ("item_added", "Producto agregado"),
+                    ("item_voided", "Producto anulado"),
+                    ("paid", "Pagada"),
+                    ("reopened", "Pago revertido"),
+                    ("moved_table", "Cambio de mesa"),
+                    ("payment", "Abono"),
+                ],
+                max_length=20,
+                verbose_name="Tipo",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Payment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tender",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Efectivo"),
+                            ("card", "Tarjeta"),
+                            ("transfer", "Transferencia"),
+                        ],
+                        default="cash",
+                        max_length=20,
+                        verbose_name="Forma de pago",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="Monto"
+                    ),
+                ),
+                (
+                    "tip",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=10,
+                        verbose_name="Propina",
+                    ),
+                ),
+                (
+                    "received",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Recibido",
+                    ),
+                ),
+                (
+                    "change",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=10,
+                        verbose_name="Vuelto",
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Referencia"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "table",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="orders.table",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(build_order_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0020_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dispatcharea",
+            name="printer_host",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Impresora térmica de red (ESC/POS). Vacío: sin impresión directa.",
+                max_length=255,
+                verbose_name="Impresora (IP o host)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dispatcharea",
+            name="printer_port",
+            field=models.PositiveIntegerField(
+                default=9100, verbose_name="Puerto de la impresora"
+            ),
+        ),
+        migrations.CreateModel(
+            name="PrintJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("payload", models.BinaryField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pendiente"),
+                            ("printing", "Imprimiendo"),
+                            ("done", "Impreso"),
+                            ("failed", "Fallido"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("printed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "dispatch_area",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="orders.dispatcharea",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="orders.order"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="orders_prin_status_badc1e_idx",
+                    )
+                ],
+            },
+        ),
+    ]
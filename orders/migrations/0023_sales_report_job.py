@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0022_report_jobs"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reportjob",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("orders", "Comandas"),
+                    ("movements", "Movimientos de inventario"),
+                    ("sales_by_product", "Ventas por producto"),
+                    ("variance", "Variación de ingredientes"),
+                    ("sales_report", "Reporte de ventas por producto"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
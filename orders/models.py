@@ -1,6 +1,15 @@
+import hashlib
+from datetime import timedelta
 from decimal import Decimal
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Sum, Value, When
+from django.utils import timezone
+
+from core import caching
+
+from . import metrics, search
 
 
 class Table(models.Model):
@@ -19,6 +28,16 @@ class ProductCategory(models.Model):
 
 class DispatchArea(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    printer_host = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name="Impresora (IP o host)",
+        help_text="Impresora térmica de red (ESC/POS). Vacío: sin impresión directa.",
+    )
+    printer_port = models.PositiveIntegerField(
+        default=9100, verbose_name="Puerto de la impresora"
+    )
 
     def __str__(self):
         return self.name
@@ -33,6 +52,9 @@ class Warehouse(models.Model):
 
 class Product(models.Model):
     name = models.CharField(max_length=255)
+    search_name = models.CharField(
+        max_length=255, db_index=True, editable=False, default=""
+    )
     category = models.ForeignKey(
         ProductCategory, on_delete=models.SET_NULL, null=True, blank=True
     )
@@ -40,6 +62,11 @@ class Product(models.Model):
         DispatchArea, on_delete=models.SET_NULL, null=True, blank=True
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_available = models.BooleanField(default=True, verbose_name="Disponible")
+
+    def save(self, *args, **kwargs):
+        self.search_name = search.normalize(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -57,6 +84,9 @@ class Ingredient(models.Model):
     ]
 
     name = models.CharField(max_length=255, unique=True, verbose_name="Nombre")
+    search_name = models.CharField(
+        max_length=255, db_index=True, editable=False, default=""
+    )
     stock_quantity = models.DecimalField(
         max_digits=10, decimal_places=2, default=0, verbose_name="Cantidad"
     )
@@ -66,6 +96,13 @@ class Ingredient(models.Model):
     warehouse = models.ForeignKey(
         Warehouse, on_delete=models.SET_NULL, null=True, blank=True
     )
+    minimum_stock = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Stock mínimo"
+    )
+
+    def save(self, *args, **kwargs):
+        self.search_name = search.normalize(self.name)
+        super().save(*args, **kwargs)
 
     def add_stock(self, amount):
         """Agrega cantidad al stock."""
@@ -102,23 +139,80 @@ class ProductIngredient(models.Model):
 class IngredientMovement(models.Model):
     """Registra todo movimiento de inventario (uso, compra, ajuste, etc.)"""
 
+    KIND_SALE = "sale"
+    KIND_PURCHASE = "purchase"
+    KIND_ADJUSTMENT = "adjustment"
+    KIND_WASTE = "waste"
+    KIND_TRANSFER = "transfer"
+    KIND_REVERSAL = "reversal"
+    KINDS = [
+        (KIND_SALE, "Venta"),
+        (KIND_PURCHASE, "Compra"),
+        (KIND_ADJUSTMENT, "Ajuste"),
+        (KIND_WASTE, "Merma"),
+        (KIND_TRANSFER, "Traslado"),
+        (KIND_REVERSAL, "Reversión"),
+    ]
+
     ingredient = models.ForeignKey("Ingredient", on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    kind = models.CharField(
+        max_length=20, choices=KINDS, default=KIND_ADJUSTMENT, verbose_name="Tipo"
+    )
     reason = models.CharField(max_length=255, blank=True, null=True)
+    order = models.ForeignKey("Order", on_delete=models.SET_NULL, null=True, blank=True)
+    order_item = models.ForeignKey(
+        "OrderItem", on_delete=models.SET_NULL, null=True, blank=True
+    )
     user = models.ForeignKey(
         "auth.User", on_delete=models.SET_NULL, null=True, blank=True
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["kind", "created_at"])]
 
     def apply_movement(self):
         """Aplica el movimiento al inventario."""
         self.ingredient.add_stock(self.quantity)
 
+    @classmethod
+    def bulk_apply(cls, movements):
+        """
+        Inserta movimientos en bloque y los aplica al inventario.
+
+        ``bulk_create`` no llama a ``save()``, así que el stock se actualiza
+        aquí con un solo UPDATE (un ``CASE`` con el total por ingrediente).
+        """
+        if not movements:
+            return []
+        cls.objects.bulk_create(movements)
+        search.index(search.KIND_MOVEMENT, [(m.pk, m.reason) for m in movements])
+
+        totals = {}
+        for m in movements:
+            totals[m.ingredient_id] = totals.get(m.ingredient_id, 0) + m.quantity
+        Ingredient.objects.filter(id__in=totals).update(
+            stock_quantity=F("stock_quantity")
+            + Case(
+                *[
+                    When(id=ingredient_id, then=Value(total))
+                    for ingredient_id, total in totals.items()
+                ],
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+        # ``update()`` no dispara señales: invalidar la caché a mano.
+        caching.bump(caching.TAG_INGREDIENT)
+        metrics.observe_movements(movements)
+        return movements
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if is_new:
             self.apply_movement()
+            metrics.observe_movements([self])
 
     def __str__(self):
         tipo = "Ingreso" if self.quantity >= 0 else "Salida"
@@ -130,15 +224,308 @@ class IngredientMovement(models.Model):
 class Order(models.Model):
     table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey("auth.User", on_delete=models.SET_NULL, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_paid = models.BooleanField(default=False)
+    is_void = models.BooleanField(default=False, verbose_name="Anulada")
+    notes = models.TextField(blank=True, null=True, verbose_name="Notas")
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                OrderEvent.record([OrderEvent.for_order(self)])
 
     def get_status_display(self):
+        if self.is_void:
+            return "Anulada"
         return "Pagada" if self.is_paid else "Pendiente"
 
     def get_total(self):
         return sum(item.get_total() for item in self.orderitem_set.all())
 
+    def paid_amount(self):
+        """Lo cobrado a la comanda (pagos y abonos) desde su última reapertura."""
+        events = self.orderevent_set.all()
+        last_reopened = events.filter(kind=OrderEvent.KIND_REOPENED).aggregate(
+            last=Max("id")
+        )["last"]
+        return (
+            events.filter(
+                kind__in=[OrderEvent.KIND_PAID, OrderEvent.KIND_PAYMENT],
+                id__gt=last_reopened or 0,
+            ).aggregate(total=Sum("amount"))["total"]
+            or 0
+        )
+
+    def has_payments(self):
+        """``True`` si está pagada o tiene abonos; bloquea la fila de la comanda."""
+        return (
+            Order.objects.select_for_update().filter(pk=self.pk, is_paid=True).exists()
+            or self.paid_amount() > 0
+        )
+
+    def adjust_inventory(self, changes, user=None):
+        """
+        Publica los movimientos compensatorios de las líneas que cambiaron.
+
+        ``changes`` es una lista ``[(línea, cantidad_anterior, cantidad_nueva)]``.
+        Lo ya descontado por cada línea (sus ventas y reversiones enlazadas) se
+        escala por la nueva cantidad: las recetas actuales no se consultan, así
+        que un cambio de receta posterior a la venta no re-costea la comanda.
+        Devuelve la cantidad de movimientos creados.
+        """
+        deducted = {}
+        for item_id, ingredient_id, total in (
+            IngredientMovement.objects.filter(
+                order_item__in=[item for item, _, _ in changes],
+                kind__in=[
+                    IngredientMovement.KIND_SALE,
+                    IngredientMovement.KIND_REVERSAL,
+                ],
+            )
+            .values("order_item", "ingredient")
+            .annotate(total=-Sum("quantity"))
+            .values_list("order_item", "ingredient", "total")
+        ):
+            deducted.setdefault(item_id, {})[ingredient_id] = total
+
+        movements = []
+        for item, previous, quantity in changes:
+            if quantity == previous:
+                continue
+            if not previous:
+                movements += item.recipe_movements(quantity, user)
+                continue
+            for ingredient_id, total in deducted.get(item.id, {}).items():
+                diff = (total * (previous - quantity) / previous).quantize(
+                    Decimal("0.01")
+                )
+                if not diff:
+                    continue
+                if diff > 0:
+                    kind = IngredientMovement.KIND_REVERSAL
+                    reason = f"Reversión en Comanda #{self.id}"
+                else:
+                    kind = IngredientMovement.KIND_SALE
+                    reason = f"Ajuste de venta en Comanda #{self.id}"
+                movements.append(
+                    IngredientMovement(
+                        ingredient_id=ingredient_id,
+                        quantity=diff,
+                        kind=kind,
+                        order=self,
+                        order_item=item,
+                        user=user,
+                        reason=reason,
+                    )
+                )
+
+        IngredientMovement.bulk_apply(movements)
+        return len(movements)
+
+    def return_inventory(self, user=None):
+        """
+        Devuelve al inventario todo lo descontado por la comanda (ventas menos
+        reversiones ya publicadas). Devuelve la cantidad de movimientos creados.
+        """
+        deducted = (
+            IngredientMovement.objects.filter(
+                order=self,
+                kind__in=[
+                    IngredientMovement.KIND_SALE,
+                    IngredientMovement.KIND_REVERSAL,
+                ],
+            )
+            .values("ingredient")
+            .annotate(total=-Sum("quantity"))
+            .values_list("ingredient", "total")
+        )
+        movements = [
+            IngredientMovement(
+                ingredient_id=ingredient_id,
+                quantity=total,
+                kind=IngredientMovement.KIND_REVERSAL,
+                order=self,
+                user=user,
+                reason=f"Reversión en Comanda #{self.id}",
+            )
+            for ingredient_id, total in deducted
+            if total
+        ]
+        IngredientMovement.bulk_apply(movements)
+        return len(movements)
+
+    def update_items(self, quantities, user=None):
+        """
+        Cambia las cantidades de las líneas de la comanda.
+
+        ``quantities`` es un diccionario ``{item_id: cantidad}``; una cantidad
+        de cero elimina la línea. El inventario se ajusta en la misma
+        transacción con movimientos compensatorios de las líneas cambiadas
+        (ver ``adjust_inventory``).
+
+        Si la comanda tiene pagos o abonos solo se pueden agregar unidades:
+        reducir una línea ya cobrada dejaría el saldo en negativo. Lanza
+        ``ValueError`` en ese caso.
+        """
+        with transaction.atomic():
+            items = self.orderitem_set.filter(id__in=quantities).select_related(
+                "product"
+            )
+            if any(quantities[i.id] < i.quantity for i in items) and (
+                self.has_payments()
+            ):
+                raise ValueError(
+                    "La comanda tiene pagos o abonos: márcala pagada y revierte "
+                    "el pago antes de reducir sus líneas."
+                )
+            removed, changed, events, adjustments = [], [], [], []
+            for item in items:
+                quantity = quantities[item.id]
+                if quantity == item.quantity:
+                    continue
+                adjustments.append((item, item.quantity, quantity))
+                events.append(
+                    OrderEvent.for_item(
+                        item,
+                        (
+                            OrderEvent.KIND_ITEM_ADDED
+                            if quantity > item.quantity
+                            else OrderEvent.KIND_ITEM_VOIDED
+                        ),
+                        quantity=abs(quantity - item.quantity),
+                        user=user,
+                    )
+                )
+                if quantity == 0:
+                    removed.append(item.id)
+                else:
+                    item.quantity = quantity
+                    changed.append(item)
+            OrderEvent.record(events)
+            # Antes de borrar: los movimientos se enlazan a su línea.
+            self.adjust_inventory(adjustments, user)
+            if removed:
+                OrderItem.objects.filter(id__in=removed).delete()
+            if changed:
+                OrderItem.objects.bulk_update(changed, ["quantity"])
+            return len(removed) + len(changed)
+
+    def void(self, user=None):
+        """
+        Anula la comanda y devuelve al inventario todo lo descontado.
+
+        Una comanda pagada o con abonos no se anula: sus líneas ya se cobraron
+        (en todo o en parte) y restarlas dejaría el saldo de la mesa en
+        negativo. Primero hay que revertir el pago (``reopen``). Lanza
+        ``ValueError`` en ese caso.
+        """
+        with transaction.atomic():
+            if self.has_payments():
+                raise ValueError(
+                    "La comanda tiene pagos o abonos: márcala pagada y revierte "
+                    "el pago antes de anularla."
+                )
+            items = list(self.orderitem_set.select_related("product"))
+            self.orderitem_set.all().delete()
+            OrderEvent.record(
+                [
+                    OrderEvent.for_item(item, OrderEvent.KIND_ITEM_VOIDED, user=user)
+                    for item in items
+                ]
+            )
+            self.return_inventory(user)
+            self.is_void = True
+            self.save(update_fields=["is_void"])
+
+    def mark_paid(self, user=None):
+        """Marca la comanda como pagada y registra el evento."""
+        return Order.pay_orders(Order.objects.filter(pk=self.pk), user) > 0
+
+    @classmethod
+    def pay_orders(cls, orders, user=None):
+        """
+        Marca como pagadas las comandas pendientes de ``orders`` (queryset)
+        con un solo ``UPDATE`` y registra un evento ``paid`` por comanda.
+        """
+        with transaction.atomic():
+            pending = list(
+                orders.filter(is_paid=False, is_void=False)
+                .select_for_update()
+                .select_related("table")
+            )
+            if not pending:
+                return 0
+            cls.objects.filter(pk__in=[o.pk for o in pending]).update(is_paid=True)
+            balances = OrderEvent.outstanding([o.pk for o in pending])
+            for order in pending:
+                order.is_paid = True
+            OrderEvent.record(
+                [
+                    OrderEvent(
+                        order=order,
+                        kind=OrderEvent.KIND_PAID,
+                        table=order.table,
+                        amount=balances.get(order.pk, 0),
+                        user=user,
+                    )
+                    for order in pending
+                ]
+            )
+            return len(pending)
+
+    def reopen(self, user=None):
+        """
+        Revierte el pago de la comanda.
+
+        Devuelve al saldo todo lo abonado desde la última reapertura: los
+        abonos de ``Payment.post`` más el resto saldado al marcarla pagada.
+        Los ``Payment`` quedan registrados en su turno; la comanda vuelve a
+        cobrarse por su total.
+        """
+        with transaction.atomic():
+            updated = Order.objects.filter(pk=self.pk, is_paid=True).update(
+                is_paid=False
+            )
+            self.is_paid = False
+            if not updated:
+                return False
+            OrderEvent.record(
+                [
+                    OrderEvent(
+                        order=self,
+                        kind=OrderEvent.KIND_REOPENED,
+                        table=self.table,
+                        amount=self.paid_amount(),
+                        user=user,
+                    )
+                ]
+            )
+            return True
+
+    def move_to(self, table, user=None):
+        """Cambia la comanda de mesa llevando su saldo pendiente."""
+        if table == self.table:
+            return False
+        with transaction.atomic():
+            from_table = self.table
+            self.table = table
+            self.save(update_fields=["table"])
+            OrderEvent.record(
+                [
+                    OrderEvent(
+                        order=self,
+                        kind=OrderEvent.KIND_MOVED_TABLE,
+                        table=table,
+                        from_table=from_table,
+                        amount=OrderEvent.outstanding([self.pk]).get(self.pk, 0),
+                        user=user,
+                    )
+                ]
+            )
+            return True
+
     def __str__(self):
         return f"Orden {self.id} - {self.table.name if self.table else 'Sin mesa'}"
 
@@ -153,22 +540,670 @@ class OrderItem(models.Model):
 
     def save(self, *args, **kwargs):
         """Guarda el pedido y actualiza el inventario de ingredientes."""
+        is_new = self.pk is None
+        previous = (
+            0
+            if is_new
+            else OrderItem.objects.filter(pk=self.pk)
+            .values_list("quantity", flat=True)
+            .first()
+            or 0
+        )
         super().save(*args, **kwargs)
+        if self.quantity != previous:
+            OrderEvent.record(
+                [
+                    OrderEvent.for_item(
+                        self,
+                        (
+                            OrderEvent.KIND_ITEM_ADDED
+                            if self.quantity > previous
+                            else OrderEvent.KIND_ITEM_VOIDED
+                        ),
+                        quantity=abs(self.quantity - previous),
+                    )
+                ]
+            )
+        if not is_new:
+            self.order.adjust_inventory(
+                [(self, previous, self.quantity)], self.order.user
+            )
+            return
 
-        for prod_ing in ProductIngredient.objects.filter(product=self.product):
-            total_required = prod_ing.quantity * Decimal(self.quantity)
+        # Un solo INSERT y un solo UPDATE de stock para toda la receta.
+        IngredientMovement.bulk_apply(
+            self.recipe_movements(self.quantity, self.order.user)
+        )
 
-            IngredientMovement.objects.create(
-                ingredient=prod_ing.ingredient,
-                quantity=-total_required,
-                user=self.order.user,
+    def recipe_movements(self, quantity, user=None):
+        """Ventas (sin guardar) que descuentan la receta actual × ``quantity``."""
+        return [
+            IngredientMovement(
+                ingredient_id=prod_ing.ingredient_id,
+                quantity=-prod_ing.quantity * Decimal(quantity),
+                kind=IngredientMovement.KIND_SALE,
+                order=self.order,
+                order_item=self,
+                user=user,
                 reason=f"Uso en {self.product.name}, Comanda #{self.order.id}",
             )
+            for prod_ing in ProductIngredient.objects.filter(product=self.product)
+        ]
+
+    def delete(self, *args, **kwargs):
+        """Elimina la línea y devuelve al inventario lo descontado."""
+        order = self.order
+        event = OrderEvent.for_item(self, OrderEvent.KIND_ITEM_VOIDED)
+        # Antes de borrar: los movimientos se enlazan a la línea.
+        order.adjust_inventory([(self, self.quantity, 0)], order.user)
+        result = super().delete(*args, **kwargs)
+        OrderEvent.record([event])
+        return result
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} (Comanda #{self.order.id})"
 
 
+class IdempotencyKey(models.Model):
+    """
+    Token de cliente ya procesado al enviar una comanda.
+
+    Guarda solo el hash del token (por usuario) y la comanda creada, para que
+    los reintentos devuelvan la comanda original sin volver a escribir.
+    """
+
+    key_hash = models.CharField(max_length=64, unique=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @staticmethod
+    def hash_token(user, token):
+        return hashlib.sha256(f"{user.pk}:{token}".encode()).hexdigest()
+
+    @classmethod
+    def find_order(cls, user, token):
+        """Devuelve la comanda ya creada con este token, si sigue vigente."""
+        key = (
+            cls.objects.filter(
+                key_hash=cls.hash_token(user, token), expires_at__gt=timezone.now()
+            )
+            .select_related("order")
+            .first()
+        )
+        return key.order if key else None
+
+    @staticmethod
+    def ttl():
+        return timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 86400))
+
+    @classmethod
+    def remember(cls, user, token, order):
+        """Registra el token; falla con ``IntegrityError`` si ya existía."""
+        ttl = cls.ttl()
+        key_hash = cls.hash_token(user, token)
+        now = timezone.now()
+        cls.objects.filter(key_hash=key_hash, expires_at__lte=now).delete()
+        return cls.objects.create(key_hash=key_hash, order=order, expires_at=now + ttl)
+
+    @classmethod
+    def purge_expired(cls):
+        """Elimina los tokens vencidos y devuelve cuántos se borraron."""
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class OrderEvent(models.Model):
+    """
+    Historial de solo inserción de lo ocurrido en cada comanda.
+
+    Cada cambio de una comanda agrega aquí su evento en la misma transacción.
+    Las proyecciones de ``orders/projections.py`` (saldos por mesa, ventas
+    diarias, cola de despacho) se actualizan a partir de estos eventos y se
+    pueden reconstruir con ``manage.py replay``.
+
+    ``amount`` siempre es positivo; el signo lo da el tipo de evento (ver
+    ``BALANCE_SIGNS``).
+    """
+
+    KIND_CREATED = "created"
+    KIND_ITEM_ADDED = "item_added"
+    KIND_ITEM_VOIDED = "item_voided"
+    KIND_PAID = "paid"
+    KIND_REOPENED = "reopened"
+    KIND_MOVED_TABLE = "moved_table"
+    KIND_PAYMENT = "payment"
+    KINDS = [
+        (KIND_CREATED, "Creada"),
+        (KIND_ITEM_ADDED, "Producto agregado"),
+        (KIND_ITEM_VOIDED, "Producto anulado"),
+        (KIND_PAID, "Pagada"),
+        (KIND_REOPENED, "Pago revertido"),
+        (KIND_MOVED_TABLE, "Cambio de mesa"),
+        (KIND_PAYMENT, "Abono"),
+    ]
+    # Efecto de cada evento en el saldo pendiente de la comanda.
+    BALANCE_SIGNS = {
+        KIND_ITEM_ADDED: 1,
+        KIND_ITEM_VOIDED: -1,
+        KIND_PAID: -1,
+        KIND_REOPENED: 1,
+        KIND_PAYMENT: -1,
+    }
+    ITEM_KINDS = [KIND_ITEM_ADDED, KIND_ITEM_VOIDED]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name="Tipo")
+    table = models.ForeignKey(
+        Table, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    from_table = models.ForeignKey(
+        Table, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["order", "kind"])]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Los eventos de comanda no se modifican.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los eventos de comanda no se eliminan.")
+
+    @classmethod
+    def for_order(cls, order, kind=KIND_CREATED, user=None):
+        return cls(order=order, kind=kind, table=order.table, user=user or order.user)
+
+    @classmethod
+    def for_item(cls, item, kind, quantity=None, user=None):
+        """Evento de línea; el monto usa el precio vigente del producto."""
+        quantity = item.quantity if quantity is None else quantity
+        return cls(
+            order=item.order,
+            kind=kind,
+            table=item.order.table,
+            product=item.product,
+            quantity=quantity,
+            amount=quantity * item.product.price,
+            user=user or item.order.user,
+        )
+
+    @classmethod
+    def record(cls, events):
+        """Inserta los eventos y actualiza las proyecciones en la misma transacción."""
+        from . import projections
+
+        if not events:
+            return []
+        with transaction.atomic():
+            cls.objects.bulk_create(events)
+            projections.apply(events)
+        # Todo cambio de comanda pasa por aquí, incluidos los ``update()`` y
+        # ``bulk_create`` que no disparan señales.
+        caching.bump(caching.TAG_ORDER)
+        return events
+
+    @classmethod
+    def balance_expression(cls):
+        """Suma con signo de ``amount`` según ``BALANCE_SIGNS``."""
+        return Sum(
+            Case(
+                *[
+                    When(kind=kind, then=F("amount") * sign)
+                    for kind, sign in cls.BALANCE_SIGNS.items()
+                ],
+                default=Value(0),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+    @classmethod
+    def outstanding(cls, order_ids):
+        """Saldo pendiente ``{order_id: monto}`` según la proyección de saldos."""
+        return dict(
+            OrderBalance.objects.filter(order_id__in=order_ids).values_list(
+                "order_id", "balance"
+            )
+        )
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - Comanda #{self.order_id}"
+
+
+class OrderBalance(models.Model):
+    """Proyección: saldo pendiente por comanda."""
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Comanda #{self.order_id} - {self.balance}"
+
+
+class TableBalance(models.Model):
+    """Proyección: saldo pendiente por mesa."""
+
+    table = models.OneToOneField(Table, on_delete=models.CASCADE, primary_key=True)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.table} - {self.balance}"
+
+
+class DailySales(models.Model):
+    """
+    Proyección: unidades y monto comandados por día y producto.
+
+    El día es el de creación de la comanda (hora local); las líneas anuladas
+    o reducidas se descuentan de ese mismo día.
+    """
+
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "product"], name="unique_daily_sales_product"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.product}: {self.quantity}"
+
+
+class DispatchQueueItem(models.Model):
+    """
+    Proyección: productos pendientes de despachar por área.
+
+    Contiene las líneas de las comandas abiertas; al pagar la comanda sus
+    líneas salen de la cola.
+    """
+
+    dispatch_area = models.ForeignKey(
+        DispatchArea, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "product"], name="unique_dispatch_queue_item"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} (Comanda #{self.order_id})"
+
+
+class Payment(models.Model):
+    """
+    Pago recibido en una mesa.
+
+    Una cuenta puede pagarse en partes y con varias formas de pago; cada
+    forma de pago es un ``Payment``. ``amount`` es lo que se abona a la
+    cuenta; la propina y el vuelto se guardan aparte y no afectan el saldo.
+    """
+
+    TENDER_CASH = "cash"
+    TENDER_CARD = "card"
+    TENDER_TRANSFER = "transfer"
+    TENDERS = [
+        (TENDER_CASH, "Efectivo"),
+        (TENDER_CARD, "Tarjeta"),
+        (TENDER_TRANSFER, "Transferencia"),
+    ]
+
+    table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True, blank=True)
+    tender = models.CharField(
+        max_length=20,
+        choices=TENDERS,
+        default=TENDER_CASH,
+        verbose_name="Forma de pago",
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Monto")
+    tip = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Propina"
+    )
+    received = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Recibido",
+    )
+    change = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Vuelto"
+    )
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Referencia")
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    shift = models.ForeignKey(
+        "Shift", on_delete=models.PROTECT, null=True, blank=True, verbose_name="Turno"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @classmethod
+    def build(cls, tender, amount, tip=0, received=None, reference="", **fields):
+        """
+        Valida una forma de pago y calcula el vuelto.
+
+        Lanza ``ValueError`` con un mensaje para el usuario si no es válida.
+        """
+        if tender not in dict(cls.TENDERS):
+            raise ValueError("Forma de pago inválida.")
+        amount, tip = Decimal(amount), Decimal(tip or 0)
+        if amount <= 0 or tip < 0:
+            raise ValueError("Los montos deben ser positivos.")
+        change = Decimal(0)
+        if tender == cls.TENDER_CASH and received is not None:
+            received = Decimal(received)
+            change = received - amount - tip
+            if change < 0:
+                raise ValueError("El efectivo recibido no cubre el monto y la propina.")
+        else:
+            received = None
+        return cls(
+            tender=tender,
+            amount=amount,
+            tip=tip,
+            received=received,
+            change=change,
+            reference=reference or "",
+            **fields,
+        )
+
+    @classmethod
+    def post(cls, table, payments, user=None):
+        """
+        Registra los pagos de una mesa y los abona a sus comandas abiertas,
+        de la más antigua a la más reciente.
+
+        El saldo se lee de las proyecciones (``TableBalance`` y
+        ``OrderBalance``), sin volver a sumar las líneas de las comandas. Las
+        comandas que quedan en cero se marcan como pagadas y los contadores
+        del turno abierto del cajero se actualizan. Lanza ``ValueError`` si no
+        hay turno abierto o si el total excede el saldo pendiente.
+        """
+        with transaction.atomic():
+            shift = (
+                Shift.objects.select_for_update()
+                .filter(user=user, closed_at__isnull=True)
+                .first()
+            )
+            if shift is None:
+                raise ValueError("Abre un turno de caja antes de cobrar.")
+            balance = TableBalance.objects.select_for_update().filter(
+                table=table
+            ).values_list("balance", flat=True).first() or Decimal(0)
+            total = sum((p.amount for p in payments), Decimal(0))
+            if not payments or total <= 0:
+                raise ValueError("No hay montos para registrar.")
+            if total > balance:
+                raise ValueError(
+                    f"El monto (C$ {total:,.2f}) excede el saldo pendiente "
+                    f"(C$ {balance:,.2f})."
+                )
+            for payment in payments:
+                payment.table, payment.user, payment.shift = table, user, shift
+            cls.objects.bulk_create(payments)
+            shift.add_payments(payments)
+
+            open_balances = OrderBalance.objects.filter(
+                order__table=table,
+                order__is_paid=False,
+                order__is_void=False,
+                balance__gt=0,
+            ).order_by("order__created_at", "order_id")
+            events, settled, remaining = [], [], total
+            for row in open_balances:
+                if remaining <= 0:
+                    break
+                applied = min(row.balance, remaining)
+                remaining -= applied
+                events.append(
+                    OrderEvent(
+                        order_id=row.order_id,
+                        kind=OrderEvent.KIND_PAYMENT,
+                        table=table,
+                        amount=applied,
+                        user=user,
+                    )
+                )
+                if applied == row.balance:
+                    settled.append(row.order_id)
+            OrderEvent.record(events)
+
+            unpaid = Order.objects.filter(table=table, is_paid=False, is_void=False)
+            if total == balance:
+                Order.pay_orders(unpaid, user)
+            elif settled:
+                Order.pay_orders(unpaid.filter(id__in=settled), user)
+            return balance - total
+
+    def __str__(self):
+        return f"{self.get_tender_display()} C$ {self.amount} - {self.table}"
+
+
+class Shift(models.Model):
+    """
+    Turno de caja (arqueo).
+
+    Los totales por forma de pago se acumulan al registrar cada pago
+    (``Payment.post``), así que el cierre y su reporte no recorren las
+    comandas ni los pagos del día.
+    """
+
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.PROTECT, verbose_name="Cajero"
+    )
+    opened_at = models.DateTimeField(auto_now_add=True, verbose_name="Apertura")
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Cierre")
+    opening_cash = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Fondo inicial"
+    )
+    counted_cash = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Efectivo contado",
+    )
+    notes = models.TextField(blank=True, verbose_name="Observaciones")
+    payment_count = models.PositiveIntegerField(default=0)
+    cash_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cash_tips = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    card_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    card_tips = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfer_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transfer_tips = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(closed_at__isnull=True),
+                name="unique_open_shift_per_user",
+            )
+        ]
+
+    @classmethod
+    def current(cls, user):
+        """Turno abierto del usuario, o ``None``."""
+        return cls.objects.filter(user=user, closed_at__isnull=True).first()
+
+    def add_payments(self, payments):
+        """Suma los pagos a los contadores con un solo ``UPDATE``."""
+        deltas = {"payment_count": F("payment_count") + len(payments)}
+        for tender, _ in Payment.TENDERS:
+            lines = [p for p in payments if p.tender == tender]
+            if lines:
+                for field, attr in (("amount", "amount"), ("tips", "tip")):
+                    name = f"{tender}_{field}"
+                    deltas[name] = F(name) + sum(getattr(p, attr) for p in lines)
+        Shift.objects.filter(pk=self.pk).update(**deltas)
+
+    def close(self, counted_cash, notes=""):
+        self.counted_cash = counted_cash
+        self.notes = notes
+        self.closed_at = timezone.now()
+        self.save(update_fields=["counted_cash", "notes", "closed_at"])
+
+    @property
+    def is_open(self):
+        return self.closed_at is None
+
+    @property
+    def total_amount(self):
+        return self.cash_amount + self.card_amount + self.transfer_amount
+
+    @property
+    def total_tips(self):
+        return self.cash_tips + self.card_tips + self.transfer_tips
+
+    @property
+    def expected_cash(self):
+        """Fondo inicial más lo cobrado en efectivo (incluida la propina)."""
+        return self.opening_cash + self.cash_amount + self.cash_tips
+
+    @property
+    def cash_difference(self):
+        if self.counted_cash is None:
+            return None
+        return self.counted_cash - self.expected_cash
+
+    def tender_rows(self):
+        """``[(etiqueta, monto, propina)]`` por forma de pago."""
+        return [
+            (
+                label,
+                getattr(self, f"{tender}_amount"),
+                getattr(self, f"{tender}_tips"),
+            )
+            for tender, label in Payment.TENDERS
+        ]
+
+    def __str__(self):
+        return f"Turno #{self.pk} - {self.user} ({self.opened_at:%d/%m/%Y %H:%M})"
+
+
+class PrintJob(models.Model):
+    """
+    Ticket ESC/POS pendiente de enviar a la impresora de un área de despacho.
+
+    La cola es durable: ``orders/printing.py`` crea un trabajo por área al
+    registrar la comanda y el comando ``print_worker`` los envía, con
+    reintentos y espera creciente. ``next_attempt_at`` sirve también de
+    vencimiento del reclamo: un trabajo que quedó en ``printing`` porque el
+    worker murió vuelve a tomarse cuando pasa esa hora.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PRINTING = "printing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUSES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_PRINTING, "Imprimiendo"),
+        (STATUS_DONE, "Impreso"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    dispatch_area = models.ForeignKey(
+        DispatchArea, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    payload = models.BinaryField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    printed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        area = self.dispatch_area or "General"
+        return f"Ticket {area} - Comanda #{self.order_id} ({self.get_status_display()})"
+
+
+class ReportJob(models.Model):
+    """
+    Exportación CSV (o reporte JSON) generada en segundo plano.
+
+    ``orders/jobs.py`` la encola desde las vistas ``export_*_csv`` y
+    ``sales_report_by_product`` (rangos grandes); el comando ``run_worker`` la
+    genera en ``MEDIA_ROOT``. ``params_hash`` identifica los parámetros: una
+    solicitud igual a otra reciente reutiliza su archivo en vez de volver a
+    generarlo.
+    """
+
+    KIND_ORDERS = "orders"
+    KIND_MOVEMENTS = "movements"
+    KIND_SALES_BY_PRODUCT = "sales_by_product"
+    KIND_VARIANCE = "variance"
+    KIND_SALES_REPORT = "sales_report"
+    KINDS = [
+        (KIND_ORDERS, "Comandas"),
+        (KIND_MOVEMENTS, "Movimientos de inventario"),
+        (KIND_SALES_BY_PRODUCT, "Ventas por producto"),
+        (KIND_VARIANCE, "Variación de ingredientes"),
+        (KIND_SALES_REPORT, "Reporte de ventas por producto"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUSES = [
+        (STATUS_PENDING, "En cola"),
+        (STATUS_RUNNING, "Generando"),
+        (STATUS_DONE, "Listo"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    params = models.JSONField(default=dict)
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    result = models.FileField(upload_to="reports/", blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "params_hash", "status"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.get_status_display()})"
+
+
 class Company(models.Model):
     """Configuración de la empresa para mostrar en comandas y reportes."""
 
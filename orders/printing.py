@@ -0,0 +1,312 @@
+"""
+Impresión directa de comandas en impresoras térmicas ESC/POS.
+
+Cada comanda se divide por ``product.dispatch_area``: la cocina recibe un
+ticket con sus platos, el bar otro con sus bebidas. Los tickets se generan
+como bytes ESC/POS y se guardan en ``PrintJob``; el comando ``print_worker``
+los envía por TCP (puerto 9100, "raw printing") a la impresora del área.
+
+Solo se crean trabajos para áreas con impresora configurada; los productos
+sin área van a ``PRINTER_DEFAULT_HOST`` si está definido.
+
+Los tickets ya generados (HTML de ``print_order`` y bytes ESC/POS de las
+reimpresiones) se guardan en caché con una estampa de versión: cambia con
+cada evento de la comanda (líneas, pagos, cambio de mesa), con el menú y con
+los datos de la empresa, así que una reimpresión sin cambios no vuelve a
+consultar ni a renderizar nada.
+"""
+
+import hashlib
+import socket
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils import timezone
+
+from core import caching
+
+from .models import Company, DispatchArea, IngredientMovement, OrderEvent, PrintJob
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+# Página de códigos PC858 (Europa occidental con €): cubre ñ y tildes.
+ENCODING = "cp858"
+CODEPAGE = ESC + b"t\x13"
+
+# Tiempo que un worker puede tener reclamado un trabajo antes de que otro
+# lo vuelva a tomar.
+CLAIM_TIMEOUT = timedelta(minutes=2)
+MAX_BACKOFF = 300
+
+
+class Ticket:
+    """Acumula comandos ESC/POS para un ticket."""
+
+    def __init__(self, width=None):
+        self.width = width or settings.PRINTER_LINE_WIDTH
+        self.buffer = bytearray(ESC + b"@" + CODEPAGE)
+
+    def raw(self, data):
+        self.buffer += data
+        return self
+
+    def text(self, line=""):
+        self.buffer += line.encode(ENCODING, errors="replace") + b"\n"
+        return self
+
+    def align(self, where):
+        return self.raw(ESC + b"a" + {"left": b"\x00", "center": b"\x01"}[where])
+
+    def bold(self, on=True):
+        return self.raw(ESC + b"E" + (b"\x01" if on else b"\x00"))
+
+    def size(self, double=False):
+        return self.raw(GS + b"!" + (b"\x11" if double else b"\x00"))
+
+    def rule(self):
+        return self.text("-" * self.width)
+
+    def cut(self):
+        # Avanza el papel y corta parcialmente.
+        return self.raw(b"\n\n\n" + GS + b"V\x42\x00")
+
+    def to_bytes(self):
+        return bytes(self.buffer)
+
+
+def render_ticket(order, area_name, lines, company=None):
+    """
+    Genera el ticket de una comanda para un área.
+
+    ``lines`` es una lista de ``(cantidad, nombre)``. Los tickets de despacho
+    no llevan precios.
+    """
+    ticket = Ticket()
+    ticket.align("center")
+    if company:
+        ticket.text(company.name)
+    ticket.size(double=True).bold().text(area_name.upper()).bold(False).size()
+    ticket.align("left").rule()
+    ticket.bold().text(f"Comanda #{order.id}").bold(False)
+    ticket.text(f"Mesa: {order.table.name if order.table else '-'}")
+    ticket.text(f"Mesero: {order.user.username if order.user else '-'}")
+    ticket.text(f"Fecha: {timezone.localtime(order.created_at):%d/%m/%Y %H:%M}")
+    ticket.rule()
+    ticket.size(double=True)
+    for quantity, name in lines:
+        ticket.text(f"{quantity} x {name}")
+    ticket.size()
+    if order.notes:
+        ticket.rule().bold().text("Notas:").bold(False).text(order.notes)
+    return ticket.cut().to_bytes()
+
+
+def render_payloads(orders, items):
+    """
+    Genera los tickets de cada comanda para las áreas con impresora.
+
+    ``items`` son las líneas de esas comandas con ``product`` ya cargado
+    (por ejemplo las que devuelve ``bulk_create``). Devuelve
+    ``{order_id: {area_id: bytes}}``; ``area_id`` es ``None`` para la
+    impresora general.
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    for item in items:
+        grouped[item.order_id][item.product.dispatch_area_id].append(
+            (item.quantity, item.product.name)
+        )
+
+    areas = DispatchArea.objects.exclude(printer_host="").in_bulk(
+        {area_id for by_area in grouped.values() for area_id in by_area} - {None}
+    )
+    company = Company.objects.first()
+    payloads = defaultdict(dict)
+    for order in orders:
+        for area_id, lines in grouped.get(order.id, {}).items():
+            if area_id is None and not settings.PRINTER_DEFAULT_HOST:
+                continue
+            if area_id is not None and area_id not in areas:
+                continue
+            name = areas[area_id].name if area_id else "General"
+            payloads[order.id][area_id] = render_ticket(order, name, lines, company)
+    return payloads
+
+
+def enqueue_orders(orders, items):
+    """Crea un ``PrintJob`` por comanda y área con impresora."""
+    return _create_jobs(orders, render_payloads(orders, items))
+
+
+def enqueue_order(order):
+    """
+    Encola (o reimprime) los tickets de una comanda ya guardada.
+
+    Los bytes salen de la caché de tickets mientras la comanda no cambie.
+    """
+
+    def build():
+        items = order.orderitem_set.select_related("product").order_by("id")
+        return render_payloads([order], items).get(order.id, {})
+
+    return _create_jobs([order], {order.id: get_ticket(order, "escpos", build)})
+
+
+def _create_jobs(orders, payloads):
+    return PrintJob.objects.bulk_create(
+        [
+            PrintJob(order=order, dispatch_area_id=area_id, payload=payload)
+            for order in orders
+            for area_id, payload in payloads.get(order.id, {}).items()
+        ]
+    )
+
+
+# ==========================
+# 🗃️ CACHÉ DE TICKETS
+# ==========================
+
+TICKET_KEY = "ticket:{order_id}:{kind}:{stamp}"
+TICKET_TIMEOUT = 60 * 60 * 24
+
+
+def ticket_stamp(order):
+    """
+    Estampa de versión del ticket de ``order``.
+
+    Todo cambio de líneas o pagos deja un ``OrderEvent``, así que el último
+    evento basta para saber si la comanda cambió; se agregan los campos que
+    el ticket muestra y que se editan sin evento (mesero, notas).
+    """
+    last_event = OrderEvent.objects.filter(order=order).aggregate(last=Max("id"))
+    raw = ":".join(
+        str(part)
+        for part in (
+            last_event["last"],
+            order.table_id,
+            order.user_id,
+            order.notes,
+            order.is_paid,
+        )
+    )
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+
+def get_ticket(order, kind, build):
+    """
+    Devuelve el ticket ``kind`` de la comanda, generándolo con ``build()``.
+
+    Además de la estampa de la comanda, depende de las etiquetas del menú
+    (nombres de productos, áreas) y de la empresa.
+    """
+    return caching.cached(
+        TICKET_KEY.format(order_id=order.id, kind=kind, stamp=ticket_stamp(order)),
+        build,
+        timeout=TICKET_TIMEOUT,
+        tags=(caching.TAG_MENU, caching.TAG_COMPANY),
+    )
+
+
+def inventory_stamp():
+    """Versión de los saldos: último movimiento más ediciones de ingredientes."""
+    last = IngredientMovement.objects.aggregate(last=Max("id"))["last"]
+    return f"{last}.{caching.version(caching.TAG_INGREDIENT)}"
+
+
+# ==========================
+# 🖨️ ENVÍO A IMPRESORAS
+# ==========================
+
+
+def printer_address(job):
+    """``(host, puerto)`` de la impresora del trabajo, o ``None``."""
+    area = job.dispatch_area
+    if area is None:
+        if not settings.PRINTER_DEFAULT_HOST:
+            return None
+        return settings.PRINTER_DEFAULT_HOST, settings.PRINTER_DEFAULT_PORT
+    if not area.printer_host:
+        return None
+    return area.printer_host, area.printer_port
+
+
+def send(job):
+    """Envía el ticket a su impresora; lanza ``OSError`` si falla."""
+    address = printer_address(job)
+    if address is None:
+        raise OSError("El área no tiene impresora configurada.")
+    with socket.create_connection(address, timeout=settings.PRINTER_TIMEOUT) as conn:
+        conn.sendall(bytes(job.payload))
+
+
+def claim(limit=20):
+    """
+    Reclama hasta ``limit`` trabajos listos para enviar.
+
+    El reclamo es un ``UPDATE`` condicionado al estado que se leyó, así que
+    dos workers no toman el mismo trabajo.
+    """
+    now = timezone.now()
+    candidates = PrintJob.objects.filter(
+        status__in=[PrintJob.STATUS_PENDING, PrintJob.STATUS_PRINTING],
+        next_attempt_at__lte=now,
+    ).order_by("next_attempt_at", "id")[:limit]
+    claimed = []
+    for job_id, status, next_attempt_at in candidates.values_list(
+        "id", "status", "next_attempt_at"
+    ):
+        if PrintJob.objects.filter(
+            id=job_id, status=status, next_attempt_at=next_attempt_at
+        ).update(
+            status=PrintJob.STATUS_PRINTING,
+            next_attempt_at=now + CLAIM_TIMEOUT,
+            attempts=F("attempts") + 1,
+        ):
+            claimed.append(job_id)
+    return list(
+        PrintJob.objects.filter(id__in=claimed)
+        .select_related("dispatch_area")
+        .order_by("id")
+    )
+
+
+def process_jobs(limit=20):
+    """
+    Envía los trabajos pendientes. Devuelve ``(impresos, fallidos)``.
+
+    Un error deja el trabajo pendiente con espera exponencial; al agotar
+    ``PRINT_JOB_MAX_ATTEMPTS`` queda como fallido.
+    """
+    printed = failed = 0
+    for job in claim(limit):
+        try:
+            send(job)
+        except OSError as e:
+            failed += 1
+            job.last_error = str(e) or e.__class__.__name__
+            if job.attempts >= settings.PRINT_JOB_MAX_ATTEMPTS:
+                job.status = PrintJob.STATUS_FAILED
+            else:
+                job.status = PrintJob.STATUS_PENDING
+                job.next_attempt_at = timezone.now() + timedelta(
+                    seconds=min(2**job.attempts, MAX_BACKOFF)
+                )
+            job.save(update_fields=["status", "last_error", "next_attempt_at"])
+        else:
+            printed += 1
+            job.status = PrintJob.STATUS_DONE
+            job.printed_at = timezone.now()
+            job.last_error = ""
+            job.save(update_fields=["status", "printed_at", "last_error"])
+    return printed, failed
+
+
+def retry(jobs):
+    """Vuelve a poner en cola trabajos fallidos (reinicia los intentos)."""
+    return jobs.exclude(status=PrintJob.STATUS_DONE).update(
+        status=PrintJob.STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+    )
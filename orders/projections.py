@@ -0,0 +1,304 @@
+"""
+Proyecciones construidas a partir de ``OrderEvent``.
+
+Cada proyección tiene dos caminos:
+
+- ``apply_*(events)``: actualización incremental con los eventos recién
+  insertados; la llama ``OrderEvent.record()`` dentro de la misma transacción.
+- ``rebuild_*(apps)``: vacía la tabla y la recalcula desde todo el historial
+  con consultas agregadas y ``bulk_create`` (``manage.py replay``).
+
+Las proyecciones solo suman o restan deltas, así que aplicar los eventos uno
+por uno o reconstruir desde cero da el mismo resultado.
+"""
+
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.apps import apps as django_apps
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    DailySales,
+    DispatchQueueItem,
+    OrderBalance,
+    OrderEvent,
+    TableBalance,
+)
+
+
+def _add(model, key_fields, deltas, defaults=None):
+    """
+    Suma deltas a filas identificadas por ``key_fields``.
+
+    ``deltas`` es ``{clave: {campo: delta}}``. Las filas que faltan se crean
+    (con ``defaults[clave]`` si se indica) y luego todo se actualiza con un
+    solo ``UPDATE ... CASE``.
+    """
+    deltas = {key: values for key, values in deltas.items() if any(values.values())}
+    if not deltas:
+        return
+
+    def match(key):
+        return Q(**dict(zip(key_fields, key)))
+
+    model.objects.bulk_create(
+        [
+            model(**dict(zip(key_fields, key)), **(defaults or {}).get(key, {}))
+            for key in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    fields = {field for values in deltas.values() for field in values}
+    model.objects.filter(reduce(or_, (match(key) for key in deltas))).update(
+        **{
+            field: F(field)
+            + Case(
+                *[
+                    When(match(key), then=Value(values.get(field, 0)))
+                    for key, values in deltas.items()
+                ],
+                default=Value(0),
+                output_field=model._meta.get_field(field),
+            )
+            for field in fields
+        }
+    )
+
+
+def _signed(field, signs):
+    """``Sum`` de ``field`` con el signo que corresponde a cada tipo de evento."""
+    output_field = (
+        models.DecimalField(max_digits=12, decimal_places=2)
+        if field == "amount"
+        else models.IntegerField()
+    )
+    return Sum(
+        Case(
+            *[When(kind=kind, then=F(field) * sign) for kind, sign in signs.items()],
+            default=Value(0),
+            output_field=output_field,
+        )
+    )
+
+
+ITEM_SIGNS = {OrderEvent.KIND_ITEM_ADDED: 1, OrderEvent.KIND_ITEM_VOIDED: -1}
+
+
+# ==========================
+# 💰 SALDOS POR COMANDA Y MESA
+# ==========================
+
+
+def apply_order_balances(events):
+    deltas = defaultdict(lambda: {"balance": 0})
+    for event in events:
+        sign = OrderEvent.BALANCE_SIGNS.get(event.kind)
+        if sign:
+            deltas[(event.order_id,)]["balance"] += sign * event.amount
+    _add(OrderBalance, ["order_id"], deltas)
+
+
+def rebuild_order_balances(apps=django_apps):
+    Event = apps.get_model("orders", "OrderEvent")
+    Balance = apps.get_model("orders", "OrderBalance")
+    rows = (
+        Event.objects.values("order")
+        .annotate(total=_signed("amount", OrderEvent.BALANCE_SIGNS))
+        .values_list("order", "total")
+    )
+    Balance.objects.all().delete()
+    created = Balance.objects.bulk_create(
+        [Balance(order_id=order_id, balance=total) for order_id, total in rows],
+        batch_size=1000,
+    )
+    return len(created)
+
+
+def apply_table_balances(events):
+    deltas = defaultdict(lambda: {"balance": 0})
+    for event in events:
+        sign = OrderEvent.BALANCE_SIGNS.get(event.kind)
+        if sign and event.table_id:
+            deltas[(event.table_id,)]["balance"] += sign * event.amount
+        if event.kind == OrderEvent.KIND_MOVED_TABLE and event.amount:
+            if event.from_table_id:
+                deltas[(event.from_table_id,)]["balance"] -= event.amount
+            if event.table_id:
+                deltas[(event.table_id,)]["balance"] += event.amount
+    _add(TableBalance, ["table_id"], deltas)
+
+
+def rebuild_table_balances(apps=django_apps):
+    Event = apps.get_model("orders", "OrderEvent")
+    Balance = apps.get_model("orders", "TableBalance")
+    totals = defaultdict(int)
+    signs = {**OrderEvent.BALANCE_SIGNS, OrderEvent.KIND_MOVED_TABLE: 1}
+    for table_id, total in (
+        Event.objects.filter(table__isnull=False)
+        .values("table")
+        .annotate(total=_signed("amount", signs))
+        .values_list("table", "total")
+    ):
+        totals[table_id] += total
+    for table_id, total in (
+        Event.objects.filter(kind=OrderEvent.KIND_MOVED_TABLE, from_table__isnull=False)
+        .values("from_table")
+        .annotate(total=Sum("amount"))
+        .values_list("from_table", "total")
+    ):
+        totals[table_id] -= total
+    Balance.objects.all().delete()
+    Balance.objects.bulk_create(
+        [
+            Balance(table_id=table_id, balance=total)
+            for table_id, total in totals.items()
+        ]
+    )
+    return len(totals)
+
+
+# ==========================
+# 📈 VENTAS DIARIAS
+# ==========================
+
+
+def apply_daily_sales(events):
+    deltas = defaultdict(lambda: {"quantity": 0, "amount": 0})
+    for event in events:
+        sign = ITEM_SIGNS.get(event.kind)
+        if not sign or not event.product_id:
+            continue
+        key = (timezone.localdate(event.order.created_at), event.product_id)
+        deltas[key]["quantity"] += sign * event.quantity
+        deltas[key]["amount"] += sign * event.amount
+    _add(DailySales, ["date", "product_id"], deltas)
+
+
+def rebuild_daily_sales(apps=django_apps):
+    Event = apps.get_model("orders", "OrderEvent")
+    Sales = apps.get_model("orders", "DailySales")
+    rows = (
+        Event.objects.filter(kind__in=OrderEvent.ITEM_KINDS, product__isnull=False)
+        .annotate(
+            date=TruncDate("order__created_at", tzinfo=timezone.get_current_timezone())
+        )
+        .values("date", "product")
+        .annotate(
+            quantity=_signed("quantity", ITEM_SIGNS),
+            total=_signed("amount", ITEM_SIGNS),
+        )
+        .values_list("date", "product", "quantity", "total")
+    )
+    Sales.objects.all().delete()
+    created = Sales.objects.bulk_create(
+        [
+            Sales(date=date, product_id=product_id, quantity=quantity, amount=total)
+            for date, product_id, quantity, total in rows
+        ],
+        batch_size=1000,
+    )
+    return len(created)
+
+
+# ==========================
+# 🍳 COLA DE DESPACHO
+# ==========================
+
+
+def apply_dispatch_queue(events):
+    deltas = defaultdict(lambda: {"quantity": 0})
+    areas, closed, reopened = {}, set(), set()
+    for event in events:
+        if event.kind == OrderEvent.KIND_PAID:
+            closed.add(event.order_id)
+        elif event.kind == OrderEvent.KIND_REOPENED:
+            reopened.add(event.order_id)
+        elif event.kind in ITEM_SIGNS and event.product_id:
+            if event.order.is_paid:
+                continue
+            key = (event.order_id, event.product_id)
+            deltas[key]["quantity"] += ITEM_SIGNS[event.kind] * event.quantity
+            areas[key] = {"dispatch_area_id": event.product.dispatch_area_id}
+
+    if deltas:
+        _add(DispatchQueueItem, ["order_id", "product_id"], deltas, defaults=areas)
+        DispatchQueueItem.objects.filter(
+            order_id__in={order_id for order_id, _ in deltas}, quantity__lte=0
+        ).delete()
+    if closed:
+        DispatchQueueItem.objects.filter(order_id__in=closed).delete()
+    if reopened:
+        rebuild_dispatch_queue(order_ids=reopened)
+
+
+def rebuild_dispatch_queue(apps=django_apps, order_ids=None):
+    """
+    Recalcula la cola con las líneas de las comandas cuyo último evento de
+    pago no es ``paid``.
+    """
+    Event = apps.get_model("orders", "OrderEvent")
+    Queue = apps.get_model("orders", "DispatchQueueItem")
+    last_state = (
+        Event.objects.filter(
+            order=OuterRef("order"),
+            kind__in=[OrderEvent.KIND_PAID, OrderEvent.KIND_REOPENED],
+        )
+        .order_by("-id")
+        .values("kind")[:1]
+    )
+    events = Event.objects.filter(kind__in=OrderEvent.ITEM_KINDS, product__isnull=False)
+    queue = Queue.objects.all()
+    if order_ids is not None:
+        events = events.filter(order_id__in=order_ids)
+        queue = queue.filter(order_id__in=order_ids)
+    rows = (
+        events.annotate(last_state=Subquery(last_state))
+        .filter(Q(last_state__isnull=True) | ~Q(last_state=OrderEvent.KIND_PAID))
+        .values("order", "product", "product__dispatch_area")
+        .annotate(quantity=_signed("quantity", ITEM_SIGNS))
+        .filter(quantity__gt=0)
+        .values_list("order", "product", "product__dispatch_area", "quantity")
+    )
+    queue.delete()
+    created = Queue.objects.bulk_create(
+        [
+            Queue(
+                order_id=order_id,
+                product_id=product_id,
+                dispatch_area_id=area_id,
+                quantity=quantity,
+            )
+            for order_id, product_id, area_id, quantity in rows
+        ],
+        batch_size=1000,
+    )
+    return len(created)
+
+
+PROJECTIONS = {
+    "order_balances": (apply_order_balances, rebuild_order_balances),
+    "table_balances": (apply_table_balances, rebuild_table_balances),
+    "daily_sales": (apply_daily_sales, rebuild_daily_sales),
+    "dispatch_queue": (apply_dispatch_queue, rebuild_dispatch_queue),
+}
+
+
+def apply(events):
+    """Aplica eventos recién insertados a todas las proyecciones."""
+    for apply_events, _ in PROJECTIONS.values():
+        apply_events(events)
+
+
+def rebuild(names=None, apps=django_apps):
+    """Reconstruye las proyecciones indicadas (todas por defecto)."""
+    results = {}
+    with transaction.atomic():
+        for name in names or PROJECTIONS:
+            _, rebuild_projection = PROJECTIONS[name]
+            results[name] = rebuild_projection(apps)
+    return results
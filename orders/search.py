@@ -0,0 +1,273 @@
+"""
+Índice de búsqueda de texto completo para movimientos, ingredientes,
+productos y comandas.
+
+En SQLite cada tipo de documento vive en una tabla virtual FTS5 (sin acentos
+ni mayúsculas gracias al tokenizador ``unicode61``); en PostgreSQL se usa una
+tabla con una columna ``tsvector`` generada e índice GIN. En otros motores
+``is_available()`` devuelve ``False`` y las vistas vuelven a ``icontains``.
+
+El índice se mantiene sincronizado con señales (``orders/signals.py``) y con
+llamadas explícitas desde los caminos que usan ``bulk_create``.
+
+Para el autocompletado por prefijo, ``Product`` e ``Ingredient`` guardan una
+clave normalizada (``search_name``) con índice propio; ver ``normalize()`` y
+``prefix_q()``.
+"""
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+KIND_MOVEMENT = "movement"
+KIND_INGREDIENT = "ingredient"
+KIND_PRODUCT = "product"
+KIND_ORDER = "order"
+KINDS = [KIND_MOVEMENT, KIND_INGREDIENT, KIND_PRODUCT, KIND_ORDER]
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Clave de búsqueda sin acentos, en minúsculas y con espacios simples."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def prefix_q(field, prefix):
+    """
+    Filtro por prefijo como rango ``[prefijo, prefijo + U+10FFFF)``.
+
+    A diferencia de ``startswith`` (``LIKE 'x%' ESCAPE``), un rango siempre
+    puede resolverse con una búsqueda en el índice del campo.
+    """
+    prefix = normalize(prefix)
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "\U0010ffff"})
+
+
+def table_name(kind):
+    return f"orders_search_{kind}"
+
+
+def is_available(conn=None):
+    """Indica si el motor de base de datos soporta el índice."""
+    return (conn or connection).vendor in ("sqlite", "postgresql")
+
+
+def _pk_column(conn):
+    return "rowid" if conn.vendor == "sqlite" else "id"
+
+
+def create_tables(conn=None):
+    """Crea las tablas del índice si no existen."""
+    conn = conn or connection
+    if not is_available(conn):
+        return
+    with conn.cursor() as cursor:
+        for kind in KINDS:
+            table = table_name(kind)
+            if conn.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                    "body, tokenize='unicode61 remove_diacritics 2')"
+                )
+            else:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "id bigint PRIMARY KEY, body text NOT NULL, "
+                    "document tsvector GENERATED ALWAYS AS "
+                    "(to_tsvector('simple', body)) STORED)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_document_idx "
+                    f"ON {table} USING GIN (document)"
+                )
+
+
+def drop_tables(conn=None):
+    """Elimina las tablas del índice."""
+    conn = conn or connection
+    if not is_available(conn):
+        return
+    with conn.cursor() as cursor:
+        for kind in KINDS:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name(kind)}")
+
+
+def remove(kind, ids, conn=None):
+    """Quita documentos del índice."""
+    conn = conn or connection
+    ids = list(ids)
+    if not ids or not is_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {table_name(kind)} WHERE {_pk_column(conn)} = %s",
+            [(pk,) for pk in ids],
+        )
+
+
+def index(kind, rows, conn=None):
+    """
+    Agrega o reemplaza documentos en el índice.
+
+    ``rows`` es un iterable de tuplas ``(id, texto)``; los textos vacíos solo
+    eliminan el documento anterior.
+    """
+    conn = conn or connection
+    rows = list(rows)
+    if not rows or not is_available(conn):
+        return
+    remove(kind, (pk for pk, _ in rows), conn)
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table_name(kind)} ({_pk_column(conn)}, body) "
+            "VALUES (%s, %s)",
+            [(pk, text) for pk, text in rows if text],
+        )
+
+
+def rebuild(kind, rows, conn=None, batch_size=2000):
+    """Vacía el índice de un tipo y lo vuelve a llenar por lotes."""
+    conn = conn or connection
+    if not is_available(conn):
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table_name(kind)}")
+    count, batch = 0, []
+    sql = f"INSERT INTO {table_name(kind)} ({_pk_column(conn)}, body) VALUES (%s, %s)"
+    with conn.cursor() as cursor:
+        for pk, text in rows:
+            if not text:
+                continue
+            batch.append((pk, text))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+
+def _match(kind, query, conn):
+    """Devuelve ``(from_where_sql, params, rank_sql)`` o ``None`` si no hay términos."""
+    terms = TOKEN_RE.findall(query or "")
+    if not terms:
+        return None
+    table = table_name(kind)
+    if conn.vendor == "sqlite":
+        expression = " ".join(f'"{term}"*' for term in terms)
+        return f"FROM {table} WHERE {table} MATCH %s", [expression], "-rank"
+    expression = " & ".join(f"{term}:*" for term in terms)
+    return (
+        f"FROM {table} WHERE document @@ to_tsquery('simple', %s)",
+        [expression],
+        "ts_rank(document, to_tsquery('simple', %s))",
+    )
+
+
+def matching_ids(kind, query, conn=None):
+    """
+    Expresión para ``pk__in=`` con los ids que coinciden con la búsqueda.
+
+    Devuelve ``None`` si el índice no está disponible o la búsqueda no tiene
+    términos, para que el llamador use su filtro alternativo.
+    """
+    conn = conn or connection
+    if not is_available(conn):
+        return None
+    match = _match(kind, query, conn)
+    if match is None:
+        return None
+    from_where, params, _ = match
+    return RawSQL(f"SELECT {_pk_column(conn)} {from_where}", params)
+
+
+def search(query, kinds=None, limit=20, conn=None):
+    """
+    Busca en los índices y devuelve ``[(kind, id, score)]`` ordenado por
+    relevancia (mayor ``score`` primero).
+
+    La relevancia de bm25 o ``ts_rank`` solo es comparable dentro de una
+    misma tabla (depende de la longitud y frecuencia de términos de cada
+    índice), así que el ``score`` de cada tipo se normaliza contra su mejor
+    resultado: el primero de cada tipo vale 1 y los empates se ordenan según
+    ``kinds``.
+    """
+    conn = conn or connection
+    if not is_available(conn):
+        return []
+    limit = max(int(limit), 1)
+    results = []
+    with conn.cursor() as cursor:
+        for kind in kinds or KINDS:
+            match = _match(kind, query, conn)
+            if match is None:
+                return []
+            from_where, params, rank = match
+            rank_params = params if "%s" in rank else []
+            cursor.execute(
+                f"SELECT {_pk_column(conn)}, {rank} AS score {from_where} "
+                "ORDER BY score DESC LIMIT %s",
+                rank_params + params + [limit],
+            )
+            rows = cursor.fetchall()
+            best = max((score for _, score in rows), default=0) or 1
+            results.extend((kind, pk, score / best) for pk, score in rows)
+    results.sort(key=lambda r: r[2], reverse=True)
+    return results[:limit]
+
+
+# ==========================
+# 📄 DOCUMENTOS POR MODELO
+# ==========================
+
+
+def movement_rows(queryset):
+    return queryset.values_list("id", "reason").iterator()
+
+
+def ingredient_rows(queryset):
+    return queryset.values_list("id", "name").iterator()
+
+
+def product_rows(queryset):
+    return queryset.values_list("id", "name").iterator()
+
+
+def order_rows(queryset):
+    return queryset.values_list("id", "notes").iterator()
+
+
+def rebuild_all(apps_or_models, conn=None):
+    """
+    Reconstruye todos los índices.
+
+    ``apps_or_models`` es el registro de apps (en migraciones) o
+    ``django.apps.apps``.
+    """
+    get = apps_or_models.get_model
+    return {
+        KIND_MOVEMENT: rebuild(
+            KIND_MOVEMENT,
+            movement_rows(get("orders", "IngredientMovement").objects.all()),
+            conn,
+        ),
+        KIND_INGREDIENT: rebuild(
+            KIND_INGREDIENT,
+            ingredient_rows(get("orders", "Ingredient").objects.all()),
+            conn,
+        ),
+        KIND_PRODUCT: rebuild(
+            KIND_PRODUCT, product_rows(get("orders", "Product").objects.all()), conn
+        ),
+        KIND_ORDER: rebuild(
+            KIND_ORDER, order_rows(get("orders", "Order").objects.all()), conn
+        ),
+    }
@@ -0,0 +1,88 @@
+"""
+Señales de la app orders.
+
+Mantienen sincronizado el índice de búsqueda de texto completo e invalidan
+la instantánea del menú del POS y las etiquetas de ``core.caching``.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import caching
+
+from . import menu, search
+from .models import (
+    Company,
+    DispatchArea,
+    Ingredient,
+    IngredientMovement,
+    Order,
+    Product,
+    ProductCategory,
+    Table,
+    Warehouse,
+)
+
+SEARCH_DOCUMENTS = {
+    IngredientMovement: (search.KIND_MOVEMENT, "reason"),
+    Ingredient: (search.KIND_INGREDIENT, "name"),
+    Product: (search.KIND_PRODUCT, "name"),
+    Order: (search.KIND_ORDER, "notes"),
+}
+
+
+@receiver(post_save, sender=IngredientMovement)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+def index_search_document(sender, instance, **kwargs):
+    """Indexa el documento de búsqueda del objeto guardado."""
+    kind, field = SEARCH_DOCUMENTS[sender]
+    search.index(kind, [(instance.pk, getattr(instance, field))])
+
+
+@receiver(post_delete, sender=IngredientMovement)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def remove_search_document(sender, instance, **kwargs):
+    """Quita del índice el documento del objeto eliminado."""
+    kind, _ = SEARCH_DOCUMENTS[sender]
+    search.remove(kind, [instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=DispatchArea)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=DispatchArea)
+def bump_menu_version(sender, **kwargs):
+    """Invalida la instantánea del menú cuando cambia el catálogo."""
+    menu.bump_version()
+
+
+CACHE_TAGS = {
+    Product: caching.TAG_PRODUCT,
+    ProductCategory: caching.TAG_CATEGORY,
+    DispatchArea: caching.TAG_DISPATCH_AREA,
+    Table: caching.TAG_TABLE,
+    Warehouse: caching.TAG_WAREHOUSE,
+    Ingredient: caching.TAG_INGREDIENT,
+    IngredientMovement: caching.TAG_INGREDIENT,
+    Order: caching.TAG_ORDER,
+    Company: caching.TAG_COMPANY,
+}
+
+
+def bump_cache_tag(sender, **kwargs):
+    """
+    Invalida lo guardado en caché bajo la etiqueta del modelo y su sello de
+    cambios (ETag/Last-Modified de las APIs).
+    """
+    caching.bump(CACHE_TAGS[sender])
+
+
+for model in CACHE_TAGS:
+    post_save.connect(bump_cache_tag, sender=model)
+    post_delete.connect(bump_cache_tag, sender=model)
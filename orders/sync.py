@@ -0,0 +1,261 @@
+"""
+Sincronización de comandas capturadas sin conexión.
+
+El POS guarda en IndexedDB las comandas que no pudo enviar y, al recuperar
+la conexión, las manda en un solo lote a ``api_orders_sync``. Cada comanda
+trae su token de cliente (el mismo de ``IdempotencyKey``), así que reenviar
+un lote ya aplicado no duplica nada.
+
+El lote se valida con una consulta por tabla (mesas, productos, tokens) y las
+comandas aceptadas se escriben con ``bulk_create`` dentro de una transacción,
+sin pasar por ``OrderItem.save()``.
+"""
+
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import metrics, printing, search
+from .models import (
+    IdempotencyKey,
+    IngredientMovement,
+    Order,
+    OrderEvent,
+    OrderItem,
+    Product,
+    ProductIngredient,
+    Table,
+)
+
+MAX_BATCH_SIZE = 100
+MAX_QUANTITY = 999
+
+STATUS_CREATED = "created"
+STATUS_DUPLICATE = "duplicate"
+STATUS_CONFLICT = "conflict"
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: ``1e400`` en JSON llega como ``inf``.
+        return None
+
+
+def parse_items(pairs):
+    """
+    Normaliza los pares ``(producto, cantidad)`` de una comanda.
+
+    Devuelve ``({product_id: cantidad}, errores)``; las cantidades en cero se
+    descartan y las repetidas se suman. La usan tanto ``create_order`` como
+    el lote sin conexión.
+    """
+    quantities, errors = {}, []
+    for product_id, quantity in pairs:
+        product_id, quantity = _as_int(product_id), _as_int(quantity or 0)
+        if product_id is None or quantity is None:
+            errors.append("Producto o cantidad inválidos.")
+        elif quantity < 0:
+            errors.append("Las cantidades no pueden ser negativas.")
+        elif quantity:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if any(quantity > MAX_QUANTITY for quantity in quantities.values()):
+        errors.append(f"La cantidad máxima por producto es {MAX_QUANTITY}.")
+    return quantities, errors
+
+
+def product_errors(quantities, products):
+    """
+    Errores de los productos pedidos: inexistentes o agotados.
+
+    ``products`` es el diccionario de ``Product.objects.in_bulk``.
+    """
+    errors = []
+    for product_id in quantities:
+        product = products.get(product_id)
+        if product is None:
+            errors.append(f"El producto {product_id} no existe.")
+        elif not product.is_available:
+            errors.append(f"{product.name} está agotado.")
+    return errors
+
+
+def _parse_entry(entry):
+    """
+    Normaliza una comanda del lote.
+
+    Devuelve ``(token, table_id, {product_id: cantidad}, notas, errores)``.
+    """
+    errors = []
+    if not isinstance(entry, dict):
+        return "", None, {}, None, ["Formato de comanda inválido."]
+
+    token = str(entry.get("token") or "").strip()
+    if not token:
+        errors.append("Falta el token de la comanda.")
+
+    table_id = _as_int(entry.get("table"))
+    if table_id is None:
+        errors.append("Mesa inválida.")
+
+    items = entry.get("items")
+    if not isinstance(items, dict):
+        errors.append("Formato de productos inválido.")
+        items = {}
+    quantities, item_errors = parse_items(items.items())
+    errors.extend(item_errors)
+    if not quantities and not errors:
+        errors.append("No se seleccionaron productos.")
+
+    notes = str(entry.get("notes") or "").strip() or None
+    return token, table_id, quantities, notes, errors
+
+
+def sync_orders(user, entries):
+    """
+    Aplica un lote de comandas sin conexión y devuelve un resultado por
+    comanda, en el mismo orden::
+
+        {"token": ..., "status": "created" | "duplicate" | "conflict",
+         "order": id | None, "errors": [...]}
+
+    ``duplicate`` indica que el token ya se había aplicado (se devuelve la
+    comanda existente); ``conflict`` que la comanda no puede crearse tal como
+    viene (mesa o producto inexistente, producto agotado…) y no debe
+    reenviarse sin cambios.
+    """
+    try:
+        return _sync_orders(user, entries)
+    except IntegrityError:
+        # Otro envío del mismo lote ganó la carrera por algún token: al
+        # repetir, esos tokens ya aparecen como duplicados.
+        return _sync_orders(user, entries)
+
+
+def _sync_orders(user, entries):
+    parsed = [_parse_entry(entry) for entry in entries]
+
+    hashes = {
+        token: IdempotencyKey.hash_token(user, token) for token, *_ in parsed if token
+    }
+    existing = dict(
+        IdempotencyKey.objects.filter(
+            key_hash__in=hashes.values(), expires_at__gt=timezone.now()
+        ).values_list("key_hash", "order_id")
+    )
+    tables = Table.objects.in_bulk({t for _, t, *_ in parsed if t is not None})
+    products = Product.objects.in_bulk(
+        {pk for _, _, quantities, *_ in parsed for pk in quantities}
+    )
+
+    results, accepted, seen = [], [], {}
+    for token, table_id, quantities, notes, errors in parsed:
+        result = {"token": token, "status": STATUS_CONFLICT, "order": None}
+        results.append(result)
+
+        key_hash = hashes.get(token)
+        if key_hash in existing:
+            result.update(status=STATUS_DUPLICATE, order=existing[key_hash])
+            continue
+        if key_hash in seen:
+            # Token repetido dentro del mismo lote.
+            seen[key_hash].append(result)
+            result["status"] = STATUS_DUPLICATE
+            continue
+
+        if table_id is not None and table_id not in tables:
+            errors.append(f"La mesa {table_id} no existe.")
+        errors.extend(product_errors(quantities, products))
+        if errors:
+            result["errors"] = errors
+            continue
+
+        seen[key_hash] = [result]
+        accepted.append((key_hash, table_id, quantities, notes))
+
+    if accepted:
+        orders = create_orders(user, accepted, tables, products)
+        for (key_hash, *_), order in zip(accepted, orders):
+            for result in seen[key_hash]:
+                result["order"] = order.id
+            seen[key_hash][0]["status"] = STATUS_CREATED
+    return results
+
+
+def create_orders(user, accepted, tables, products):
+    """
+    Escribe comandas en bloque, descuenta el inventario, registra sus eventos
+    y encola sus tickets de impresión.
+
+    ``accepted`` es una lista de ``(key_hash, table_id, {product_id: cant},
+    notas)``; ``key_hash`` puede ser ``None`` si la comanda no trae token.
+    ``tables`` y ``products`` son los diccionarios de ``in_bulk``.
+    """
+    now = timezone.now()
+    ttl = IdempotencyKey.ttl()
+    start = time.perf_counter()
+    with transaction.atomic():
+        orders = Order.objects.bulk_create(
+            [
+                Order(table=tables[table_id], user=user, notes=notes)
+                for _, table_id, _, notes in accepted
+            ]
+        )
+        hashes = [key_hash for key_hash, *_ in accepted if key_hash]
+        if hashes:
+            IdempotencyKey.objects.filter(
+                key_hash__in=hashes, expires_at__lte=now
+            ).delete()
+            IdempotencyKey.objects.bulk_create(
+                [
+                    IdempotencyKey(key_hash=key_hash, order=order, expires_at=now + ttl)
+                    for (key_hash, *_), order in zip(accepted, orders)
+                    if key_hash
+                ]
+            )
+        items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=products[product_id], quantity=quantity)
+                for (_, _, quantities, _), order in zip(accepted, orders)
+                for product_id, quantity in quantities.items()
+            ]
+        )
+
+        recipes = defaultdict(list)
+        for product_id, ingredient_id, quantity in ProductIngredient.objects.filter(
+            product_id__in={item.product_id for item in items}
+        ).values_list("product_id", "ingredient_id", "quantity"):
+            recipes[product_id].append((ingredient_id, quantity))
+
+        IngredientMovement.bulk_apply(
+            [
+                IngredientMovement(
+                    ingredient_id=ingredient_id,
+                    quantity=-(quantity * Decimal(item.quantity)),
+                    kind=IngredientMovement.KIND_SALE,
+                    order=item.order,
+                    order_item=item,
+                    user=user,
+                    reason=f"Uso en {item.product.name}, Comanda #{item.order.id}",
+                )
+                for item in items
+                for ingredient_id, quantity in recipes[item.product_id]
+            ]
+        )
+        search.index(
+            search.KIND_ORDER,
+            [(order.pk, order.notes) for order in orders if order.notes],
+        )
+        OrderEvent.record(
+            [OrderEvent.for_order(order) for order in orders]
+            + [OrderEvent.for_item(item, OrderEvent.KIND_ITEM_ADDED) for item in items]
+        )
+        # Los tickets quedan en la misma transacción: si la comanda se
+        # guarda, su impresión también.
+        printing.enqueue_orders(orders, items)
+    metrics.observe_orders(orders, items, time.perf_counter() - start)
+    return orders
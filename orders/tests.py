@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import csv
+import importlib
+import json
+import queue
+import socket
+import socketserver
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import caching, metrics, profiling
+from core.checks import check_shared_cache
+from core.queries import assert_no_n_plus_one, inspect_queries
+
+from . import dates, exports, jobs, printing
+from .models import (
+    DailySales,
+    DispatchArea,
+    DispatchQueueItem,
+    IdempotencyKey,
+    Ingredient,
+    IngredientMovement,
+    Order,
+    OrderBalance,
+    OrderItem,
+    Payment,
+    PrintJob,
+    Product,
+    ProductCategory,
+    ProductIngredient,
+    ReportJob,
+    Shift,
+    Table,
+    TableBalance,
+)
+
+
+class OrderTestCase(TestCase):
+    """Datos base: una mesa, un administrador con turno abierto y dos productos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "x")
+        cls.shift = Shift.objects.create(user=cls.user)
+        cls.table = Table.objects.create(name="1")
+        category = ProductCategory.objects.create(name="Platos")
+        area = DispatchArea.objects.create(name="Cocina")
+        cls.ham = Ingredient.objects.create(name="Jamón", unit="g")
+        cls.sandwich = Product.objects.create(
+            name="Sándwich", category=category, dispatch_area=area, price=100
+        )
+        cls.coffee = Product.objects.create(name="Café", category=category, price=20)
+        ProductIngredient.objects.create(
+            product=cls.sandwich, ingredient=cls.ham, quantity=50
+        )
+
+    def setUp(self):
+        # Las versiones de caché sobreviven al rollback de cada test.
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_order(self, *lines, table=None):
+        order = Order.objects.create(table=table or self.table, user=self.user)
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def pay(self, amount, table=None, **fields):
+        return Payment.post(
+            table or self.table,
+            [Payment.build(Payment.TENDER_CASH, amount, **fields)],
+            user=self.user,
+        )
+
+    def order_balance(self, order):
+        return OrderBalance.objects.get(order=order).balance
+
+    def table_balance(self, table=None):
+        return TableBalance.objects.get(table=table or self.table).balance
+
+
+# ==========================
+# 🧾 ENVÍO DE COMANDAS
+# ==========================
+
+
+class CreateOrderTests(OrderTestCase):
+    def submit(self, token, quantities):
+        return self.client.post(
+            reverse("create_order", args=[self.table.id]),
+            {
+                "request_token": token,
+                "items": json.dumps({p.id: q for p, q in quantities}),
+            },
+        )
+
+    def test_repeated_request_token_returns_the_first_order(self):
+        first = self.submit("tok-1", [(self.sandwich, 2)])
+        again = self.submit("tok-1", [(self.sandwich, 2)])
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(first.context["order"], again.context["order"])
+        self.assertEqual(self.table_balance(), Decimal("200"))
+        self.ham.refresh_from_db()
+        self.assertEqual(self.ham.stock_quantity, Decimal("-100"))
+
+    def test_tokens_are_scoped_per_user(self):
+        self.submit("tok-1", [(self.coffee, 1)])
+        other = User.objects.create_superuser("otro", "otro@example.com", "x")
+        self.client.force_login(other)
+        self.submit("tok-1", [(self.coffee, 1)])
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_different_tokens_create_different_orders(self):
+        self.submit("tok-1", [(self.coffee, 1)])
+        self.submit("tok-2", [(self.coffee, 1)])
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_unknown_product_rejects_the_whole_order(self):
+        unknown = Product.objects.order_by("-id").first().id + 1
+        response = self.client.post(
+            reverse("create_order", args=[self.table.id]),
+            {"items": json.dumps({self.sandwich.id: 1, unknown: 2})},
+            follow=True,
+        )
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(
+            [str(m) for m in response.context["messages"]],
+            [f"❌ El producto {unknown} no existe. No se creó la comanda."],
+        )
+
+    def test_legacy_product_fields_are_still_accepted(self):
+        self.client.post(
+            reverse("create_order", args=[self.table.id]),
+            {f"product_{self.coffee.id}": "2", f"product_{self.sandwich.id}": "0"},
+        )
+
+        order = Order.objects.get()
+        self.assertEqual(
+            list(order.orderitem_set.values_list("product", "quantity")),
+            [(self.coffee.id, 2)],
+        )
+
+
+# ==========================
+# 📡 COMANDAS SIN CONEXIÓN
+# ==========================
+
+
+class OrderSyncTests(OrderTestCase):
+    def sync(self, *entries, body=None):
+        return self.client.post(
+            reverse("api_orders_sync"),
+            body or json.dumps({"orders": list(entries)}),
+            content_type="application/json",
+        )
+
+    def entry(self, token, quantities, table=None):
+        return {
+            "token": token,
+            "table": (table or self.table).id,
+            "items": {str(product.id): quantity for product, quantity in quantities},
+        }
+
+    def test_batch_creates_orders_once(self):
+        batch = [
+            self.entry("a", [(self.sandwich, 1)]),
+            self.entry("b", [(self.coffee, 2)]),
+        ]
+        first = self.sync(*batch).json()["results"]
+        again = self.sync(*batch).json()["results"]
+
+        self.assertEqual([r["status"] for r in first], ["created", "created"])
+        self.assertEqual([r["status"] for r in again], ["duplicate", "duplicate"])
+        self.assertEqual([r["order"] for r in again], [r["order"] for r in first])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(self.table_balance(), Decimal("140"))
+
+    def test_repeated_token_in_one_batch_creates_one_order(self):
+        entry = self.entry("a", [(self.sandwich, 1)])
+        results = self.sync(entry, entry).json()["results"]
+
+        self.assertEqual([r["status"] for r in results], ["created", "duplicate"])
+        self.assertEqual(results[0]["order"], results[1]["order"])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_conflicting_entries_do_not_block_the_rest(self):
+        self.coffee.is_available = False
+        self.coffee.save()
+        results = self.sync(
+            self.entry("ok", [(self.sandwich, 1)]),
+            self.entry("sold-out", [(self.coffee, 1)]),
+            {"token": "no-table", "table": 999, "items": {str(self.sandwich.id): 1}},
+            {"token": "no-product", "table": self.table.id, "items": {"999": 1}},
+            self.entry("too-many", [(self.sandwich, 1000)]),
+        ).json()["results"]
+
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["created", "conflict", "conflict", "conflict", "conflict"],
+        )
+        self.assertTrue(all(r["errors"] for r in results[1:]))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_overflowing_quantity_is_a_conflict(self):
+        body = '{"orders": [{"token": "x", "table": %d, "items": {"%d": 1e400}}]}' % (
+            self.table.id,
+            self.sandwich.id,
+        )
+        response = self.sync(body=body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["status"], "conflict")
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_order_rejects_sold_out_product(self):
+        self.coffee.is_available = False
+        self.coffee.save()
+        self.client.post(
+            reverse("create_order", args=[self.table.id]),
+            {"items": json.dumps({self.coffee.id: 1})},
+        )
+        self.assertFalse(Order.objects.exists())
+
+
+# ==========================
+# 🚫 ANULACIÓN
+# ==========================
+
+
+class VoidOrderTests(OrderTestCase):
+    def test_void_unpaid_order_clears_its_balance(self):
+        first = self.create_order((self.sandwich, 1), (self.coffee, 1))
+        self.create_order((self.sandwich, 1), (self.coffee, 1))
+        self.assertEqual(self.table_balance(), Decimal("240"))
+
+        first.void(user=self.user)
+
+        self.assertEqual(self.order_balance(first), 0)
+        self.assertEqual(self.table_balance(), Decimal("120"))
+        self.ham.refresh_from_db()
+        self.assertEqual(self.ham.stock_quantity, Decimal("-50"))
+
+    def test_paid_order_cannot_be_voided(self):
+        first = self.create_order((self.sandwich, 1), (self.coffee, 1))
+        first.mark_paid(user=self.user)
+        self.create_order((self.sandwich, 1), (self.coffee, 1))
+
+        with self.assertRaises(ValueError):
+            first.void(user=self.user)
+
+        first.refresh_from_db()
+        self.assertFalse(first.is_void)
+        self.assertEqual(first.orderitem_set.count(), 2)
+        self.assertEqual(self.order_balance(first), 0)
+        self.assertEqual(self.table_balance(), Decimal("120"))
+        self.assertEqual(self.pay("120"), 0)
+
+    def test_partially_paid_order_cannot_be_voided_or_reduced(self):
+        order = self.create_order((self.sandwich, 1))
+        line = order.orderitem_set.get()
+        self.pay("40")
+
+        with self.assertRaises(ValueError):
+            order.void(user=self.user)
+        with self.assertRaises(ValueError):
+            order.update_items({line.id: 0}, user=self.user)
+
+        self.assertEqual(self.order_balance(order), Decimal("60"))
+        self.assertEqual(self.table_balance(), Decimal("60"))
+        order.update_items({line.id: 2}, user=self.user)
+        self.assertEqual(self.table_balance(), Decimal("160"))
+
+    def test_void_after_reverting_partial_payment(self):
+        order = self.create_order((self.sandwich, 1))
+        self.pay("40")
+        order.mark_paid(user=self.user)
+        order.reopen(user=self.user)
+
+        order.void(user=self.user)
+
+        self.assertEqual(self.order_balance(order), 0)
+        self.assertEqual(self.table_balance(), 0)
+
+    def test_edit_page_does_not_void_partially_paid_order(self):
+        order = self.create_order((self.sandwich, 1))
+        self.pay("40")
+        url = reverse("edit_order", args=[order.id])
+
+        response = self.client.get(url)
+        self.assertFalse(response.context["can_edit_items"])
+        self.assertContains(response, "tiene abonos")
+        self.client.post(url, {"action": "void"})
+
+        order.refresh_from_db()
+        self.assertFalse(order.is_void)
+        self.assertEqual(self.table_balance(), Decimal("60"))
+
+    def test_edit_page_does_not_void_paid_order(self):
+        order = self.create_order((self.sandwich, 2))
+        self.pay("200")
+        url = reverse("edit_order", args=[order.id])
+
+        self.assertFalse(self.client.get(url).context["can_edit_items"])
+        self.client.post(url, {"action": "void"})
+
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertFalse(order.is_void)
+        self.assertEqual(self.table_balance(), 0)
+
+
+# ==========================
+# 📦 INVENTARIO
+# ==========================
+
+
+class InventoryAdjustmentTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order((self.sandwich, 2), (self.coffee, 1))
+        self.sandwich_line = self.order.orderitem_set.get(product=self.sandwich)
+        self.coffee_line = self.order.orderitem_set.get(product=self.coffee)
+        # La receta cambia después de la venta.
+        ProductIngredient.objects.filter(product=self.sandwich).update(quantity=80)
+
+    def ham_stock(self):
+        self.ham.refresh_from_db()
+        return self.ham.stock_quantity
+
+    def test_editing_one_line_does_not_recost_the_others(self):
+        self.order.update_items({self.coffee_line.id: 3}, user=self.user)
+
+        self.assertEqual(self.ham_stock(), Decimal("-100"))
+        self.assertFalse(
+            IngredientMovement.objects.filter(
+                order=self.order, kind=IngredientMovement.KIND_REVERSAL
+            ).exists()
+        )
+
+    def test_changed_line_is_scaled_by_what_was_sold(self):
+        self.order.update_items({self.sandwich_line.id: 1}, user=self.user)
+        self.assertEqual(self.ham_stock(), Decimal("-50"))
+
+        self.order.update_items({self.sandwich_line.id: 3}, user=self.user)
+        self.assertEqual(self.ham_stock(), Decimal("-150"))
+
+        self.order.update_items({self.sandwich_line.id: 0}, user=self.user)
+        self.assertEqual(self.ham_stock(), 0)
+
+    def test_deleting_a_line_returns_its_deduction(self):
+        self.sandwich_line.delete()
+
+        self.assertEqual(self.ham_stock(), 0)
+
+
+class VarianceReportTests(OrderTestCase):
+    def move(self, quantity, kind, when=None):
+        # Ingrediente fresco: ``add_stock`` guarda el stock que tiene en memoria.
+        ingredient = Ingredient.objects.get(pk=self.ham.pk)
+        movement = IngredientMovement.objects.create(
+            ingredient=ingredient, quantity=quantity, kind=kind, user=self.user
+        )
+        if when:
+            IngredientMovement.objects.filter(pk=movement.pk).update(created_at=when)
+
+    def test_opening_closing_and_actual_usage(self):
+        now = timezone.now()
+        start, end = now - timedelta(hours=1), now + timedelta(hours=1)
+        self.move(1000, IngredientMovement.KIND_PURCHASE, when=now - timedelta(days=2))
+        self.move(500, IngredientMovement.KIND_PURCHASE)
+        self.create_order((self.sandwich, 2))
+        self.move(-30, IngredientMovement.KIND_WASTE)
+        self.move(-20, IngredientMovement.KIND_SALE, when=now + timedelta(hours=2))
+
+        (row,) = exports.compute_ingredient_variance(start, end)
+
+        self.assertEqual(row["ingredient"], self.ham)
+        self.assertEqual(row["opening"], 1000)
+        self.assertEqual(row["purchases"], 500)
+        self.assertEqual(row["closing"], 1370)
+        # inicial + compras - final: la venta (100) más la merma (30).
+        self.assertEqual(row["actual"], 130)
+        self.assertEqual(row["theoretical"], 100)
+        self.assertEqual(row["variance"], 30)
+        self.assertEqual(row["variance_pct"], 30)
+
+
+class MovementTests(OrderTestCase):
+    def migration(self, name):
+        return importlib.import_module(f"orders.migrations.{name}")
+
+    def test_backfill_types_and_links_movements_by_reason(self):
+        order = self.create_order((self.sandwich, 1))
+        line = order.orderitem_set.get()
+        IngredientMovement.objects.all().delete()
+        sale, purchase, orphan = IngredientMovement.objects.bulk_create(
+            [
+                IngredientMovement(
+                    ingredient=self.ham,
+                    quantity=-50,
+                    reason=f"Uso en Sándwich, Comanda #{order.id}",
+                ),
+                IngredientMovement(ingredient=self.ham, quantity=500, reason="Compra"),
+                IngredientMovement(
+                    ingredient=self.ham,
+                    quantity=-50,
+                    reason=f"Uso en Sándwich, Comanda #{order.id + 1}",
+                ),
+            ]
+        )
+
+        self.migration("0010_ingredientmovement_kind").classify_movements(apps, None)
+        self.migration(
+            "0011_ingredientmovement_order_and_more"
+        ).link_movements_to_orders(apps, None)
+
+        sale.refresh_from_db()
+        purchase.refresh_from_db()
+        orphan.refresh_from_db()
+        self.assertEqual(sale.kind, IngredientMovement.KIND_SALE)
+        self.assertEqual((sale.order, sale.order_item), (order, line))
+        self.assertEqual(purchase.kind, IngredientMovement.KIND_PURCHASE)
+        self.assertIsNone(purchase.order)
+        self.assertEqual(orphan.kind, IngredientMovement.KIND_SALE)
+        self.assertIsNone(orphan.order)
+
+    def test_order_number_search_uses_the_order_link(self):
+        order = self.create_order((self.sandwich, 1))
+        other = self.create_order((self.sandwich, 2))
+        # Una razón que menciona la comanda no basta: cuenta el enlace.
+        IngredientMovement.objects.filter(order=other).update(
+            reason=f"Uso en Sándwich, Comanda #{order.id}"
+        )
+
+        for search in (f"#{order.id}", str(order.id)):
+            response = self.client.get(reverse("report_movements"), {"search": search})
+            self.assertEqual(
+                [m.order_id for m in response.context["movements"]], [order.id]
+            )
+        response = self.client.get(reverse("report_movements"), {"search": "Sándwich"})
+        self.assertEqual(len(response.context["movements"]), 2)
+
+
+# ==========================
+# 💳 PAGOS
+# ==========================
+
+
+class PaymentTests(OrderTestCase):
+    def test_split_payment_with_tip_and_change(self):
+        order = self.create_order((self.sandwich, 2), (self.coffee, 1))
+        payments = [
+            Payment.build(Payment.TENDER_CASH, "120", tip="10", received="150"),
+            Payment.build(Payment.TENDER_CARD, "100", tip="5"),
+        ]
+        self.assertEqual(payments[0].change, Decimal("20"))
+        self.assertEqual(payments[1].change, 0)
+
+        remaining = Payment.post(self.table, payments, user=self.user)
+
+        self.assertEqual(remaining, 0)
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertEqual(self.order_balance(order), 0)
+        self.assertEqual(self.table_balance(), 0)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.payment_count, 2)
+        self.assertEqual(self.shift.cash_amount, Decimal("120"))
+        self.assertEqual(self.shift.cash_tips, Decimal("10"))
+        self.assertEqual(self.shift.card_amount, Decimal("100"))
+        self.assertEqual(self.shift.card_tips, Decimal("5"))
+        self.assertEqual(self.shift.expected_cash, Decimal("130"))
+
+    def test_partial_payment_settles_oldest_order_first(self):
+        first = self.create_order((self.sandwich, 1))
+        second = self.create_order((self.sandwich, 1))
+
+        self.assertEqual(self.pay("150"), Decimal("50"))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.is_paid)
+        self.assertFalse(second.is_paid)
+        self.assertEqual(self.order_balance(second), Decimal("50"))
+
+    def test_payment_rejects_invalid_amounts(self):
+        self.create_order((self.coffee, 1))
+        with self.assertRaises(ValueError):
+            Payment.build(Payment.TENDER_CASH, "20", received="10")
+        with self.assertRaises(ValueError):
+            self.pay("25")
+        self.assertEqual(self.table_balance(), Decimal("20"))
+
+
+class ShiftTests(OrderTestCase):
+    def test_counters_accumulate_and_close_computes_the_difference(self):
+        Shift.objects.filter(pk=self.shift.pk).update(opening_cash=50)
+        self.create_order((self.sandwich, 1), (self.coffee, 2))
+        Payment.post(
+            self.table,
+            [
+                Payment.build(Payment.TENDER_CASH, 100, tip=10, received=120),
+                Payment.build(Payment.TENDER_CARD, 40, tip=5),
+            ],
+            user=self.user,
+        )
+
+        shift = Shift.objects.get(pk=self.shift.pk)
+        self.assertEqual(shift.payment_count, 2)
+        self.assertEqual(
+            shift.tender_rows(),
+            [("Efectivo", 100, 10), ("Tarjeta", 40, 5), ("Transferencia", 0, 0)],
+        )
+        self.assertEqual((shift.total_amount, shift.total_tips), (140, 15))
+        self.assertEqual(shift.expected_cash, 160)
+
+        response = self.client.post(
+            reverse("shift_current"),
+            {"action": "close", "amount": "155", "notes": "Faltan 5"},
+        )
+
+        self.assertRedirects(response, reverse("shift_report", args=[shift.id]))
+        shift.refresh_from_db()
+        self.assertFalse(shift.is_open)
+        self.assertEqual(shift.cash_difference, -5)
+        self.assertIsNone(Shift.current(self.user))
+        self.create_order((self.coffee, 1))
+        with self.assertRaisesMessage(ValueError, "Abre un turno de caja"):
+            self.pay(20)
+
+
+class ReopenOrderTests(OrderTestCase):
+    def test_pay_reopen_pay(self):
+        order = self.create_order((self.sandwich, 2))
+        self.assertEqual(self.pay("200"), 0)
+
+        self.assertTrue(order.reopen(user=self.user))
+
+        self.assertEqual(self.order_balance(order), Decimal("200"))
+        self.assertEqual(self.table_balance(), Decimal("200"))
+        self.assertEqual(self.pay("200"), 0)
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertEqual(self.order_balance(order), 0)
+
+    def test_reopen_restores_partial_payments_and_paid_rest(self):
+        order = self.create_order((self.sandwich, 2))
+        self.pay("50")
+        order.mark_paid(user=self.user)
+
+        order.reopen(user=self.user)
+        self.assertEqual(self.order_balance(order), Decimal("200"))
+
+        order.mark_paid(user=self.user)
+        order.reopen(user=self.user)
+        self.assertEqual(self.order_balance(order), Decimal("200"))
+        self.assertEqual(self.table_balance(), Decimal("200"))
+
+    def test_reopen_unpaid_order_does_nothing(self):
+        order = self.create_order((self.coffee, 1))
+        self.assertFalse(order.reopen(user=self.user))
+        self.assertEqual(self.order_balance(order), Decimal("20"))
+
+
+# ==========================
+# 🖨️ IMPRESIÓN
+# ==========================
+
+
+class _PrinterHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        chunks = []
+        while data := self.request.recv(4096):
+            chunks.append(data)
+        self.server.received.put(b"".join(chunks))
+
+
+class FakePrinter(socketserver.ThreadingTCPServer):
+    """Impresora de red de prueba: guarda los bytes de cada conexión."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _PrinterHandler)
+        self.received = queue.Queue()
+        self.port = self.server_address[1]
+        threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+    def next_ticket(self):
+        return self.received.get(timeout=2)
+
+
+class PrintingTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kitchen = self.printer()
+        self.general = self.printer()
+        self.enterContext(
+            override_settings(
+                PRINTER_DEFAULT_HOST="127.0.0.1",
+                PRINTER_DEFAULT_PORT=self.general.port,
+                PRINT_JOB_MAX_ATTEMPTS=3,
+            )
+        )
+        self.area = self.sandwich.dispatch_area
+        self.route_area_to(self.kitchen.port)
+        self.order = self.create_order((self.sandwich, 2), (self.coffee, 1))
+
+    def printer(self):
+        printer = FakePrinter()
+        self.addCleanup(printer.close)
+        return printer
+
+    def route_area_to(self, port):
+        DispatchArea.objects.filter(pk=self.area.pk).update(
+            printer_host="127.0.0.1", printer_port=port
+        )
+
+    def closed_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def test_ticket_is_escpos_without_prices(self):
+        self.order.notes = "Sin cebolla"
+        ticket = printing.render_ticket(self.order, "Cocina", [(2, "Sándwich")])
+
+        self.assertTrue(ticket.startswith(printing.ESC + b"@" + printing.CODEPAGE))
+        self.assertTrue(ticket.endswith(printing.GS + b"V\x42\x00"))
+        for text in ("COCINA", f"Comanda #{self.order.id}", "2 x Sándwich"):
+            self.assertIn(text.encode(printing.ENCODING), ticket)
+        self.assertIn(b"Sin cebolla", ticket)
+        self.assertNotIn(b"100", ticket)
+
+    def test_order_is_split_by_dispatch_area(self):
+        jobs = printing.enqueue_order(self.order)
+
+        self.assertEqual({job.dispatch_area_id for job in jobs}, {self.area.id, None})
+        self.assertEqual(printing.process_jobs(), (2, 0))
+        kitchen, general = self.kitchen.next_ticket(), self.general.next_ticket()
+        self.assertIn("2 x Sándwich".encode(printing.ENCODING), kitchen)
+        self.assertNotIn("Café".encode(printing.ENCODING), kitchen)
+        self.assertIn(b"GENERAL", general)
+        self.assertIn("1 x Café".encode(printing.ENCODING), general)
+        self.assertEqual(
+            set(PrintJob.objects.values_list("status", flat=True)),
+            {PrintJob.STATUS_DONE},
+        )
+
+    @override_settings(PRINTER_DEFAULT_HOST="")
+    def test_items_without_area_need_the_default_printer(self):
+        (job,) = printing.enqueue_order(self.order)
+
+        self.assertEqual(job.dispatch_area_id, self.area.id)
+
+    @override_settings(PRINTER_DEFAULT_HOST="")
+    def test_failures_back_off_until_failed_and_retry_requeues(self):
+        self.route_area_to(self.closed_port())
+        (job,) = printing.enqueue_order(self.order)
+
+        for attempt, backoff in ((1, 2), (2, 4)):
+            started = timezone.now()
+            self.assertEqual(printing.process_jobs(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.status, PrintJob.STATUS_PENDING)
+            self.assertEqual(job.attempts, attempt)
+            self.assertNotEqual(job.last_error, "")
+            delay = (job.next_attempt_at - started).total_seconds()
+            self.assertAlmostEqual(delay, backoff, delta=1)
+            # No se reintenta antes de la espera.
+            self.assertEqual(printing.process_jobs(), (0, 0))
+            PrintJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+
+        self.assertEqual(printing.process_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 3)
+
+        self.route_area_to(self.kitchen.port)
+        self.assertEqual(printing.retry(PrintJob.objects.filter(pk=job.pk)), 1)
+        self.assertEqual(printing.process_jobs(), (1, 0))
+        self.kitchen.next_ticket()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (PrintJob.STATUS_DONE, 1))
+
+
+class TicketCacheTests(OrderTestCase):
+    def test_ticket_is_cached_until_the_order_or_menu_changes(self):
+        order = self.create_order((self.sandwich, 1))
+        builds = []
+
+        def ticket():
+            return printing.get_ticket(
+                Order.objects.get(pk=order.pk),
+                "test",
+                lambda: builds.append(1) or len(builds),
+            )
+
+        self.assertEqual((ticket(), ticket()), (1, 1))
+
+        OrderItem.objects.create(order=order, product=self.coffee, quantity=1)
+        self.assertEqual((ticket(), ticket()), (2, 2))
+
+        caching.bump(caching.TAG_MENU)
+        self.assertEqual(ticket(), 3)
+
+    def test_print_preview_is_rendered_once(self):
+        order = self.create_order((self.sandwich, 1))
+        url = reverse("print_order", args=[order.id])
+        self.client.get(url)
+
+        with mock.patch("orders.views.render_to_string") as render:
+            cached = self.client.get(url)
+            render.assert_not_called()
+        self.assertContains(cached, "Sándwich")
+
+
+# ==========================
+# 🔁 CONSULTAS N+1
+# ==========================
+
+
+class QueryCountTests(OrderTestCase):
+    """
+    Recorre las páginas principales con varias filas de cada modelo y falla
+    si alguna repite una consulta por fila (``core.queries``).
+    """
+
+    ROWS = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        products = [cls.sandwich, cls.coffee]
+        for i in range(cls.ROWS):
+            area = DispatchArea.objects.create(name=f"Área {i}")
+            category = ProductCategory.objects.create(name=f"Categoría {i}")
+            ingredient = Ingredient.objects.create(name=f"Ingrediente {i}", unit="g")
+            product = Product.objects.create(
+                name=f"Producto {i}", category=category, dispatch_area=area, price=10
+            )
+            ProductIngredient.objects.create(
+                product=product, ingredient=ingredient, quantity=1
+            )
+            IngredientMovement.objects.create(
+                ingredient=ingredient,
+                quantity=100,
+                kind=IngredientMovement.KIND_PURCHASE,
+                user=cls.user,
+            )
+            products.append(product)
+
+        for i in range(cls.ROWS):
+            waiter = User.objects.create_user(f"mesero{i}", password="x")
+            table = Table.objects.create(name=f"Mesa {i + 2}")
+            for product in products[: cls.ROWS]:
+                order = Order.objects.create(table=table, user=waiter)
+                OrderItem.objects.create(order=order, product=product, quantity=2)
+                OrderItem.objects.create(order=order, product=products[-1 - i])
+            if i % 2:
+                Payment.post(
+                    table,
+                    [Payment.build(Payment.TENDER_CARD, "10", tip="1")],
+                    user=cls.user,
+                )
+        cls.order = Order.objects.filter(table__isnull=False).first()
+
+    def pages(self):
+        order, table, product = self.order, self.order.table, self.sandwich
+        return [
+            ("table_list", []),
+            ("table_orders", [table.id]),
+            ("table_payment", [table.id]),
+            ("create_order", [table.id]),
+            ("shift_current", []),
+            ("order_detail", [order.id]),
+            ("edit_order", [order.id]),
+            ("print_order", [order.id]),
+            ("order_history", []),
+            ("daily_report", []),
+            ("report_orders", []),
+            ("export_orders_csv", []),
+            ("product_list", []),
+            ("product_edit", [product.id]),
+            ("product_recipes", [product.id]),
+            ("category_list", []),
+            ("dispatch_area_list", []),
+            ("ingredient_list", []),
+            ("inventory_movement", []),
+            ("purchase_ingredients", []),
+            ("report_inventory", []),
+            ("print_inventory_report", []),
+            ("export_inventory_csv", []),
+            ("report_movements", []),
+            ("export_movements_csv", []),
+            ("report_variance", []),
+            ("export_variance_csv", []),
+            ("shift_list", []),
+            ("shift_report", [self.shift.id]),
+            ("export_shift_csv", [self.shift.id]),
+            ("sales_report_by_product", []),
+            ("export_sales_by_product_csv", []),
+            ("dashboard", []),
+            ("api_menu", []),
+            ("api_products", []),
+            ("api_ingredients", []),
+            ("api_categories", []),
+            ("api_dispatch_areas", []),
+            ("api_tables", []),
+            ("api_orders", []),
+            ("api_movements", []),
+            ("user_list", []),
+        ]
+
+    def test_origin_points_at_the_repeating_code(self):
+        User.objects.get(pk=self.user.pk)
+
+        def waiters():
+            names = []
+            for order in Order.objects.all():
+                names.append(order.user.username)
+            return names
+
+        with inspect_queries() as inspector:
+            User.objects.get(pk=self.user.pk)
+            waiters()
+
+        (repeated,) = inspector.repeated
+        self.assertIn('FROM "auth_user"', repeated["sql"])
+        self.assertTrue(repeated["origin"].endswith("en waiters"), repeated)
+
+    def test_main_pages_have_no_n_plus_one(self):
+        for name, args in self.pages():
+            with self.subTest(page=name):
+                with assert_no_n_plus_one():
+                    response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 200)
+
+
+# ==========================
+# 📊 REPORTES
+# ==========================
+
+
+class SalesReportTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        media = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.create_order((self.sandwich, 2), (self.coffee, 1))
+        self.pay("220")
+        self.url = reverse("sales_report_by_product")
+
+    def assert_totals(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_sales"], Decimal("220.00"))
+        sales = {
+            i["product__name"]: i["total_sales"] for i in response.context["items"]
+        }
+        self.assertEqual(sales, {"Café": Decimal("20"), "Sándwich": Decimal("200")})
+        (area,) = [
+            t
+            for t in response.context["totals_by_dispatch_area"]
+            if t["product__dispatch_area__name"] == "Cocina"
+        ]
+        self.assertEqual(area["area_total_qty"], 2)
+        self.assertEqual(area["area_total_sales"], Decimal("200"))
+
+    def test_report_is_computed_inline_by_default(self):
+        self.assert_totals(self.client.get(self.url))
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_background_report_is_computed_by_the_worker(self):
+        response = self.client.get(self.url, {"background": 1})
+
+        job = ReportJob.objects.get()
+        self.assertEqual(job.kind, ReportJob.KIND_SALES_REPORT)
+        self.assertRedirects(response, reverse("report_job_detail", args=[job.id]))
+        status_page = self.client.get(response.url)
+        report_url = status_page.context["report_url"]
+        self.assertTrue(report_url.startswith(f"{self.url}?start="))
+        self.assertIn("background=1", report_url)
+
+        self.assertEqual(jobs.process_jobs(), (1, 0))
+
+        self.assert_totals(self.client.get(report_url))
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    @override_settings(SALES_REPORT_INLINE_DAYS=7)
+    def test_long_range_goes_to_the_worker(self):
+        response = self.client.get(
+            self.url, {"start": "2026-01-01T00:00", "end": "2026-02-01T00:00"}
+        )
+
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse("report_job_detail", args=[job.id]))
+
+
+class ExportTests(OrderTestCase):
+    def test_csv_dates_are_local_like_the_range(self):
+        order = self.create_order((self.sandwich, 1))
+        late = timezone.make_aware(datetime(2026, 10, 19, 23, 30))
+        Order.objects.filter(pk=order.pk).update(created_at=late)
+        IngredientMovement.objects.filter(order=order).update(created_at=late)
+        day = {"start": "2026-10-19T00:00", "end": "2026-10-20T00:00"}
+
+        for name in ("export_orders_csv", "export_movements_csv"):
+            with self.subTest(export=name):
+                response = self.client.get(reverse(name), day)
+                rows = list(csv.reader(StringIO(response.content.decode())))
+                self.assertEqual(len(rows), 2)
+                self.assertEqual(rows[1][0], "2026-10-19 23:30")
+
+
+class DateRangeTests(OrderTestCase):
+    def test_day_bounds_are_half_open_local_midnights(self):
+        start, end = dates.day_range(datetime(2026, 10, 19).date())
+        self.assertEqual(start, timezone.make_aware(datetime(2026, 10, 19)))
+        self.assertEqual(end, timezone.make_aware(datetime(2026, 10, 20)))
+        self.assertEqual(
+            dates.in_range("created_at", start, end),
+            {"created_at__gte": start, "created_at__lt": end},
+        )
+
+        order = self.create_order((self.coffee, 1))
+        for moment, expected in (
+            (start, [order]),
+            (end - timedelta(microseconds=1), [order]),
+            (end, []),
+        ):
+            with self.subTest(moment=moment):
+                Order.objects.filter(pk=order.pk).update(created_at=moment)
+                self.assertEqual(
+                    list(
+                        Order.objects.filter(**dates.in_range("created_at", start, end))
+                    ),
+                    expected,
+                )
+
+
+class DailyReportTests(OrderTestCase):
+    def test_summary_counts_only_paid_orders_of_the_day(self):
+        first = self.create_order((self.sandwich, 2), (self.coffee, 1))
+        self.pay(220)
+        second = self.create_order((self.coffee, 3))
+        self.pay(60)
+        yesterday = self.create_order((self.coffee, 1))
+        self.pay(20)
+        Order.objects.filter(pk=yesterday.pk).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.create_order((self.sandwich, 5))
+
+        response = self.client.get(reverse("daily_report"))
+
+        self.assertEqual(
+            [
+                (row["name"], row["qty"], row["subtotal"])
+                for row in response.context["product_summary"]
+            ],
+            [("Café", 4, 80), ("Sándwich", 2, 200)],
+        )
+        self.assertEqual(response.context["total_sales"], 280)
+
+        orders = self.client.get(reverse("daily_report"), {"section": "orders"})
+        self.assertEqual(
+            [(o, o.total) for o in orders.context["page"]],
+            [(second, 60), (first, 220)],
+        )
+        previous = self.client.get(reverse("daily_report"), {"days_ago": 1})
+        self.assertEqual(previous.context["total_sales"], 20)
+
+
+class ReportOrdersTests(OrderTestCase):
+    def test_page_size_is_capped_and_totals_cover_every_page(self):
+        order = self.create_order()
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, product=self.coffee, quantity=1)] * 3
+        )
+
+        def page(**params):
+            context = self.client.get(reverse("report_orders"), params).context
+            return context["page"], context["total"]
+
+        first, total = page(page_size=2)
+        self.assertEqual((len(first), first.paginator.num_pages), (2, 2))
+        self.assertEqual(total, 60)
+        self.assertEqual(len(page(page_size=-5)[0]), 1)
+        self.assertEqual(len(page(page_size="x")[0]), 3)
+        with mock.patch("orders.views.REPORT_MAX_PAGE_SIZE", 2):
+            capped, total = page(page_size=1000)
+        self.assertEqual((len(capped), capped.paginator.num_pages), (2, 2))
+        self.assertEqual(total, 60)
+
+
+# ==========================
+# 🔄 PROYECCIONES
+# ==========================
+
+
+class ReplayTests(OrderTestCase):
+    def snapshot(self):
+        return {
+            "order_balances": set(
+                OrderBalance.objects.exclude(balance=0).values_list(
+                    "order_id", "balance"
+                )
+            ),
+            "table_balances": set(
+                TableBalance.objects.exclude(balance=0).values_list(
+                    "table_id", "balance"
+                )
+            ),
+            "daily_sales": set(
+                DailySales.objects.exclude(quantity=0, amount=0).values_list(
+                    "date", "product_id", "quantity", "amount"
+                )
+            ),
+            "dispatch_queue": set(
+                DispatchQueueItem.objects.values_list(
+                    "order_id", "product_id", "dispatch_area_id", "quantity"
+                )
+            ),
+        }
+
+    def test_replay_matches_incremental_projections(self):
+        other_table = Table.objects.create(name="2")
+        first = self.create_order((self.sandwich, 2), (self.coffee, 3))
+        second = self.create_order((self.sandwich, 1))
+        third = self.create_order((self.coffee, 1), table=other_table)
+        voided = self.create_order((self.coffee, 4))
+
+        first.update_items(
+            {item.id: 1 for item in first.orderitem_set.filter(product=self.coffee)},
+            user=self.user,
+        )
+        voided.void(user=self.user)
+        second.move_to(other_table, user=self.user)
+        self.pay("100")
+        self.pay("50", table=other_table)
+        first.reopen(user=self.user)
+        third.mark_paid(user=self.user)
+
+        incremental = self.snapshot()
+        self.assertTrue(all(incremental.values()))
+        call_command("replay", stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), incremental)
+
+
+# ==========================
+# 🗄️ CACHÉ
+# ==========================
+
+
+class CachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_inside_a_transaction_repeats_on_commit(self):
+        tags = [caching.TAG_PRODUCT]
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump(*tags)
+            # Otra petición guarda las filas previas bajo la versión intermedia.
+            caching.cached("productos", lambda: "previo", tags=tags)
+
+        self.assertEqual(
+            caching.cached("productos", lambda: "nuevo", tags=tags), "nuevo"
+        )
+
+    def test_check_requires_a_shared_cache_outside_debug(self):
+        for backend, ids in (
+            ("locmem.LocMemCache", ["core.E001"]),
+            ("filebased.FileBasedCache", ["core.W001"]),
+            ("db.DatabaseCache", []),
+        ):
+            caches = {"default": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+            with self.subTest(backend=backend), override_settings(
+                DEBUG=False, CACHES=caches
+            ):
+                self.assertEqual([m.id for m in check_shared_cache(None)], ids)
+
+
+# ==========================
+# 📈 MÉTRICAS
+# ==========================
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def metric(self, cls, name, *args, **kwargs):
+        """Métrica de prueba; se quita del registro al terminar."""
+        metric = cls(name, "Prueba.", *args, **kwargs)
+        self.addCleanup(metrics._registry.pop, metric.name)
+        return metric
+
+    def lines(self, metric):
+        return [
+            line
+            for line in metrics.render().splitlines()
+            if line.startswith(metric.name)
+        ]
+
+    def test_histogram_bucket_bounds_are_inclusive(self):
+        histogram = self.metric(metrics.Histogram, "test_seconds", buckets=(1, 5))
+        for value in (0.5, 1, 5, 5.5):
+            histogram.observe(value)
+
+        self.assertEqual(
+            self.lines(histogram),
+            [
+                f'{histogram.name}_bucket{{le="1"}} 2',
+                f'{histogram.name}_bucket{{le="5"}} 3',
+                f'{histogram.name}_bucket{{le="+Inf"}} 4',
+                f"{histogram.name}_sum 12.0",
+                f"{histogram.name}_count 4",
+            ],
+        )
+
+    def test_render_exposes_labelled_counters(self):
+        counter = self.metric(metrics.Counter, "test_total", labels=("route",))
+        counter.inc(route="mesas")
+        counter.inc(2, route='a"b')
+
+        output = metrics.render()
+
+        self.assertIn(f"# HELP {counter.name} Prueba.\n", output)
+        self.assertIn(f"# TYPE {counter.name} counter\n", output)
+        self.assertEqual(
+            self.lines(counter),
+            [
+                f'{counter.name}{{route="a\\"b"}} 2',
+                f'{counter.name}{{route="mesas"}} 1',
+            ],
+        )
+
+    def test_processes_on_different_hosts_do_not_collide(self):
+        counter = self.metric(metrics.Counter, "test_hosts_total")
+        counter.inc()
+        for host in ("caja", "cocina"):
+            with mock.patch.object(metrics.socket, "gethostname", return_value=host):
+                metrics.flush(force=True)
+
+        with mock.patch.object(metrics.socket, "gethostname", return_value="caja"):
+            totals = metrics.collect_all()
+
+        self.assertEqual(totals[counter.name], {(): 2})
+
+
+# ==========================
+# ⏱️ PERFILADO
+# ==========================
+
+
+class ProfilingTests(TestCase):
+    def entry(self, route, ms, queries=0, duplicates=0, size=None):
+        return {
+            "route": route,
+            "ms": ms,
+            "queries": queries,
+            "query_ms": queries / 2,
+            "duplicates": duplicates,
+            "bytes": size,
+        }
+
+    def test_summarize_groups_routes_slowest_first(self):
+        entries = [
+            self.entry(
+                "table_list", ms, queries=ms % 2 * 4, size=ms if ms % 2 else None
+            )
+            for ms in range(1, 101)
+        ]
+        entries.append(self.entry("daily_report", 300, queries=10, duplicates=3))
+        entries.append(self.entry("daily_report", 100, queries=20, duplicates=1))
+
+        daily, tables = profiling.summarize(entries)
+
+        self.assertEqual(
+            daily,
+            {
+                "route": "daily_report",
+                "count": 2,
+                "p50": 100,
+                "p95": 300,
+                "p99": 300,
+                "max": 300,
+                "queries": 15,
+                "max_queries": 20,
+                "query_ms": 7.5,
+                "duplicates": 4,
+                "bytes": None,
+            },
+        )
+        self.assertEqual(tables["route"], "table_list")
+        self.assertEqual(
+            [tables[key] for key in ("count", "p50", "p95", "p99", "max")],
+            [100, 50, 95, 99, 100],
+        )
+        self.assertEqual((tables["queries"], tables["max_queries"]), (2, 4))
+        # Los tamaños ``None`` (respuestas en streaming) no cuentan: 1, 3, ..., 99.
+        self.assertEqual(tables["bytes"], 50)
+
+
+# ==========================
+# 🔎 BÚSQUEDA
+# ==========================
+
+
+class SearchTests(OrderTestCase):
+    def search(self, **params):
+        return self.client.get(reverse("api_search"), params).json()
+
+    def test_scores_are_normalized_per_kind(self):
+        Ingredient.objects.create(name="Café molido de altura", unit="g")
+        Ingredient.objects.create(name="Café", unit="g")
+
+        results = self.search(q="cafe")
+
+        kinds = {r["type"] for r in results}
+        self.assertEqual(kinds, {"ingredient", "product"})
+        for kind in kinds:
+            best = max(r["score"] for r in results if r["type"] == kind)
+            self.assertEqual(best, 1)
+        scores = [r["score"] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_limit_is_clamped(self):
+        for i in range(3):
+            Ingredient.objects.create(name=f"Café {i}", unit="g")
+
+        self.assertEqual(len(self.search(q="cafe", limit=-1)), 1)
+        self.assertEqual(len(self.search(q="cafe", limit=0)), 1)
+        self.assertEqual(len(self.search(q="cafe", limit=2)), 2)
+
+    def test_prefix_lookup_ignores_accents_and_case(self):
+        Ingredient.objects.create(name="Jamón serrano", unit="g")
+        Ingredient.objects.create(name="Pan de jamón", unit="u")
+
+        def names(url, q):
+            return [
+                row["name"] for row in self.client.get(reverse(url), {"q": q}).json()
+            ]
+
+        for q in ("jamon", "JAMÓN", "  Jamo"):
+            self.assertEqual(
+                names("api_ingredients_lookup", q), ["Jamón", "Jamón serrano"]
+            )
+        self.assertEqual(names("api_ingredients_lookup", "jamon s"), ["Jamón serrano"])
+        self.assertEqual(names("api_products_lookup", "SANDW"), ["Sándwich"])
+        self.assertEqual(names("api_products_lookup", "wich"), [])
+
+
+# ==========================
+# 📡 API
+# ==========================
+
+
+class ApiTests(OrderTestCase):
+    def test_amounts_are_sent_as_exact_text(self):
+        order = self.create_order((self.sandwich, 2))
+        IngredientMovement.objects.create(
+            ingredient=self.ham, quantity=Decimal("-0.10"), order=order
+        )
+
+        orders = self.client.get(reverse("api_orders")).json()
+        movements = self.client.get(
+            reverse("api_movements"), {"format": "columnar"}
+        ).json()
+
+        self.assertEqual(orders[0]["total"], "200.00")
+        quantity = movements["columns"].index("quantity")
+        self.assertEqual(movements["rows"][0][quantity], "-0.10")
+
+    def test_lookup_and_products_agree_on_prices(self):
+        lookup = self.client.get(reverse("api_products_lookup"), {"q": "sand"}).json()
+        products = self.client.get(reverse("api_products")).json()
+
+        self.assertEqual(
+            lookup, [{"id": self.sandwich.id, "name": "Sándwich", "price": "100.00"}]
+        )
+        (sandwich,) = [p for p in products if p["id"] == self.sandwich.id]
+        self.assertEqual(sandwich["price"], lookup[0]["price"])
+        self.assertEqual(
+            self.client.get(reverse("api_products_lookup"), {"q": " "}).json(), []
+        )
+
+    def test_menu_answers_304_until_the_menu_changes(self):
+        first = self.client.get(reverse("api_menu"))
+        etag = first["ETag"]
+
+        cached = self.client.get(reverse("api_menu"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+        self.coffee.price = 25
+        self.coffee.save()
+        changed = self.client.get(reverse("api_menu"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        (coffee,) = [p for p in changed.json()["products"] if p["id"] == self.coffee.id]
+        self.assertEqual(coffee["price"], "25.00")
+
+    def test_catalog_answers_304_without_reading_its_rows(self):
+        url = reverse("api_products")
+        first = self.client.get(url)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        for headers in (
+            {"HTTP_IF_NONE_MATCH": first["ETag"]},
+            {"HTTP_IF_MODIFIED_SINCE": first["Last-Modified"]},
+        ):
+            with self.subTest(headers=headers):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse([q for q in queries if "orders_product" in q["sql"]])
+
+        ProductCategory.objects.filter(pk=self.coffee.category_id).get().save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_bench_measures_seeded_rows_and_rolls_back(self):
+        out = StringIO()
+        call_command("bench_api", seed=5, repeat=1, stdout=out)
+
+        self.assertIn("api_orders · 5 filas", out.getvalue())
+        self.assertEqual(Order.objects.count(), 0)
@@ -16,14 +16,18 @@ urlpatterns = [
     path("pos/", views.table_list, name="table_list"),
     path("pos/table/<int:table_id>/", views.table_orders, name="table_orders"),
     path("pos/table/<int:table_id>/pay/", views.mark_table_paid, name="mark_table_paid"),
+    path("pos/table/<int:table_id>/payment/", views.table_payment, name="table_payment"),
     path("pos/table/<int:table_id>/new/", views.create_order, name="create_order"),
+    path("pos/shift/", views.shift_current, name="shift_current"),
     path("pos/order/<int:order_id>/", views.order_detail, name="order_detail"),
     path("pos/order/<int:order_id>/edit/", views.edit_order, name="edit_order"),
     path("pos/order/<int:order_id>/print/", views.print_order, name="print_order"),
     # Alias para compatibilidad
     path("mesa/<int:table_id>/", views.table_orders, name="table_orders_alt"),
     path("mesa/<int:table_id>/pagar/", views.mark_table_paid, name="mark_table_paid_alt"),
+    path("mesa/<int:table_id>/cobrar/", views.table_payment, name="table_payment_alt"),
     path("mesa/<int:table_id>/nueva/", views.create_order, name="create_order_alt"),
+    path("caja/", views.shift_current, name="shift_current_alt"),
     path("orden/<int:order_id>/", views.order_detail, name="order_detail_alt"),
     path("orden/<int:order_id>/editar/", views.edit_order, name="edit_order_alt"),
     path("orden/<int:order_id>/imprimir/", views.print_order, name="print_order_alt"),
@@ -93,6 +97,11 @@ urlpatterns = [
     path("reports/inventory/csv/", views.export_inventory_csv, name="export_inventory_csv"),
     path("reports/movements/", views.report_movements, name="report_movements"),
     path("reports/movements/csv/", views.export_movements_csv, name="export_movements_csv"),
+    path("reports/variance/", views.report_variance, name="report_variance"),
+    path("reports/variance/csv/", views.export_variance_csv, name="export_variance_csv"),
+    path("reports/shifts/", views.shift_list, name="shift_list"),
+    path("reports/shifts/<int:shift_id>/", views.shift_report, name="shift_report"),
+    path("reports/shifts/<int:shift_id>/csv/", views.export_shift_csv, name="export_shift_csv"),
     path("reports/sales-by-product/", views.sales_report_by_product, name="sales_report_by_product"),
     path("reports/sales-by-product/csv/", views.export_sales_by_product_csv, name="export_sales_by_product_csv"),
     # Alias español
@@ -101,19 +110,33 @@ urlpatterns = [
     path("reportes/saldo-ingredientes/csv/", views.export_inventory_csv, name="export_inventory_csv_alt"),
     path("reportes/movimiento-ingredientes/", views.report_movements, name="report_movements_alt"),
     path("reportes/movimiento-ingredientes/csv/", views.export_movements_csv, name="export_movements_csv_alt"),
+    path("reportes/variacion-ingredientes/", views.report_variance, name="report_variance_alt"),
+    path("reportes/variacion-ingredientes/csv/", views.export_variance_csv, name="export_variance_csv_alt"),
+    path("reportes/arqueos/", views.shift_list, name="shift_list_alt"),
+    path("reportes/arqueos/<int:shift_id>/", views.shift_report, name="shift_report_alt"),
+    path("reportes/arqueos/<int:shift_id>/csv/", views.export_shift_csv, name="export_shift_csv_alt"),
     path("reportes/ventas-producto/", views.sales_report_by_product, name="sales_report_by_product_alt"),
     path("reportes/ventas-producto/csv/", views.export_sales_by_product_csv, name="export_sales_by_product_csv_alt"),
+    # Exportaciones en segundo plano
+    path("reports/jobs/<int:job_id>/", views.report_job_detail, name="report_job_detail"),
+    path("reports/jobs/<int:job_id>/download/", views.report_job_download, name="report_job_download"),
+    path("reportes/exportaciones/<int:job_id>/", views.report_job_detail, name="report_job_detail_alt"),
+    path("reportes/exportaciones/<int:job_id>/descargar/", views.report_job_download, name="report_job_download_alt"),
     # ==========================
     # Settings - Configuración
     # ==========================
     path("settings/company/", views.company_settings, name="company_settings"),
+    path("settings/performance/", views.performance_report, name="performance_report"),
     # Alias español
     path("empresa/configuracion/", views.company_settings, name="company_settings_alt"),
+    path("empresa/rendimiento/", views.performance_report, name="performance_report_alt"),
     # ==========================
     # Dashboard (raíz)
     # ==========================
     path("dashboard/", views.dashboard, name="dashboard"),
     path("", views.table_list, name="table_list_default"),
+    path("sw.js", views.service_worker, name="service_worker"),
+    path("metrics", views.prometheus_metrics, name="prometheus_metrics"),
     # ==========================
     # API Grid.js - Endpoints JSON
     # ==========================
@@ -122,7 +145,18 @@ urlpatterns = [
         views.api_ingredients,
         name="api_ingredients"
     ),
+    path(
+        "api/ingredients/lookup/",
+        views.api_ingredients_lookup,
+        name="api_ingredients_lookup"
+    ),
+    path("api/menu/", views.api_menu, name="api_menu"),
     path("api/products/", views.api_products, name="api_products"),
+    path(
+        "api/products/lookup/",
+        views.api_products_lookup,
+        name="api_products_lookup"
+    ),
     path(
         "api/categories/",
         views.api_categories,
@@ -135,11 +169,18 @@ urlpatterns = [
     ),
     path("api/tables/", views.api_tables, name="api_tables"),
     path("api/orders/", views.api_orders, name="api_orders"),
+    path("api/orders/sync/", views.api_orders_sync, name="api_orders_sync"),
     path(
         "api/movements/",
         views.api_movements,
         name="api_movements"
     ),
+    path("api/search/", views.api_search, name="api_search"),
+    path(
+        "api/report-jobs/<int:job_id>/",
+        views.api_report_job,
+        name="api_report_job"
+    ),
     # ==========================
     # Demo Grid.js
     # ==========================
@@ -1,46 +1,86 @@
 import csv
-from datetime import datetime, time, timedelta
+import json
+import os
+from datetime import timedelta
 from decimal import Decimal
+from functools import wraps
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.db import transaction
-from django.db.models import Count, F, Q, Sum
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
 from django.forms import modelformset_factory
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
-
-from users.utils import (has_valid_role, user_can_add_inventory_movement,
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_POST
+
+from core import caching, profiling
+from core.metrics import render as render_metrics
+from users.utils import (has_valid_role, is_administrador,
+                         user_can_add_inventory_movement,
                          user_can_manage_inventory_full, user_can_manage_menu,
                          user_can_mark_paid, user_can_view_inventory,
-                         user_can_view_reports, user_can_view_sales_report)
+                         user_can_view_orders, user_can_view_reports,
+                         user_can_view_sales_report, user_can_void_orders)
 
+from . import api, dates, exports, jobs, menu, metrics, printing
+from . import search as text_search
+from . import sync
 from .forms import ProductIngredientForm
-from .models import (Company, DispatchArea, Ingredient, IngredientMovement,
-                     Order, OrderItem, Product, ProductCategory,
-                     ProductIngredient, Table, Warehouse)
+from .models import (Company, DispatchArea, IdempotencyKey, Ingredient,
+                     IngredientMovement, Order, OrderItem, Payment, Product,
+                     ProductCategory, ProductIngredient, ReportJob, Shift,
+                     Table, TableBalance, Warehouse)
 
 # ==========================
 # 🔐 UTILIDADES Y PERMISOS
 # ==========================
 
+DAILY_REPORT_PAGE_SIZE = 50
+REPORT_PAGE_SIZE = 100
+REPORT_MAX_PAGE_SIZE = 500
+
 
 def parse_date_range(request):
-    """Obtiene el rango de fechas desde GET o usa el día actual."""
-    date_format = "%Y-%m-%dT%H:%M"
-    start_str = request.GET.get("start")
-    end_str = request.GET.get("end")
-
-    if start_str and end_str:
-        start = datetime.strptime(start_str, date_format)
-        end = datetime.strptime(end_str, date_format)
-    else:
-        today = datetime.today().date()
-        start = datetime.combine(today, time.min)
-        end = datetime.combine(today, time.max)
-    return start, end
+    """
+    Obtiene el rango ``[inicio, fin)`` desde GET o usa el día actual.
+
+    Ver ``orders/dates.py``: los límites son conscientes de zona horaria y el
+    fin es exclusivo.
+    """
+    return dates.parse_range(request.GET.get("start"), request.GET.get("end"))
+
+
+def csv_export(request, kind):
+    """
+    Responde la exportación ``kind`` (ver ``orders/exports.py``) como CSV.
+
+    Con ``?background=1`` la encola como ``ReportJob`` y redirige a su página
+    de estado, para rangos que tardarían más que el tiempo de espera.
+    """
+    params = exports.request_params(kind, request)
+    if request.GET.get("background"):
+        job, created = jobs.enqueue(kind, params, request.user)
+        if not created:
+            messages.info(request, "ℹ️ Se reutiliza una exportación igual reciente.")
+        return redirect("report_job_detail", job_id=job.id)
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="{exports.filename(kind)}"'
+    )
+    exports.write_csv(response, kind, params)
+    return response
 
 
 # ==========================
@@ -52,20 +92,11 @@ def parse_date_range(request):
 @user_passes_test(has_valid_role)
 def table_list(request):
     """Muestra todas las mesas y su total pendiente."""
-    tables = Table.objects.all().order_by("name")
-    table_data = []
-    for table in tables:
-        total_due = (
-            Order.objects.filter(table=table, is_paid=False)
-            .annotate(
-                order_total=Sum(
-                    F("orderitem__quantity") * F("orderitem__product__price")
-                )
-            )
-            .aggregate(total=Sum("order_total"))["total"]
-            or 0
-        )
-        table_data.append({"table": table, "total_due": total_due})
+    # El saldo viene de la proyección ``TableBalance``: una sola consulta.
+    tables = Table.objects.annotate(
+        total_due=Coalesce("tablebalance__balance", Value(Decimal(0)))
+    ).order_by("name")
+    table_data = [{"table": table, "total_due": table.total_due} for table in tables]
 
     return render(request, "pos/table_list.html", {"table_data": table_data})
 
@@ -76,7 +107,8 @@ def table_orders(request, table_id):
     """Lista de comandas activas de una mesa."""
     table = get_object_or_404(Table, id=table_id)
     orders = (
-        Order.objects.filter(table=table, is_paid=False)
+        Order.objects.filter(table=table, is_paid=False, is_void=False)
+        .select_related("user")
         .prefetch_related("orderitem_set__product")
         .order_by("-created_at")
     )
@@ -86,20 +118,189 @@ def table_orders(request, table_id):
 @login_required
 @user_passes_test(user_can_mark_paid)
 def mark_table_paid(request, table_id):
-    """Marca todas las órdenes no pagadas de una mesa como pagadas."""
+    """
+    Antes marcaba la mesa como pagada sin registrar el cobro; ahora lleva a la
+    pantalla de cobro para que quede el monto y la forma de pago.
+    """
+    return redirect("table_payment", table_id=table_id)
+
+
+def parse_payment_lines(data):
+    """
+    Lee las formas de pago enviadas como ``payments=[{"tender", "amount",
+    "tip", "received", "reference"}]`` (JSON) y devuelve objetos ``Payment``
+    sin guardar. Lanza ``ValueError`` si el contenido no es válido.
+    """
+    try:
+        lines = [
+            line for line in json.loads(data.get("payments") or "[]") if line.get("amount")
+        ]
+    except (ValueError, AttributeError):
+        raise ValueError("Formato de pagos inválido.")
+
+    payments = []
+    for line in lines:
+        try:
+            payments.append(
+                Payment.build(
+                    tender=line.get("tender"),
+                    amount=str(line["amount"]),
+                    tip=str(line.get("tip") or 0),
+                    received=(
+                        str(line["received"]) if line.get("received") else None
+                    ),
+                    reference=str(line.get("reference") or "").strip()[:100],
+                )
+            )
+        except (TypeError, ArithmeticError):
+            raise ValueError("Monto inválido.")
+    return payments
+
+
+@login_required
+@user_passes_test(user_can_mark_paid)
+def table_payment(request, table_id):
+    """
+    Cobro de una mesa: pagos parciales o divididos en varias formas de pago,
+    con propina y vuelto.
+    """
     table = get_object_or_404(Table, id=table_id)
-    unpaid = Order.objects.filter(table=table, is_paid=False)
 
-    if not unpaid.exists():
-        messages.info(request, f"ℹ️ No hay comandas pendientes para {table.name}.")
-    else:
-        count = unpaid.update(is_paid=True)
-        messages.success(
-            request,
-            f"✅ {count} comandas de la mesa {table.name} marcadas como pagadas.",
+    if request.method == "POST":
+        try:
+            remaining = Payment.post(
+                table, parse_payment_lines(request.POST), user=request.user
+            )
+        except ValueError as e:
+            messages.error(request, f"❌ {e}")
+            return redirect("table_payment", table_id=table.id)
+        if remaining:
+            messages.success(
+                request,
+                f"✅ Abono registrado. Saldo pendiente de la mesa {table.name}: "
+                f"C$ {remaining:,.2f}.",
+            )
+            return redirect("table_payment", table_id=table.id)
+        messages.success(request, f"✅ Mesa {table.name} pagada.")
+        return redirect("table_list")
+
+    balance = TableBalance.objects.filter(table=table).first()
+    orders = (
+        Order.objects.filter(table=table, is_paid=False, is_void=False)
+        .select_related("orderbalance", "user")
+        .order_by("created_at")
+    )
+    since = orders[0].created_at if orders else None
+    payments = (
+        Payment.objects.filter(table=table, created_at__gte=since).select_related(
+            "user"
         )
+        if since
+        else Payment.objects.none()
+    )
+    return render(
+        request,
+        "pos/table_payment.html",
+        {
+            "table": table,
+            "balance": balance.balance if balance else 0,
+            "orders": orders,
+            "payments": payments,
+            "tenders": Payment.TENDERS,
+            "shift": Shift.current(request.user),
+        },
+    )
+
+
+# ==========================
+# 🧾 TURNOS DE CAJA (ARQUEO)
+# ==========================
+
 
-    return redirect("table_list")
+@login_required
+@user_passes_test(user_can_mark_paid)
+def shift_current(request):
+    """Apertura y cierre del turno de caja del usuario."""
+    shift = Shift.current(request.user)
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+        try:
+            amount = Decimal(request.POST.get("amount") or "0")
+        except Exception:
+            messages.error(request, "❌ Monto inválido.")
+            return redirect("shift_current")
+
+        if action == "open" and shift is None:
+            try:
+                shift = Shift.objects.create(user=request.user, opening_cash=amount)
+            except IntegrityError:
+                messages.info(request, "ℹ️ Ya tienes un turno abierto.")
+                return redirect("shift_current")
+            messages.success(request, f"✅ Turno #{shift.id} abierto.")
+            return redirect("table_list")
+
+        if action == "close" and shift is not None:
+            shift.close(amount, request.POST.get("notes", "").strip())
+            messages.success(request, f"✅ Turno #{shift.id} cerrado.")
+            return redirect("shift_report", shift_id=shift.id)
+
+        return redirect("shift_current")
+
+    return render(request, "pos/shift.html", {"shift": shift})
+
+
+@login_required
+@user_passes_test(user_can_mark_paid)
+def shift_list(request):
+    """Turnos recientes."""
+    shifts = Shift.objects.select_related("user").order_by("-opened_at")[:50]
+    return render(request, "reports/shift_list.html", {"shifts": shifts})
+
+
+@login_required
+@user_passes_test(user_can_mark_paid)
+def shift_report(request, shift_id):
+    """Arqueo del turno a partir de sus contadores."""
+    shift = get_object_or_404(Shift.objects.select_related("user"), id=shift_id)
+    return render(request, "reports/shift_report.html", {"shift": shift})
+
+
+@login_required
+@user_passes_test(user_can_mark_paid)
+def export_shift_csv(request, shift_id):
+    """Exporta el arqueo del turno a CSV."""
+    shift = get_object_or_404(Shift.objects.select_related("user"), id=shift_id)
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="arqueo_turno_{shift.id}.csv"'
+    )
+    writer = csv.writer(response)
+    writer.writerow(["Turno", shift.id])
+    writer.writerow(["Cajero", shift.user.username])
+    writer.writerow(["Apertura", timezone.localtime(shift.opened_at)])
+    writer.writerow(
+        ["Cierre", timezone.localtime(shift.closed_at) if shift.closed_at else ""]
+    )
+    writer.writerow([])
+    writer.writerow(["Forma de pago", "Monto", "Propina"])
+    for label, amount, tips in shift.tender_rows():
+        writer.writerow([label, amount, tips])
+    writer.writerow(["Total", shift.total_amount, shift.total_tips])
+    writer.writerow([])
+    writer.writerow(["Fondo inicial", shift.opening_cash])
+    writer.writerow(["Efectivo esperado", shift.expected_cash])
+    writer.writerow(
+        ["Efectivo contado", "" if shift.counted_cash is None else shift.counted_cash]
+    )
+    writer.writerow(
+        [
+            "Diferencia",
+            "" if shift.cash_difference is None else shift.cash_difference,
+        ]
+    )
+    return response
 
 
 # ==========================
@@ -107,41 +308,165 @@ def mark_table_paid(request, table_id):
 # ==========================
 
 
+def parse_order_quantities(data):
+    """
+    Lee las cantidades de una comanda como ``{product_id: cantidad}``.
+
+    Acepta el formato compacto ``items={"12": 2, "15": 1}`` (JSON) y, por
+    compatibilidad, los campos ``product_<id>``. Las cantidades se validan
+    igual que en el lote sin conexión (``sync.parse_items``). Lanza
+    ``ValueError`` si el contenido no es válido.
+    """
+    raw = data.get("items")
+    if raw:
+        try:
+            pairs = json.loads(raw).items()
+        except (ValueError, AttributeError):
+            raise ValueError("Formato de productos inválido.")
+    else:
+        pairs = [
+            (key[len("product_"):], value)
+            for key, value in data.items()
+            if key.startswith("product_")
+        ]
+
+    quantities, errors = sync.parse_items(pairs)
+    if errors:
+        raise ValueError(errors[0])
+    return quantities
+
+
 @login_required
 @user_passes_test(has_valid_role)
 def create_order(request, table_id):
-    """Crea una nueva comanda para una mesa."""
+    """
+    Crea una nueva comanda para una mesa.
+
+    El menú no se renderiza aquí: la plantilla lo carga de ``api_menu`` y lo
+    conserva en el navegador mientras su versión no cambie.
+    """
     table = get_object_or_404(Table, id=table_id)
-    products = Product.objects.all().order_by("category__name", "name")
-    categories = ProductCategory.objects.all().order_by("name")
-    context = {"table": table, "products": products, "categories": categories}
+    context = {"table": table}
 
     if request.method == "POST":
-        order = Order.objects.create(table=table, user=request.user)
-        created_items = 0
-
-        for key, value in request.POST.items():
-            if key.startswith("product_") and value.isdigit() and int(value) > 0:
-                product = get_object_or_404(Product, id=key.split("_")[1])
-                OrderItem.objects.create(
-                    order=order, product=product, quantity=int(value)
-                )
-                created_items += 1
+        token = request.POST.get("request_token", "").strip()
+        previous = token and IdempotencyKey.find_order(request.user, token)
+        if previous:
+            messages.info(request, f"ℹ️ La comanda #{previous.id} ya fue registrada.")
+            context["order"] = previous
+            return render(request, "pos/create_order.html", context)
 
-        if created_items:
-            messages.success(
-                request, f"✅ Comanda #{order.id} creada con {created_items} productos."
+        try:
+            quantities = parse_order_quantities(request.POST)
+        except ValueError as e:
+            messages.error(request, f"❌ {e}")
+            return redirect("create_order", table_id=table.id)
+
+        if not quantities:
+            messages.warning(request, "⚠️ No se seleccionaron productos.")
+            return redirect("create_order", table_id=table.id)
+
+        products = Product.objects.in_bulk(quantities)
+        errors = sync.product_errors(quantities, products)
+        if errors:
+            messages.error(
+                request, "❌ " + " ".join(errors) + " No se creó la comanda."
             )
-            context["order"] = order
+            return redirect("create_order", table_id=table.id)
+
+        try:
+            (order,) = sync.create_orders(
+                request.user,
+                [
+                    (
+                        token and IdempotencyKey.hash_token(request.user, token),
+                        table.id,
+                        quantities,
+                        request.POST.get("notes", "").strip() or None,
+                    )
+                ],
+                {table.id: table},
+                products,
+            )
+        except IntegrityError:
+            # Un reintento simultáneo ganó la carrera: se devuelve su comanda.
+            previous = IdempotencyKey.find_order(request.user, token)
+            if not previous:
+                raise
+            messages.info(request, f"ℹ️ La comanda #{previous.id} ya fue registrada.")
+            context["order"] = previous
             return render(request, "pos/create_order.html", context)
 
-        order.delete()
-        messages.warning(request, "⚠️ No se seleccionaron productos.")
-        return redirect("create_order", table_id=table.id)
+        messages.success(
+            request, f"✅ Comanda #{order.id} creada con {len(quantities)} productos."
+        )
+        context["order"] = order
+        return render(request, "pos/create_order.html", context)
 
     return render(request, "pos/create_order.html", context)
 
 
+@login_required
+@user_passes_test(has_valid_role)
+@require_POST
+def api_orders_sync(request):
+    """
+    Recibe en lote las comandas que el POS capturó sin conexión.
+
+    Cuerpo: ``{"orders": [{"token", "table", "items": {id: cant}, "notes"}]}``.
+    Responde un resultado por comanda (ver ``sync.sync_orders``).
+    """
+    try:
+        entries = json.loads(request.body).get("orders")
+    except (ValueError, AttributeError):
+        entries = None
+    if not isinstance(entries, list):
+        return JsonResponse({"error": "Formato de lote inválido."}, status=400)
+    if len(entries) > sync.MAX_BATCH_SIZE:
+        return JsonResponse(
+            {"error": f"Máximo {sync.MAX_BATCH_SIZE} comandas por lote."}, status=400
+        )
+    return JsonResponse({"results": sync.sync_orders(request.user, entries)})
+
+
+def service_worker(request):
+    """
+    Service worker del POS, servido desde la raíz para controlar todo el sitio.
+    """
+    response = render(
+        request,
+        "sw.js",
+        {"version": settings.SERVICE_WORKER_VERSION},
+        content_type="application/javascript",
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def prometheus_metrics(request):
+    """
+    Métricas en formato de exposición de Prometheus (ver ``core/metrics.py``).
+
+    Con ``METRICS_TOKEN`` se exige ``Authorization: Bearer <token>``; sin él,
+    solo un administrador con sesión iniciada puede verlas.
+    """
+    if settings.METRICS_TOKEN:
+        authorized = constant_time_compare(
+            request.headers.get("Authorization", ""),
+            f"Bearer {settings.METRICS_TOKEN}",
+        )
+    else:
+        authorized = request.user.is_authenticated and is_administrador(request.user)
+    if not authorized:
+        return HttpResponse("❌ No autorizado.", status=403, content_type="text/plain")
+
+    response = HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+    patch_cache_control(response, no_store=True)
+    return response
+
+
 @login_required
 @user_passes_test(has_valid_role)
 def order_detail(request, order_id):
@@ -150,57 +475,149 @@ def order_detail(request, order_id):
     items = order.orderitem_set.select_related("product")
 
     if request.method == "POST" and request.POST.get("action") == "mark_paid":
-        if not order.is_paid:
-            order.is_paid = True
-            order.save()
+        if order.mark_paid(user=request.user):
             messages.success(request, f"✅ Comanda #{order.id} marcada como pagada.")
         else:
             messages.info(request, f"ℹ️ La comanda #{order.id} ya estaba pagada.")
         return redirect("table_list")
 
+    if request.method == "POST" and request.POST.get("action") == "send_to_printers":
+        jobs = printing.enqueue_order(order)
+        if jobs:
+            messages.success(
+                request,
+                f"✅ Comanda #{order.id} enviada a {len(jobs)} impresora(s).",
+            )
+        else:
+            messages.warning(
+                request, "⚠️ Ninguna área de esta comanda tiene impresora configurada."
+            )
+        return redirect("order_detail", order_id=order.id)
+
+    print_jobs = order.printjob_set.select_related("dispatch_area").order_by("-id")
     return render(
         request,
         "pos/order_detail.html",
-        {"order": order, "items": items, "total": order.get_total()},
+        {
+            "order": order,
+            "items": items,
+            "total": order.get_total(),
+            "print_jobs": print_jobs,
+        },
     )
 
 
 @login_required
 @user_passes_test(user_can_mark_paid)
 def edit_order(request, order_id):
-    """Permite editar una comanda (mesa, usuario, pagada)."""
+    """Permite editar una comanda (mesa, usuario, pagada, líneas) o anularla."""
     order = get_object_or_404(Order, id=order_id)
+    items = order.orderitem_set.select_related("product").order_by("id")
     tables = Table.objects.all().order_by("name")
     users = User.objects.all().order_by("username")
+    # Las líneas de una comanda pagada o con abonos ya se cobraron (en todo o
+    # en parte): no se editan ni se anulan hasta revertir el pago.
+    paid_amount = order.paid_amount()
+    can_edit_items = (
+        user_can_void_orders(request.user)
+        and not order.is_void
+        and not order.is_paid
+        and not paid_amount
+    )
 
     if request.method == "POST":
-        order.table_id = request.POST.get("table") or None
-        order.user_id = request.POST.get("user") or None
-        order.is_paid = request.POST.get("is_paid") == "on"
-        order.save()
-        messages.success(request, f"✅ Comanda #{order.id} actualizada correctamente.")
+        if request.POST.get("action") == "void":
+            if not can_edit_items:
+                messages.error(request, "❌ No puedes anular esta comanda.")
+                return redirect("order_detail", order_id=order.id)
+            try:
+                order.void(user=request.user)
+            except ValueError as e:
+                messages.error(request, f"❌ {e}")
+            else:
+                messages.success(
+                    request,
+                    f"✅ Comanda #{order.id} anulada; inventario devuelto.",
+                )
+            return redirect("order_detail", order_id=order.id)
+
+        quantities = {}
+        if can_edit_items:
+            for item in items:
+                value = request.POST.get(f"item_{item.id}", "")
+                if value.isdigit():
+                    quantities[item.id] = int(value)
+
+        table_id = request.POST.get("table")
+        try:
+            with transaction.atomic():
+                order.user_id = request.POST.get("user") or None
+                order.notes = request.POST.get("notes", "").strip() or None
+                order.save(update_fields=["user", "notes"])
+                order.move_to(
+                    Table.objects.filter(id=table_id).first() if table_id else None,
+                    user=request.user,
+                )
+                changed = order.update_items(quantities, user=request.user)
+                if request.POST.get("is_paid") == "on":
+                    order.mark_paid(user=request.user)
+                else:
+                    order.reopen(user=request.user)
+        except ValueError as e:
+            messages.error(request, f"❌ {e}")
+            return redirect("edit_order", order_id=order.id)
+
+        messages.success(
+            request,
+            f"✅ Comanda #{order.id} actualizada correctamente"
+            + (f" ({changed} líneas modificadas)." if changed else "."),
+        )
         return redirect("order_detail", order_id=order.id)
 
     return render(
-        request, "pos/edit_order.html", {"order": order, "tables": tables, "users": users}
+        request,
+        "pos/edit_order.html",
+        {
+            "order": order,
+            "items": items,
+            "tables": tables,
+            "users": users,
+            "can_edit_items": can_edit_items,
+            "paid_amount": paid_amount,
+        },
     )
 
 
 @login_required
 @user_passes_test(has_valid_role)
 def print_order(request, order_id):
-    """Vista de impresión de comanda."""
-    order = get_object_or_404(Order, id=order_id)
-    items = order.orderitem_set.select_related("product").all()
+    """
+    Vista de impresión de comanda.
+
+    El HTML se guarda en caché por versión de la comanda (ver
+    ``printing.ticket_stamp``): las reimpresiones no vuelven a renderizar.
+    """
+    order = get_object_or_404(
+        Order.objects.select_related("table", "user"), id=order_id
+    )
 
-    if not items.exists():
-        messages.warning(request, f"⚠️ La comanda #{order.id} no tiene productos.")
+    def build():
+        items = list(order.orderitem_set.select_related("product"))
+        html = render_to_string(
+            "pos/print_order.html",
+            {
+                "order": order,
+                "items": items,
+                "total": sum(item.get_total() for item in items),
+            },
+            request,
+        )
+        return html, not items
 
-    return render(
-        request,
-        "pos/print_order.html",
-        {"order": order, "items": items, "total": order.get_total()},
-    )
+    html, empty = printing.get_ticket(order, "html", build)
+    if empty:
+        messages.warning(request, f"⚠️ La comanda #{order.id} no tiene productos.")
+    return HttpResponse(html)
 
 
 # ==========================
@@ -213,11 +630,15 @@ def print_order(request, order_id):
 def order_history(request):
     """Muestra comandas de un día específico."""
     days_ago = int(request.GET.get("days_ago", 0))
-    target_date = datetime.now() - timedelta(days=days_ago)
+    start, end = dates.days_ago_range(days_ago)
+    target_date = start.date()
 
     orders = (
-        Order.objects.filter(created_at__date=target_date)
+        Order.objects.filter(**dates.in_range("created_at", start, end))
         .select_related("table", "user")
+        .annotate(
+            total=Sum(F("orderitem__quantity") * F("orderitem__product__price"))
+        )
         .order_by("-created_at")
     )
 
@@ -237,32 +658,57 @@ def order_history(request):
 @login_required
 @user_passes_test(user_can_view_sales_report)
 def daily_report(request):
-    """Reporte diario de ventas."""
+    """
+    Reporte diario de ventas.
+
+    El resumen por producto se agrupa en la base de datos, así que el costo
+    depende de la cantidad de productos y no de comandas. La lista de
+    comandas es opcional: la plantilla la pide paginada con
+    ``?section=orders&page=N``.
+    """
     days_ago = int(request.GET.get("days_ago", 0))
-    target_date = timezone.now().date() - timedelta(days=days_ago)
-
-    orders = Order.objects.filter(
-        created_at__date=target_date, is_paid=True
-    ).prefetch_related("orderitem_set__product")
-    summary, total_sales = {}, Decimal("0")
+    start, end = dates.days_ago_range(days_ago)
+    target_date = start.date()
+    items = OrderItem.objects.filter(
+        order__is_paid=True, **dates.in_range("order__created_at", start, end)
+    )
 
-    for order in orders:
-        for item in order.orderitem_set.all():
-            name, price = item.product.name, item.product.price
-            subtotal = item.quantity * price
-            total_sales += subtotal
+    if request.GET.get("section") == "orders":
+        orders = (
+            Order.objects.filter(id__in=items.values("order_id"))
+            .select_related("table", "user")
+            .annotate(
+                total=Sum(F("orderitem__quantity") * F("orderitem__product__price"))
+            )
+            .order_by("-created_at")
+        )
+        page = Paginator(orders, DAILY_REPORT_PAGE_SIZE).get_page(
+            request.GET.get("page")
+        )
+        return render(
+            request,
+            "orders/_daily_report_orders.html",
+            {"page": page, "days_ago": days_ago},
+        )
 
-            summary.setdefault(name, {"qty": 0, "price": price, "subtotal": 0})
-            summary[name]["qty"] += item.quantity
-            summary[name]["subtotal"] += subtotal
+    product_summary = list(
+        items.values("product")
+        .annotate(
+            name=F("product__name"),
+            price=F("product__price"),
+            qty=Sum("quantity"),
+            subtotal=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by("name")
+    )
+    total_sales = sum((row["subtotal"] for row in product_summary), Decimal("0"))
 
     messages.info(request, f"📊 Ventas del {target_date}: {total_sales:.2f} total.")
     return render(
         request,
         "orders/daily_report.html",
         {
-            "orders": orders,
-            "product_summary": summary,
+            "product_summary": product_summary,
             "target_date": target_date,
             "days_ago": days_ago,
             "prev_days_ago": days_ago + 1,
@@ -301,6 +747,7 @@ def inventory_movement(request):
                     IngredientMovement.objects.create(
                         ingredient=ing,
                         quantity=diff,
+                        kind=IngredientMovement.KIND_ADJUSTMENT,
                         user=request.user,
                         reason=f"Ajuste por inventario físico. {note}",
                     )
@@ -334,6 +781,7 @@ def purchase_ingredients(request):
                     IngredientMovement.objects.create(
                         ingredient=ing,
                         quantity=qty,
+                        kind=IngredientMovement.KIND_PURCHASE,
                         user=request.user,
                         reason="Compra de ingredientes",
                     )
@@ -363,13 +811,23 @@ def report_inventory(request):
 @login_required
 @user_passes_test(user_can_view_inventory)
 def print_inventory_report(request):
+    """
+    Reporte imprimible de saldos.
+
+    La tabla es un fragmento en caché por versión del inventario; la consulta
+    de ingredientes solo se ejecuta cuando la versión cambió.
+    """
     ingredients = Ingredient.objects.all().order_by("name")
-    total = ingredients.count()
     today = timezone.now()
     return render(
         request,
         "reports/print_inventory_report.html",
-        {"ingredients": ingredients, "total_items": total, "today": today},
+        {
+            "ingredients": ingredients,
+            "today": today,
+            "stamp": printing.inventory_stamp(),
+            "cache_timeout": printing.TICKET_TIMEOUT,
+        },
     )
 
 
@@ -381,7 +839,7 @@ def export_inventory_csv(request):
 
     response = HttpResponse(content_type="text/csv")
     response["Content-Disposition"] = (
-        f'attachment; filename="inventario_{datetime.now():%Y%m%d_%H%M}.csv"'
+        f'attachment; filename="inventario_{timezone.localtime():%Y%m%d_%H%M}.csv"'
     )
 
     writer = csv.writer(response)
@@ -402,28 +860,46 @@ def report_orders(request):
     """Reporte de comandas por rango de fechas."""
     start, end = parse_date_range(request)
     table = request.GET.get("table", None)
-    items = None
+    items = OrderItem.objects.filter(
+        **dates.in_range("order__created_at", start, end)
+    )
     if table:
-        items = OrderItem.objects.filter(
-            order__created_at__range=(start, end), order__table=table
-        ).select_related("order", "product", "order__table", "order__user")
-    else:
-        items = OrderItem.objects.filter(
-            order__created_at__range=(start, end)
-        ).select_related("order", "product", "order__table", "order__user")
-    total = sum((i.get_total() or 0) for i in items)
-    items = items.order_by("-id")
+        items = items.filter(order__table=table)
+
+    # Totales y conteo en una sola consulta agregada; el detalle se pagina
+    # para no cargar todo el rango en memoria.
+    summary = items.aggregate(
+        count=Count("id"), total=Sum(F("quantity") * F("product__price"))
+    )
+    try:
+        page_size = int(request.GET.get("page_size", REPORT_PAGE_SIZE))
+    except ValueError:
+        page_size = REPORT_PAGE_SIZE
+    page_size = max(1, min(page_size, REPORT_MAX_PAGE_SIZE))
+    paginator = Paginator(
+        items.select_related(
+            "order", "product", "order__table", "order__user"
+        ).order_by("-id"),
+        page_size,
+    )
+    paginator.count = summary["count"]
+    page = paginator.get_page(request.GET.get("page"))
+
+    query = request.GET.copy()
+    query.pop("page", None)
     tables = Table.objects.all()
     return render(
         request,
         "orders/report_orders.html",
         {
-            "order_items": items,
+            "order_items": page,
+            "page": page,
+            "query": query.urlencode(),
             "start": start,
             "end": end,
             "tables": tables,
             "table": table,
-            "total": total,
+            "total": summary["total"] or 0,
         },
     )
 
@@ -432,50 +908,14 @@ def report_orders(request):
 @user_passes_test(user_can_view_reports)
 def export_orders_csv(request):
     """Exporta las comandas a CSV."""
-    start, end = parse_date_range(request)
-    table = request.GET.get("table")
-    items = None
-    if table:
-        items = OrderItem.objects.filter(
-            order__created_at__range=(start, end), order__table=table
-        ).select_related("order", "product", "order__table", "order__user")
-    else:
-        items = OrderItem.objects.filter(
-            order__created_at__range=(start, end)
-        ).select_related("order", "product", "order__table", "order__user")
+    return csv_export(request, ReportJob.KIND_ORDERS)
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        f'attachment; filename="comandas_{datetime.now():%Y%m%d_%H%M}.csv"'
-    )
 
-    writer = csv.writer(response)
-    writer.writerow(
-        [
-            "Fecha",
-            "Comanda",
-            "Servicio",
-            "Mesa",
-            "Cantidad",
-            "Producto",
-            "Precio",
-            "Total",
-        ]
+def filter_movements(request, start, end):
+    """Filtros de tipo y búsqueda de ``GET`` (ver ``exports.filter_movements``)."""
+    return exports.filter_movements(
+        start, end, request.GET.get("kind"), request.GET.get("search")
     )
-    for i in items:
-        writer.writerow(
-            [
-                i.order.created_at.strftime("%Y-%m-%d %H:%M"),
-                i.order.id,
-                i.order.user.username if i.order.user else "—",
-                i.order.table.name if i.order.table else "—",
-                i.quantity,
-                i.product.name,
-                i.product.price,
-                i.get_total(),
-            ]
-        )
-    return response
 
 
 @login_required
@@ -483,22 +923,19 @@ def export_orders_csv(request):
 def report_movements(request):
     """Lista los movimientos de inventario."""
     start, end = parse_date_range(request)
-
-    moves = IngredientMovement.objects.filter(
-        created_at__range=(start, end)
-    ).select_related("ingredient")
-
-    # --- Búsqueda ---
-    search = request.GET.get("search")
-    if search:
-        moves = moves.filter(
-            Q(reason__icontains=search) | Q(ingredient__name__icontains=search)
-        )
+    moves, search, kind = filter_movements(request, start, end)
 
     return render(
         request,
         "reports/report_movements.html",
-        {"movements": moves, "start": start, "end": end, "search": search},
+        {
+            "movements": moves,
+            "start": start,
+            "end": end,
+            "search": search,
+            "kind": kind,
+            "kinds": IngredientMovement.KINDS,
+        },
     )
 
 
@@ -506,121 +943,134 @@ def report_movements(request):
 @user_passes_test(user_can_view_inventory)
 def export_movements_csv(request):
     """Exporta los movimientos de inventario a CSV."""
-    start, end = parse_date_range(request)
+    return csv_export(request, ReportJob.KIND_MOVEMENTS)
 
-    moves = IngredientMovement.objects.filter(
-        created_at__range=(start, end)
-    ).select_related("ingredient")
 
-    # --- Filtro de búsqueda (igual que la vista principal) ---
-    search = request.GET.get("search")
-    if search:
-        moves = moves.filter(
-            Q(reason__icontains=search) | Q(ingredient__name__icontains=search)
-        )
+@login_required
+@user_passes_test(user_can_view_sales_report)
+def sales_report_by_product(request):
+    """
+    Reporte de ventas por producto (filtrable por fecha).
+
+    Se calcula en la petición. Con ``?background=1``, o si el rango pasa de
+    ``SALES_REPORT_INLINE_DAYS`` días, lo calcula el worker como
+    ``ReportJob``: mientras tanto se redirige a la página de estado, que
+    vuelve aquí al terminar. Un reporte reciente con el mismo rango se
+    reutiliza (``REPORT_JOB_REUSE_SECONDS``).
+    """
+    kind = ReportJob.KIND_SALES_REPORT
+    params = exports.request_params(kind, request)
+    start, end = exports.params_range(params)
+    job = None
+    if request.GET.get("background") or end - start > timedelta(
+        days=settings.SALES_REPORT_INLINE_DAYS
+    ):
+        job, _ = jobs.enqueue(kind, params, request.user)
+        if job.status != ReportJob.STATUS_DONE:
+            return redirect("report_job_detail", job_id=job.id)
+        with job.result.open("rb") as file:
+            report = exports.read_json(file)
+    else:
+        report = exports.sales_report(start, end)
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        f'attachment; filename="movimientos_{datetime.now():%Y%m%d_%H%M}.csv"'
-    )
+    context = {**report, "start": start, "end": end, "job": job}
+    return render(request, "reports/sales_report_by_product.html", context)
 
-    writer = csv.writer(response)
-    writer.writerow(["Fecha", "Cantidad", "Ingrediente", "Razón", "Usuario"])
-
-    for m in moves:
-        writer.writerow(
-            [
-                m.created_at.strftime("%Y-%m-%d %H:%M"),
-                m.quantity,
-                m.ingredient.name,
-                m.reason or "—",
-                m.user.username if m.user else "—",
-            ]
-        )
 
-    return response
+@login_required
+@user_passes_test(user_can_view_sales_report)
+def export_sales_by_product_csv(request):
+    """Exporta el reporte de ventas por producto a CSV."""
+    return csv_export(request, ReportJob.KIND_SALES_BY_PRODUCT)
 
 
 @login_required
-@user_passes_test(user_can_view_sales_report)
-def sales_report_by_product(request):
-    """Reporte de ventas por producto (filtrable por fecha)."""
+@user_passes_test(user_can_view_inventory)
+def report_variance(request):
+    """Reporte de uso teórico vs. real de ingredientes."""
     start, end = parse_date_range(request)
-
-    # Filtramos solo órdenes pagadas en el rango seleccionado
-    items = (
-        OrderItem.objects.filter(
-            order__is_paid=True, order__created_at__range=(start, end)
-        )
-        .select_related(
-            "product",
-        )
-        .values("product__name", "product__dispatch_area__name")
-        .annotate(
-            total_qty=Sum("quantity"),
-            total_sales=Sum(F("quantity") * F("product__price")),
-            price=F("product__price"),
-        )
-        .order_by("product__dispatch_area__name", "product__name")
+    rows = exports.compute_ingredient_variance(start, end)
+    return render(
+        request,
+        "reports/report_variance.html",
+        {"rows": rows, "start": start, "end": end},
     )
 
-    # Total general del rango
-    total_sales = sum((i["total_sales"] or 0) for i in items)
 
-    totals_by_dispatch_area = (
-        OrderItem.objects.filter(
-            order__is_paid=True, order__created_at__range=(start, end)
-        )
-        .values("product__dispatch_area__name")
-        .annotate(
-            area_total_qty=Sum("quantity"),
-            area_total_sales=Sum(F("quantity") * F("product__price")),
-        )
-        .order_by("product__dispatch_area__name")
-    )
+@login_required
+@user_passes_test(user_can_view_inventory)
+def export_variance_csv(request):
+    """Exporta el reporte de uso teórico vs. real a CSV."""
+    return csv_export(request, ReportJob.KIND_VARIANCE)
 
-    context = {
-        "items": items,
-        "total_sales": total_sales,
-        "start": start,
-        "end": end,
-        "totals_by_dispatch_area": totals_by_dispatch_area,
-    }
-    return render(request, "reports/sales_report_by_product.html", context)
+
+# ==========================
+# ⏳ EXPORTACIONES EN SEGUNDO PLANO
+# ==========================
+
+
+def get_report_job(request, job_id):
+    """La exportación ``job_id`` si el usuario puede ver ese reporte; si no, 404."""
+    job = get_object_or_404(ReportJob, id=job_id)
+    if not exports.allowed(job.kind, request.user):
+        raise Http404
+    return job
 
 
 @login_required
-@user_passes_test(user_can_view_sales_report)
-def export_sales_by_product_csv(request):
-    """Exporta el reporte de ventas por producto a CSV."""
-    start, end = parse_date_range(request)
-    items = (
-        OrderItem.objects.filter(
-            order__is_paid=True, order__created_at__range=(start, end)
-        )
-        .select_related("product")
-        .values("product__name", "product__dispatch_area__name")
-        .annotate(
-            total_qty=Sum("quantity"),
-            total_sales=Sum(F("quantity") * F("product__price")),
-            price=F("product__price"),
-        )
-        .order_by("product__dispatch_area__name", "product__name")
+@user_passes_test(has_valid_role)
+def report_job_detail(request, job_id):
+    """Estado de una exportación en segundo plano; la página consulta su avance."""
+    job = get_report_job(request, job_id)
+    start, end = exports.params_range(job.params)
+    report_url = None
+    if exports.EXPORTS[job.kind].get("view"):
+        query = {
+            name: timezone.localtime(value).strftime(dates.INPUT_FORMAT)
+            for name, value in (("start", start), ("end", end))
+        }
+        query["background"] = 1
+        report_url = f"{reverse(exports.EXPORTS[job.kind]['view'])}?{urlencode(query)}"
+    return render(
+        request,
+        "reports/report_job.html",
+        {"job": job, "start": start, "end": end, "report_url": report_url},
     )
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        f'attachment; filename="ventas_por_producto_{datetime.now():%Y%m%d_%H%M}.csv"'
+
+@login_required
+@user_passes_test(has_valid_role)
+def api_report_job(request, job_id):
+    """Avance de una exportación en JSON para la página de estado."""
+    job = get_report_job(request, job_id)
+    return JsonResponse(
+        {
+            "id": job.id,
+            "status": job.status,
+            "status_display": job.get_status_display(),
+            "progress": job.progress,
+            "rows": job.rows,
+            "error": job.error,
+        }
     )
 
-    writer = csv.writer(response)
-    writer.writerow(["Producto", "Precio Unitario", "Cantidad", "Total"])
-    for i in items:
-        writer.writerow(
-            [i["product__name"], i["price"], i["total_qty"], i["total_sales"]]
-        )
 
-    return response
+@login_required
+@user_passes_test(has_valid_role)
+def report_job_download(request, job_id):
+    """Descarga el archivo generado (se sirve con permisos, no desde MEDIA_URL)."""
+    job = get_report_job(request, job_id)
+    if job.status != ReportJob.STATUS_DONE or not job.result:
+        raise Http404
+    content_type = (
+        "application/json" if exports.file_format(job.kind) == "json" else "text/csv"
+    )
+    return FileResponse(
+        job.result.open("rb"),
+        as_attachment=True,
+        filename=os.path.basename(job.result.name),
+        content_type=content_type,
+    )
 
 
 # ==========================
@@ -652,6 +1102,7 @@ def product_create(request):
         category_id = request.POST.get("category") or None
         dispatch_area_id = request.POST.get("dispatch_area") or None
         price = request.POST.get("price")
+        is_available = request.POST.get("is_available") == "on"
 
         if not name or not price:
             messages.error(request, "❌ Nombre y precio son obligatorios.")
@@ -662,6 +1113,7 @@ def product_create(request):
                     category_id=category_id,
                     dispatch_area_id=dispatch_area_id,
                     price=Decimal(price),
+                    is_available=is_available,
                 )
                 messages.success(
                     request, f"✅ Producto '{product.name}' creado exitosamente."
@@ -703,6 +1155,7 @@ def product_edit(request, product_id):
                 product.category_id = category_id
                 product.dispatch_area_id = dispatch_area_id
                 product.price = Decimal(price)
+                product.is_available = request.POST.get("is_available") == "on"
                 product.save()
                 messages.success(
                     request, f"✅ Producto '{product.name}' actualizado exitosamente."
@@ -753,7 +1206,9 @@ def product_delete(request, product_id):
 @user_passes_test(user_can_manage_menu)
 def category_list(request):
     """Lista todas las categorías de productos."""
-    categories = ProductCategory.objects.all().order_by("name")
+    categories = ProductCategory.objects.annotate(
+        product_count=Count("product")
+    ).order_by("name")
     return render(request, "menu/category_list.html", {"categories": categories})
 
 
@@ -844,11 +1299,20 @@ def category_delete(request, category_id):
 # ==========================
 
 
+def parse_printer(request):
+    """Lee host y puerto de la impresora del formulario de área."""
+    host = request.POST.get("printer_host", "").strip()
+    port = request.POST.get("printer_port", "")
+    return host, int(port) if port.isdigit() else 9100
+
+
 @login_required
 @user_passes_test(user_can_manage_menu)
 def dispatch_area_list(request):
     """Lista todas las áreas de despacho."""
-    areas = DispatchArea.objects.all().order_by("name")
+    areas = DispatchArea.objects.annotate(product_count=Count("product")).order_by(
+        "name"
+    )
     return render(request, "menu/dispatch_area_list.html", {"areas": areas})
 
 
@@ -858,6 +1322,7 @@ def dispatch_area_create(request):
     """Crea una nueva área de despacho."""
     if request.method == "POST":
         name = request.POST.get("name")
+        printer_host, printer_port = parse_printer(request)
 
         if not name:
             messages.error(
@@ -865,7 +1330,9 @@ def dispatch_area_create(request):
             )  # noqa: E501
         else:
             try:
-                area = DispatchArea.objects.create(name=name)
+                area = DispatchArea.objects.create(
+                    name=name, printer_host=printer_host, printer_port=printer_port
+                )
                 messages.success(
                     request,
                     f"✅ Área de despacho '{area.name}' creada exitosamente.",
@@ -891,6 +1358,7 @@ def dispatch_area_edit(request, area_id):
 
     if request.method == "POST":
         name = request.POST.get("name")
+        printer_host, printer_port = parse_printer(request)
 
         if not name:
             messages.error(
@@ -899,6 +1367,8 @@ def dispatch_area_edit(request, area_id):
         else:
             try:
                 area.name = name
+                area.printer_host = printer_host
+                area.printer_port = printer_port
                 area.save()
                 messages.success(
                     request,
@@ -1206,6 +1676,38 @@ def company_settings(request):
     return render(request, "settings/company_settings.html", {"company": company})
 
 
+# ==========================
+# ⏱️ RENDIMIENTO
+# ==========================
+
+
+@login_required
+@user_passes_test(is_administrador)
+def performance_report(request):
+    """
+    Tiempos y consultas por ruta (p50/p95/p99) medidos por
+    ``ProfilingMiddleware``. ``?source=log`` lee el archivo de log, que reúne
+    a todos los procesos; por defecto se usa el búfer de este proceso.
+    """
+    source = request.GET.get("source", profiling.SOURCE_MEMORY)
+    if source == profiling.SOURCE_LOG:
+        entries = profiling.read_log()
+    else:
+        source = profiling.SOURCE_MEMORY
+        entries = profiling.recent()
+
+    return render(
+        request,
+        "settings/performance_report.html",
+        {
+            "enabled": settings.PROFILING_ENABLED,
+            "source": source,
+            "sample_size": len(entries),
+            "rows": profiling.summarize(entries),
+        },
+    )
+
+
 # ==========================
 # 📊 DASHBOARD
 # ==========================
@@ -1221,9 +1723,8 @@ def dashboard(request):
                              user_can_view_sales_report)
 
     # Obtener fecha actual
-    today = timezone.now().date()
-    start_of_day = timezone.make_aware(datetime.combine(today, time.min))
-    end_of_day = timezone.make_aware(datetime.combine(today, time.max))
+    today = timezone.localdate()
+    start_of_day, end_of_day = dates.day_range(today)
 
     # Datos disponibles para todos los grupos
     context = {
@@ -1238,7 +1739,8 @@ def dashboard(request):
     if user_can_view_sales_report(request.user):
         # Total ventas hoy
         sales_today = OrderItem.objects.filter(
-            order__is_paid=True, order__created_at__range=(start_of_day, end_of_day)
+            order__is_paid=True,
+            **dates.in_range("order__created_at", start_of_day, end_of_day),
         ).aggregate(total=Sum(F("quantity") * F("product__price")))
         context["sales_today"] = sales_today["total"] or 0
 
@@ -1246,7 +1748,7 @@ def dashboard(request):
         sales_by_area = (
             OrderItem.objects.filter(
                 order__is_paid=True,
-                order__created_at__range=(start_of_day, end_of_day),
+                **dates.in_range("order__created_at", start_of_day, end_of_day),
                 product__dispatch_area__name__isnull=False,
             )
             .values("product__dispatch_area__name")
@@ -1263,25 +1765,32 @@ def dashboard(request):
         context["area_labels"] = area_labels
         context["area_data"] = area_data
 
-        # Ventas últimos 7 días
-        sales_labels = []
-        sales_data = []
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            start = timezone.make_aware(datetime.combine(day, time.min))
-            end = timezone.make_aware(datetime.combine(day, time.max))
-            daily_sales = OrderItem.objects.filter(
-                order__is_paid=True, order__created_at__range=(start, end)
-            ).aggregate(total=Sum(F("quantity") * F("product__price")))
-            sales_labels.append(day.strftime("%d/%m"))
-            sales_data.append(float(daily_sales["total"] or 0))
-        context["sales_labels"] = sales_labels
-        context["sales_data"] = sales_data
+        # Ventas últimos 7 días, agrupadas por día local en una sola consulta
+        days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+        week_start, _ = dates.day_range(days[0])
+        daily_sales = dict(
+            OrderItem.objects.filter(
+                order__is_paid=True,
+                **dates.in_range("order__created_at", week_start, end_of_day),
+            )
+            .annotate(
+                day=TruncDate(
+                    "order__created_at", tzinfo=timezone.get_current_timezone()
+                )
+            )
+            .values("day")
+            .annotate(total=Sum(F("quantity") * F("product__price")))
+            .values_list("day", "total")
+        )
+        context["sales_labels"] = [day.strftime("%d/%m") for day in days]
+        context["sales_data"] = [float(daily_sales.get(day) or 0) for day in days]
 
     # Inventario (si puede ver inventario)
     if user_can_view_inventory(request.user):
         # Ingredientes con stock bajo (menor a 5 unidades)
-        low_stock_qs = Ingredient.objects.filter(stock_quantity__lt=5)
+        low_stock_qs = Ingredient.objects.filter(
+            stock_quantity__lt=metrics.LOW_STOCK_THRESHOLD
+        )
         context["low_stock_count"] = low_stock_qs.count()
 
         # Top 10 ingredientes con menor stock para el gráfico
@@ -1297,14 +1806,16 @@ def dashboard(request):
         context["stock_data"] = stock_data
 
     # Órdenes pendientes (si puede ver órdenes)
-    if request.user.has_perm("orders.view_order"):
+    if user_can_view_orders(request.user):
 
-        pending_orders = Order.objects.filter(is_paid=False).count()
+        pending_orders = Order.objects.filter(is_paid=False, is_void=False).count()
         context["pending_orders"] = pending_orders
 
         # Órdenes pendientes por mesa
         pending_by_table = (
-            Order.objects.filter(is_paid=False, table__name__isnull=False)
+            Order.objects.filter(
+                is_paid=False, is_void=False, table__name__isnull=False
+            )
             .values("table__name")
             .annotate(count=Count("id"))
             .order_by("table__name")
@@ -1325,122 +1836,188 @@ def dashboard(request):
 # ==========================
 
 
+def conditional_on(*tags):
+    """
+    GET condicional a partir del sello de cambios de las etiquetas de caché.
+
+    El ETag y ``Last-Modified`` salen de ``core.caching`` (versiones que las
+    señales suben en cada escritura), así que un catálogo sin cambios
+    responde ``304`` sin consultar sus filas. ``no-cache`` obliga al
+    navegador a revalidar cada vez.
+    """
+
+    def etag(request, *args, **kwargs):
+        return caching.stamp(*tags)
+
+    def last_modified(request, *args, **kwargs):
+        return caching.last_modified(*tags)
+
+    def decorator(view):
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapped
+
+    return decorator
+
+
 @login_required
+@conditional_on(caching.TAG_INGREDIENT, caching.TAG_WAREHOUSE)
 def api_ingredients(request):
     """API endpoint que retorna lista de ingredientes en formato JSON para Grid.js."""
-    ingredients = Ingredient.objects.select_related("warehouse").order_by("name")
-    data = [
-        {
-            "id": i.id,
-            "name": i.name,
-            "unit": i.get_unit_display(),
-            "warehouse": i.warehouse.name if i.warehouse else None,
-            "stock_quantity": float(i.stock_quantity),
-        }
-        for i in ingredients
-    ]
-    return JsonResponse(data, safe=False)
+    units = dict(Ingredient.UNITS)
+    rows = (
+        (pk, name, units.get(unit, unit), warehouse, stock)
+        for pk, name, unit, warehouse, stock in Ingredient.objects.order_by(
+            "name"
+        ).values_list("id", "name", "unit", "warehouse__name", "stock_quantity")
+    )
+    return api.respond(
+        request, ("id", "name", "unit", "warehouse", "stock_quantity"), rows
+    )
+
+
+@login_required
+def api_ingredients_lookup(request):
+    """Autocompletado de ingredientes por prefijo, sin acentos ni mayúsculas."""
+    query = request.GET.get("q", "")
+    if not text_search.normalize(query):
+        return JsonResponse([], safe=False)
+    ingredients = (
+        Ingredient.objects.filter(text_search.prefix_q("search_name", query))
+        .order_by("search_name")
+        .values("id", "name", "unit")[:20]
+    )
+    return JsonResponse(list(ingredients), safe=False)
 
 
 @login_required
+@conditional_on(
+    caching.TAG_PRODUCT, caching.TAG_CATEGORY, caching.TAG_DISPATCH_AREA
+)
 def api_products(request):
     """API endpoint que retorna lista de productos en formato JSON para Grid.js."""
-    products = (
-        Product.objects.select_related("category", "dispatch_area")
-        .order_by("name")
+    rows = Product.objects.order_by("name").values_list(
+        "id", "name", "category__name", "dispatch_area__name", "price"
+    )
+    return api.respond(
+        request, ("id", "name", "category", "dispatch_area", "price"), rows
     )
-    data = [
-        {
-            "id": p.id,
-            "name": p.name,
-            "category": p.category.name if p.category else None,
-            "dispatch_area": p.dispatch_area.name if p.dispatch_area else None,
-            "price": float(p.price),
-        }
-        for p in products
-    ]
-    return JsonResponse(data, safe=False)
 
 
 @login_required
+@condition(etag_func=lambda request: menu.get_version())
+def api_menu(request):
+    """
+    Instantánea del menú para el POS.
+
+    Responde con ETag igual a la versión del menú; si el cliente ya tiene esa
+    versión recibe un ``304`` sin cuerpo.
+    """
+    response = JsonResponse(menu.get_snapshot())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def api_products_lookup(request):
+    """
+    Autocompletado de productos por prefijo, sin distinguir acentos ni
+    mayúsculas (``?q=jamon`` encuentra "Jamón").
+    """
+    query = request.GET.get("q", "")
+    rows = []
+    if text_search.normalize(query):
+        rows = (
+            Product.objects.filter(text_search.prefix_q("search_name", query))
+            .order_by("search_name")
+            .values_list("id", "name", "price")[:20]
+        )
+    return api.respond(request, ("id", "name", "price"), rows)
+
+
+@login_required
+@conditional_on(caching.TAG_CATEGORY)
 def api_categories(request):
     """API endpoint que retorna lista de categorías en formato JSON para Grid.js."""
-    categories = ProductCategory.objects.all().order_by("name")
-    data = [
-        {
-            "id": c.id,
-            "name": c.name,
-        }
-        for c in categories
-    ]
-    return JsonResponse(data, safe=False)
+    rows = ProductCategory.objects.order_by("name").values_list("id", "name")
+    return api.respond(request, ("id", "name"), rows)
 
 
 @login_required
+@conditional_on(caching.TAG_DISPATCH_AREA)
 def api_dispatch_areas(request):
     """API endpoint que retorna lista de áreas de despacho en formato JSON para Grid.js."""
-    areas = DispatchArea.objects.all().order_by("name")
-    data = [
-        {
-            "id": a.id,
-            "name": a.name,
-        }
-        for a in areas
-    ]
-    return JsonResponse(data, safe=False)
+    rows = DispatchArea.objects.order_by("name").values_list("id", "name")
+    return api.respond(request, ("id", "name"), rows)
 
 
 @login_required
+@conditional_on(caching.TAG_TABLE)
 def api_tables(request):
     """API endpoint que retorna lista de mesas en formato JSON para Grid.js."""
-    tables = Table.objects.all().order_by("name")
-    data = [
-        {
-            "id": t.id,
-            "name": t.name,
-        }
-        for t in tables
-    ]
-    return JsonResponse(data, safe=False)
+    rows = Table.objects.order_by("name").values_list("id", "name")
+    return api.respond(request, ("id", "name"), rows)
 
 
 @login_required
+@conditional_on(caching.TAG_ORDER, caching.TAG_TABLE, caching.TAG_PRODUCT)
 def api_orders(request):
-    """API endpoint que retorna lista de órdenes en formato JSON para Grid.js."""
-    orders = (
-        Order.objects.select_related("table", "user")
-        .order_by("-created_at")
-    )
-    data = [
-        {
-            "id": o.id,
-            "table": o.table.name if o.table else None,
-            "user": o.user.username if o.user else None,
-            "created_at": o.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "status": o.get_status_display(),
-            "total": float(o.get_total()),
-        }
-        for o in orders
-    ]
-    return JsonResponse(data, safe=False)
+    """
+    API endpoint que retorna lista de órdenes en formato JSON para Grid.js.
+
+    El total se agrega en la misma consulta, no una consulta por comanda.
+    """
+    return api.respond(request, api.ORDER_COLUMNS, api.order_rows())
 
 
 @login_required
+@conditional_on(caching.TAG_INGREDIENT)
 def api_movements(request):
     """API endpoint que retorna lista de movimientos de inventario en formato JSON."""
-    movements = (
-        IngredientMovement.objects.select_related("ingredient", "user")
-        .order_by("-created_at")
-    )
-    data = [
-        {
-            "id": m.id,
-            "ingredient": m.ingredient.name,
-            "quantity": float(m.quantity),
-            "reason": m.reason or "",
-            "user": m.user.username if m.user else None,
-            "created_at": m.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        for m in movements
-    ]
+    return api.respond(request, api.MOVEMENT_COLUMNS, api.movement_rows())
+
+
+@login_required
+def api_search(request):
+    """
+    API de búsqueda de texto completo sobre movimientos, ingredientes,
+    productos y comandas, ordenada por relevancia.
+    """
+    query = request.GET.get("q", "")
+    kinds = [k for k in request.GET.getlist("kind") if k in text_search.KINDS]
+    try:
+        limit = max(min(int(request.GET.get("limit", 20)), 100), 1)
+    except ValueError:
+        limit = 20
+    results = text_search.search(query, kinds=kinds or None, limit=limit)
+
+    models_by_kind = {
+        text_search.KIND_MOVEMENT: IngredientMovement.objects.select_related(
+            "ingredient"
+        ),
+        text_search.KIND_INGREDIENT: Ingredient.objects.all(),
+        text_search.KIND_PRODUCT: Product.objects.all(),
+        text_search.KIND_ORDER: Order.objects.select_related("table"),
+    }
+    objects = {
+        kind: models_by_kind[kind].in_bulk([pk for k, pk, _ in results if k == kind])
+        for kind in {k for k, _, _ in results}
+    }
+    data = []
+    for kind, pk, score in results:
+        obj = objects[kind].get(pk)
+        if obj is None:
+            continue
+        if kind == text_search.KIND_MOVEMENT:
+            label = f"{obj.ingredient.name}: {obj.reason}"
+        elif kind == text_search.KIND_ORDER:
+            label = f"{obj} — {obj.notes}"
+        else:
+            label = obj.name
+        data.append({"type": kind, "id": pk, "label": label, "score": score})
     return JsonResponse(data, safe=False)
@@ -0,0 +1,116 @@
+/**
+ * Cola de comandas sin conexión.
+ *
+ * Las comandas que no se pueden enviar se guardan en IndexedDB con su token
+ * de cliente y se mandan en lote a `api_orders_sync` al recuperar la
+ * conexión. El servidor responde por comanda:
+ *   - created / duplicate: ya está registrada, se quita de la cola.
+ *   - conflict: no se puede crear tal cual; se conserva con sus errores y no
+ *     se reenvía.
+ */
+(function () {
+    const DB_NAME = 'boa';
+    const STORE = 'pending_orders';
+
+    window.boa = window.boa || {};
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE, { keyPath: 'token' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function withStore(mode, callback) {
+        return openDb().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE, mode);
+            const result = callback(tx.objectStore(STORE));
+            tx.oncomplete = () => resolve(result && result.result !== undefined ? result.result : result);
+            tx.onerror = () => reject(tx.error);
+        }));
+    }
+
+    function csrfToken() {
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function all() {
+        return withStore('readonly', store => store.getAll());
+    }
+
+    /**
+     * Guarda una comanda para enviarla después.
+     * @param {{token: string, table: number, items: Object, notes: string}} order
+     */
+    function enqueue(order) {
+        return withStore('readwrite', store => store.put({ ...order, queuedAt: Date.now() }))
+            .then(updateStatus);
+    }
+
+    let flushing = null;
+
+    /** Envía las comandas pendientes (sin conflicto) en un solo lote. */
+    function flush() {
+        if (flushing || !navigator.onLine || !window.boa.syncUrl) return flushing || Promise.resolve();
+        flushing = all()
+            .then(orders => {
+                const pending = orders.filter(o => !o.errors);
+                if (!pending.length) return null;
+                return fetch(window.boa.syncUrl, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken() },
+                    credentials: 'same-origin',
+                    body: JSON.stringify({
+                        orders: pending.map(({ token, table, items, notes }) => ({ token, table, items, notes })),
+                    }),
+                })
+                    .then(response => (response.ok ? response.json() : null))
+                    .then(data => data && withStore('readwrite', store => {
+                        const byToken = Object.fromEntries(pending.map(o => [o.token, o]));
+                        data.results.forEach(result => {
+                            if (result.status === 'conflict') {
+                                store.put({ ...byToken[result.token], errors: result.errors });
+                            } else {
+                                store.delete(result.token);
+                            }
+                        });
+                    }));
+            })
+            .catch(() => null)
+            .then(updateStatus)
+            .finally(() => { flushing = null; });
+        return flushing;
+    }
+
+    /** Muestra cuántas comandas siguen pendientes o en conflicto. */
+    function updateStatus() {
+        const badge = document.getElementById('offline-status');
+        if (!badge) return Promise.resolve();
+        return all().then(orders => {
+            const conflicts = orders.filter(o => o.errors).length;
+            const pending = orders.length - conflicts;
+            const parts = [];
+            if (!navigator.onLine) parts.push('Sin conexión');
+            if (pending) parts.push(`${pending} comanda(s) por enviar`);
+            if (conflicts) parts.push(`${conflicts} comanda(s) con conflicto`);
+            badge.textContent = parts.join(' · ');
+            badge.hidden = !parts.length;
+            badge.classList.toggle('text-bg-danger', conflicts > 0);
+            badge.classList.toggle('text-bg-warning', conflicts === 0);
+        });
+    }
+
+    window.boa.offlineQueue = { enqueue, flush, all };
+
+    window.addEventListener('online', flush);
+    window.addEventListener('offline', updateStatus);
+    window.addEventListener('load', () => {
+        updateStatus();
+        flush();
+    });
+})();
@@ -0,0 +1,154 @@
+/**
+ * Menú del POS para la creación de comandas.
+ *
+ * El menú se guarda en localStorage junto con su versión. Al abrir una
+ * comanda se muestra de inmediato la copia local y se revalida contra
+ * `api_menu` con `If-None-Match`; si no hubo cambios el servidor responde
+ * 304 sin cuerpo.
+ *
+ * Si no hay conexión al enviar, la comanda se encola con `boa.offlineQueue`.
+ */
+(function () {
+    const STORAGE_KEY = 'boa.menu';
+
+    function readCachedMenu() {
+        try {
+            return JSON.parse(localStorage.getItem(STORAGE_KEY));
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function writeCachedMenu(menu) {
+        try {
+            localStorage.setItem(STORAGE_KEY, JSON.stringify(menu));
+        } catch (e) {
+            // Sin espacio o modo privado: se seguirá pidiendo al servidor.
+        }
+    }
+
+    /**
+     * Devuelve el menú vigente, usando la copia local si sigue siendo válida.
+     * @param {string} url - URL de `api_menu`.
+     * @param {Function} onUpdate - Se llama si llega una versión nueva.
+     * @returns {Object|null} Menú local disponible de inmediato.
+     */
+    function loadMenu(url, onUpdate) {
+        const cached = readCachedMenu();
+        const headers = {};
+        if (cached && cached.version) {
+            headers['If-None-Match'] = `"${cached.version}"`;
+        }
+        fetch(url, { headers, cache: 'no-cache' })
+            .then(response => (response.status === 200 ? response.json() : null))
+            .then(menu => {
+                if (menu) {
+                    writeCachedMenu(menu);
+                    onUpdate(menu);
+                }
+            })
+            .catch(() => {
+                // Sin conexión: se mantiene la copia local.
+            });
+        return cached;
+    }
+
+    function newRequestToken() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    }
+
+    document.addEventListener('alpine:init', () => {
+        Alpine.data('orderForm', (menuUrl, lookupUrl, tableId) => ({
+            showCategory: '',
+            query: '',
+            matches: null,
+            categories: [],
+            products: {},
+            notes: '',
+            submitting: false,
+            queuedMessage: '',
+            // Token por comanda: los reintentos del mismo envío no la duplican.
+            requestToken: newRequestToken(),
+
+            init() {
+                const cached = loadMenu(menuUrl, menu => this.setMenu(menu));
+                if (cached) this.setMenu(cached);
+            },
+
+            setMenu(menu) {
+                const previous = this.products;
+                const products = {};
+                menu.products
+                    .filter(p => p.available)
+                    .forEach(p => {
+                        products[p.id] = {
+                            ...p,
+                            price: Number(p.price),
+                            qty: previous[p.id] ? previous[p.id].qty : 0,
+                        };
+                    });
+                this.categories = menu.categories;
+                this.products = products;
+            },
+
+            visible(product) {
+                return (this.showCategory === '' || this.showCategory === product.category)
+                    && (this.matches === null || this.matches.includes(product.id));
+            },
+
+            async lookup() {
+                if (!this.query.trim()) {
+                    this.matches = null;
+                    return;
+                }
+                const response = await fetch(`${lookupUrl}?q=${encodeURIComponent(this.query)}`);
+                this.matches = (await response.json()).map(p => p.id);
+            },
+
+            categoryName(id) {
+                const category = this.categories.find(c => c.id === id);
+                return category ? category.name : '';
+            },
+
+            get selected() {
+                return Object.values(this.products).filter(p => p.qty > 0);
+            },
+
+            /** Envío compacto `{product_id: cantidad}` solo con lo seleccionado. */
+            get itemsJson() {
+                return JSON.stringify(Object.fromEntries(this.selected.map(p => [p.id, p.qty])));
+            },
+
+            get total() {
+                return this.selected.reduce((sum, p) => sum + p.qty * p.price, 0);
+            },
+
+            /**
+             * Sin conexión la comanda se encola en IndexedDB en lugar de
+             * enviarse; se sincroniza sola al volver la red.
+             */
+            submit(event) {
+                const queue = window.boa && window.boa.offlineQueue;
+                if (navigator.onLine || !queue || !this.selected.length) {
+                    this.submitting = true;
+                    return;
+                }
+                event.preventDefault();
+                queue.enqueue({
+                    token: this.requestToken,
+                    table: tableId,
+                    items: JSON.parse(this.itemsJson),
+                    notes: this.notes,
+                }).then(() => {
+                    this.queuedMessage = 'Sin conexión: la comanda se guardó y se enviará al recuperar la red.';
+                    Object.values(this.products).forEach(p => { p.qty = 0; });
+                    this.notes = '';
+                    this.requestToken = newRequestToken();
+                });
+            },
+        }));
+    });
+})();
@@ -0,0 +1,82 @@
+{% load static %}/**
+ * Service worker del POS (versión {{ version }}).
+ *
+ * - Archivos estáticos y librerías de CDN: primero caché, luego red.
+ * - Páginas: primero red; sin conexión se sirve la última copia guardada
+ *   para que el mesero pueda seguir capturando comandas.
+ * - Las peticiones que no son GET y la API no pasan por la caché: las
+ *   comandas sin conexión se encolan en IndexedDB (ver offline-queue.js).
+ */
+const CACHE_NAME = 'boa-pos-{{ version }}';
+const STATIC_PREFIX = '{% get_static_prefix %}';
+const FALLBACK_PAGE = '{% url "table_list" %}';
+const PRECACHE = [
+    '{% static "js/common.js" %}',
+    '{% static "js/grid.js" %}',
+    '{% static "js/pos-menu.js" %}',
+    '{% static "js/offline-queue.js" %}',
+    '{% static "manifest.json" %}',
+    '{% static "logo192.png" %}',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js',
+    'https://unpkg.com/alpinejs',
+];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then(cache =>
+            // Uno por uno: un recurso caído no debe impedir la instalación.
+            Promise.all(PRECACHE.map(url => cache.add(url).catch(() => null)))
+        ).then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key !== CACHE_NAME).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+function isStatic(url) {
+    return url.origin !== self.location.origin || url.pathname.startsWith(STATIC_PREFIX);
+}
+
+function cacheFirst(request) {
+    return caches.match(request).then(cached => cached || fetch(request).then(response => {
+        if (response.ok || response.type === 'opaque') {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+        }
+        return response;
+    }));
+}
+
+function networkFirst(request) {
+    return fetch(request)
+        .then(response => {
+            if (response.ok) {
+                const copy = response.clone();
+                caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+            }
+            return response;
+        })
+        .catch(() => caches.match(request).then(cached => cached || caches.match(FALLBACK_PAGE)));
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin && url.pathname.startsWith('/api/')) return;
+
+    if (isStatic(url)) {
+        event.respondWith(cacheFirst(request));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request));
+    }
+});
@@ -174,6 +174,35 @@ GROUP_PERMISSIONS = {
     ],
 }
 
+# ==========================
+# 🧮 MATRIZ DE CAPACIDADES (BITS)
+# ==========================
+
+# Cada permiso (``app.codename``) y cada grupo tiene un bit. La máscara de un
+# usuario es el OR de las máscaras de sus grupos, así que verificar un
+# permiso es un ``&`` en lugar de una consulta (ver ``users.utils``).
+
+
+def _full_perm(perm):
+    return f"auth.{perm}" if perm in USER_GROUP_PERMS else f"orders.{perm}"
+
+
+PERMISSION_BITS = {
+    perm: 1 << bit
+    for bit, perm in enumerate(
+        sorted({_full_perm(p) for perms in GROUP_PERMISSIONS.values() for p in perms})
+    )
+}
+GROUP_BITS = {
+    group: 1 << (len(PERMISSION_BITS) + bit) for bit, group in enumerate(ALL_GROUPS)
+}
+ALL_PERMISSIONS_MASK = sum(PERMISSION_BITS.values())
+GROUP_MASKS = {
+    group: GROUP_BITS[group]
+    | sum(PERMISSION_BITS[_full_perm(p)] for p in set(GROUP_PERMISSIONS[group]))
+    for group in ALL_GROUPS
+}
+
 # ==========================
 # 🛠️ FUNCIONES DE UTILIDAD
 # ==========================
@@ -181,16 +210,8 @@ GROUP_PERMISSIONS = {
 
 def get_group_permissions(group_name):
     """Devuelve la lista de permisos (nombres completos) para un grupo."""
-    perms = GROUP_PERMISSIONS.get(group_name, [])
-    # Añadir prefijo 'orders.' para permisos de la app orders
-    # (excepto para permisos de auth)
-    full_perms = []
-    for perm in perms:
-        if perm in USER_GROUP_PERMS:
-            full_perms.append(f"auth.{perm}")
-        else:
-            full_perms.append(f"orders.{perm}")
-    return full_perms
+    # Prefijo 'orders.' para permisos de la app orders (excepto los de auth)
+    return [_full_perm(perm) for perm in GROUP_PERMISSIONS.get(group_name, [])]
 
 
 def create_groups_with_permissions():
@@ -209,12 +230,13 @@ def create_groups_with_permissions():
 
 def user_in_group(user, group_name):
     """Verifica si el usuario pertenece a un grupo específico."""
-    return user.groups.filter(name=group_name).exists()
+    from users.utils import in_groups
+
+    return in_groups(user, group_name)
 
 
 def user_has_permission(user, perm_codename, app_label="orders"):
     """Verifica si el usuario tiene un permiso específico."""
-    if user.is_superuser:
-        return True
-    full_perm = f"{app_label}.{perm_codename}"
-    return user.has_perm(full_perm)
+    from users.utils import has_any_perm
+
+    return has_any_perm(user, f"{app_label}.{perm_codename}")
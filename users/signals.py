@@ -0,0 +1,39 @@
+"""
+Señales de la app users.
+
+Invalidan la máscara de capacidades en caché (``users.utils``) cuando cambian
+los grupos de un usuario o sus banderas (activo, superusuario, staff).
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.utils import invalidate_capabilities
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalida al agregar o quitar grupos, desde el usuario o desde el grupo."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_capabilities(instance.pk)
+    elif action == "pre_clear":
+        invalidate_capabilities(*instance.user_set.values_list("pk", flat=True))
+    elif pk_set:
+        invalidate_capabilities(*pk_set)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_on_permission_change(sender, instance, action, reverse, **kwargs):
+    """Invalida al cambiar los permisos individuales de un usuario."""
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        invalidate_capabilities(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_on_user_change(sender, instance, **kwargs):
+    """Invalida al guardar o eliminar el usuario."""
+    invalidate_capabilities(instance.pk)
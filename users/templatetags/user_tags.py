@@ -5,13 +5,14 @@ Reemplaza a user_extras.py con un enfoque más correcto.
 
 from django import template
 
-from users.permissions import (GROUP_ADMINISTRADOR, GROUP_CAJERO,
-                               GROUP_SUPERVISOR)
+from users.permissions import ALL_GROUPS
 from users.utils import is_admin  # compatibilidad
 from users.utils import is_encargado  # compatibilidad
 from users.utils import is_mesero  # compatibilidad
-from users.utils import (is_administrador, is_cajero, is_cocinero, is_servicio,
-                         is_supervisor)
+from users.utils import (has_any_perm, in_groups, is_administrador,
+                         is_cajero, is_cocinero, is_servicio, is_supervisor,
+                         user_can_manage_menu, user_can_view_inventory,
+                         user_can_view_reports, user_can_view_sales_report)
 
 register = template.Library()
 
@@ -78,37 +79,37 @@ def filter_is_admin(user):
 @register.filter(name="can_view_orders")
 def filter_can_view_orders(user):
     """Verifica si el usuario puede ver órdenes."""
-    return user.has_perm("orders.view_order")
+    return has_any_perm(user, "orders.view_order")
 
 
 @register.filter(name="can_create_orders")
 def filter_can_create_orders(user):
     """Verifica si el usuario puede crear órdenes."""
-    return user.has_perm("orders.add_order")
+    return has_any_perm(user, "orders.add_order")
 
 
 @register.filter(name="can_mark_paid")
 def filter_can_mark_paid(user):
     """Verifica si el usuario puede marcar órdenes como pagadas."""
-    return user.has_perm("orders.change_order")
+    return has_any_perm(user, "orders.change_order")
 
 
 @register.filter(name="can_manage_inventory")
 def filter_can_manage_inventory(user):
     """Verifica si el usuario puede gestionar inventario."""
-    return user.has_perm("orders.change_ingredient")
+    return has_any_perm(user, "orders.change_ingredient")
 
 
 @register.filter(name="can_manage_products")
 def filter_can_manage_products(user):
     """Verifica si el usuario puede gestionar productos."""
-    return user.has_perm("orders.change_product")
+    return has_any_perm(user, "orders.change_product")
 
 
 @register.filter(name="can_manage_users")
 def filter_can_manage_users(user):
     """Verifica si el usuario puede gestionar usuarios."""
-    return user.has_perm("auth.change_user")
+    return has_any_perm(user, "auth.change_user")
 
 
 # ==========================
@@ -122,31 +123,25 @@ def filter_can_manage_menu(user):
     Verifica si el usuario puede gestionar el menú
     (productos, categorías, áreas de despacho).
     """
-    return (
-        user.has_perm("orders.change_product")
-        or user.has_perm("orders.change_productcategory")
-        or user.has_perm("orders.change_dispatcharea")
-    )
+    return user_can_manage_menu(user)
 
 
 @register.filter(name="can_view_inventory")
 def filter_can_view_inventory(user):
     """Verifica si el usuario puede ver inventario."""
-    return user.has_perm("orders.view_ingredient") or user.has_perm(
-        "orders.view_ingredientmovement"
-    )
+    return user_can_view_inventory(user)
 
 
 @register.filter(name="can_add_inventory_movement")
 def filter_can_add_inventory_movement(user):
     """Verifica si el usuario puede registrar movimientos de inventario."""
-    return user.has_perm("orders.add_ingredientmovement")
+    return has_any_perm(user, "orders.add_ingredientmovement")
 
 
 @register.filter(name="can_manage_inventory_full")
 def filter_can_manage_inventory_full(user):
     """Verifica si el usuario puede gestionar inventario (cambiar ingredientes)."""
-    return user.has_perm("orders.change_ingredient")
+    return has_any_perm(user, "orders.change_ingredient")
 
 
 @register.filter(name="can_view_reports")
@@ -155,34 +150,31 @@ def filter_can_view_reports(user):
     Verifica si el usuario puede ver reportes.
     Asume que si puede ver órdenes o productos, puede ver reportes.
     """
-    return user.has_perm("orders.view_order") or user.has_perm("orders.view_product")
+    return user_can_view_reports(user)
 
 
 @register.filter(name="can_view_sales_report")
 def filter_can_view_sales_report(user):
     """Verifica si el usuario puede ver reporte de ventas por producto."""
-    if user.is_superuser:
-        return True
-    allowed_groups = [GROUP_SUPERVISOR, GROUP_ADMINISTRADOR, GROUP_CAJERO]
-    return user.groups.filter(name__in=allowed_groups).exists()
+    return user_can_view_sales_report(user)
 
 
 @register.filter(name="can_view_order_history")
 def filter_can_view_order_history(user):
     """Verifica si el usuario puede ver historial de comandas."""
-    return user.has_perm("orders.view_order")
+    return has_any_perm(user, "orders.view_order")
 
 
 @register.filter(name="can_view_products")
 def filter_can_view_products(user):
     """Verifica si el usuario puede ver productos."""
-    return user.has_perm("orders.view_product")
+    return has_any_perm(user, "orders.view_product")
 
 
 @register.filter(name="can_view_ingredients")
 def filter_can_view_ingredients(user):
     """Verifica si el usuario puede ver ingredientes."""
-    return user.has_perm("orders.view_ingredient")
+    return has_any_perm(user, "orders.view_ingredient")
 
 
 # ==========================
@@ -193,6 +185,8 @@ def filter_can_view_ingredients(user):
 @register.filter(name="has_group")
 def filter_has_group(user, group_name):
     """Verifica si el usuario pertenece a un grupo específico."""
+    if group_name in ALL_GROUPS:
+        return in_groups(user, group_name)
     return user.groups.filter(name=group_name).exists()
 
 
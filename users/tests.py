@@ -1,3 +1,62 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from users.permissions import GROUP_CAJERO
+from users.utils import CAPABILITIES_KEY, has_valid_role, user_can_mark_paid
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class CapabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashier = Group.objects.get_or_create(name=GROUP_CAJERO)[0]
+        cls.user = User.objects.create_user("caja", password="x")
+        cls.user.groups.add(cls.cashier)
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        """El usuario como lo carga otra petición (sin la máscara memorizada)."""
+        return User.objects.get(pk=self.user.pk)
+
+    def test_removing_group_revokes_on_next_request(self):
+        self.assertTrue(user_can_mark_paid(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.cashier)
+
+        self.assertFalse(user_can_mark_paid(self.fresh_user()))
+        self.assertFalse(has_valid_role(self.fresh_user()))
+
+    def test_removing_user_from_group_side_revokes(self):
+        self.assertTrue(has_valid_role(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cashier.user_set.clear()
+
+        self.assertFalse(has_valid_role(self.fresh_user()))
+
+    def test_deactivating_user_revokes(self):
+        self.assertTrue(user_can_mark_paid(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.fresh_user()
+            user.is_active = False
+            user.save()
+
+        self.assertFalse(user_can_mark_paid(self.fresh_user()))
+
+    def test_mask_is_shared_through_the_cache(self):
+        user_can_mark_paid(self.fresh_user())
+        self.assertIsNotNone(cache.get(CAPABILITIES_KEY.format(user_id=self.user.pk)))
+
+    @override_settings(CACHES=LOCMEM)
+    def test_mask_is_not_cached_in_a_process_local_cache(self):
+        self.assertTrue(user_can_mark_paid(self.fresh_user()))
+        self.assertIsNone(cache.get(CAPABILITIES_KEY.format(user_id=self.user.pk)))
+
+        self.user.groups.remove(self.cashier)
+        self.assertFalse(user_can_mark_paid(self.fresh_user()))
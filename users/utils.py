@@ -1,10 +1,106 @@
 """
 Utilidades para gestión de usuarios, roles y permisos.
+
+Las verificaciones no consultan la base de datos en cada llamada: la máscara
+de capacidades del usuario (``users.permissions.GROUP_MASKS``) se calcula una
+vez, se guarda en la caché compartida y se memoriza en el objeto ``user`` de
+la petición. ``users/signals.py`` la invalida cuando cambian sus grupos o el
+propio usuario.
+
+Con una caché local al proceso (``locmem``) la máscara no se guarda: la
+invalidación solo llegaría al proceso que hizo el cambio y los demás
+seguirían concediendo un permiso revocado.
 """
 
-from users.permissions import (GROUP_ADMINISTRADOR, GROUP_CAJERO,
-                               GROUP_COCINERO, GROUP_SERVICIO,
-                               GROUP_SUPERVISOR)
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from core import caching
+from users.permissions import (ALL_GROUPS, ALL_PERMISSIONS_MASK,
+                               GROUP_ADMINISTRADOR, GROUP_BITS, GROUP_CAJERO,
+                               GROUP_COCINERO, GROUP_MASKS, GROUP_SERVICIO,
+                               GROUP_SUPERVISOR, PERMISSION_BITS)
+
+CAPABILITIES_KEY = "users:capabilities:{user_id}"
+CAPABILITIES_TIMEOUT = 60 * 60
+
+# ==========================
+# 🧮 CAPACIDADES EN CACHÉ
+# ==========================
+
+
+def _compute_capabilities(user):
+    mask = 0
+    for name in user.groups.values_list("name", flat=True):
+        mask |= GROUP_MASKS.get(name, 0)
+    for app_label, codename in user.user_permissions.values_list(
+        "content_type__app_label", "codename"
+    ):
+        mask |= PERMISSION_BITS.get(f"{app_label}.{codename}", 0)
+    if user.is_superuser:
+        mask |= ALL_PERMISSIONS_MASK
+    if not user.is_active:
+        # Igual que ``has_perm``: un usuario inactivo no tiene permisos.
+        mask &= ~ALL_PERMISSIONS_MASK
+    return mask
+
+
+def get_capabilities(user):
+    """Devuelve la máscara de bits de grupos y permisos del usuario."""
+    if not user.is_authenticated:
+        return 0
+    mask = getattr(user, "_capabilities", None)
+    if mask is None:
+        if isinstance(caches["default"], LocMemCache):
+            mask = _compute_capabilities(user)
+        else:
+            mask = caching.cached(
+                CAPABILITIES_KEY.format(user_id=user.pk),
+                lambda: _compute_capabilities(user),
+                timeout=CAPABILITIES_TIMEOUT,
+            )
+        user._capabilities = mask
+    return mask
+
+
+def invalidate_capabilities(*user_ids):
+    """
+    Descarta la máscara en caché de los usuarios indicados.
+
+    Se borra de nuevo al confirmar la transacción: otra petición pudo volver
+    a calcularla con los grupos anteriores mientras el cambio no era visible.
+    """
+    keys = [CAPABILITIES_KEY.format(user_id=pk) for pk in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def has_any_perm(user, *perms):
+    """
+    Verifica si el usuario tiene alguno de los permisos (``app.codename``).
+
+    Los permisos fuera de la matriz de ``GROUP_PERMISSIONS`` se delegan a
+    ``user.has_perm``.
+    """
+    wanted = 0
+    for perm in perms:
+        bit = PERMISSION_BITS.get(perm)
+        if bit is None:
+            if user.has_perm(perm):
+                return True
+        else:
+            wanted |= bit
+    return bool(get_capabilities(user) & wanted)
+
+
+def in_groups(user, *groups):
+    """Verifica si el usuario pertenece a alguno de los grupos."""
+    wanted = 0
+    for group in groups:
+        wanted |= GROUP_BITS[group]
+    return bool(get_capabilities(user) & wanted)
+
 
 # ==========================
 # 🔍 VERIFICACIÓN DE GRUPOS
@@ -15,35 +111,35 @@ def is_servicio(user):
     """Verifica si el usuario pertenece al grupo Servicio."""
     if user.is_superuser:
         return True
-    return user.groups.filter(name=GROUP_SERVICIO).exists()
+    return in_groups(user, GROUP_SERVICIO)
 
 
 def is_supervisor(user):
     """Verifica si el usuario pertenece al grupo Supervisor."""
     if user.is_superuser:
         return True
-    return user.groups.filter(name=GROUP_SUPERVISOR).exists()
+    return in_groups(user, GROUP_SUPERVISOR)
 
 
 def is_administrador(user):
     """Verifica si el usuario pertenece al grupo Administrador."""
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name=GROUP_ADMINISTRADOR).exists()
+    return in_groups(user, GROUP_ADMINISTRADOR)
 
 
 def is_cocinero(user):
     """Verifica si el usuario pertenece al grupo Cocinero."""
     if user.is_superuser:
         return True
-    return user.groups.filter(name=GROUP_COCINERO).exists()
+    return in_groups(user, GROUP_COCINERO)
 
 
 def is_cajero(user):
     """Verifica si el usuario pertenece al grupo Cajero."""
     if user.is_superuser:
         return True
-    return user.groups.filter(name=GROUP_CAJERO).exists()
+    return in_groups(user, GROUP_CAJERO)
 
 
 # Funciones de compatibilidad (mantener para vistas existentes)
@@ -56,9 +152,7 @@ def is_encargado(user):
     """Compatibilidad: alias de is_supervisor, is_administrador o is_cajero."""
     if user.is_superuser:
         return True
-    return user.groups.filter(
-        name__in=[GROUP_SUPERVISOR, GROUP_ADMINISTRADOR, GROUP_CAJERO]
-    ).exists()
+    return in_groups(user, GROUP_SUPERVISOR, GROUP_ADMINISTRADOR, GROUP_CAJERO)
 
 
 def is_admin(user):
@@ -78,83 +172,81 @@ def has_valid_role(user):
     """
     if user.is_superuser:
         return True
-    valid_groups = [
-        GROUP_SERVICIO,
-        GROUP_SUPERVISOR,
-        GROUP_ADMINISTRADOR,
-        GROUP_COCINERO,
-        GROUP_CAJERO,
-    ]
-    return user.groups.filter(name__in=valid_groups).exists()
+    return in_groups(user, *ALL_GROUPS)
 
 
 def user_can_view_orders(user):
     """Verifica si el usuario puede ver órdenes."""
-    return user.has_perm("orders.view_order")
+    return has_any_perm(user, "orders.view_order")
 
 
 def user_can_create_orders(user):
     """Verifica si el usuario puede crear órdenes."""
-    return user.has_perm("orders.add_order")
+    return has_any_perm(user, "orders.add_order")
 
 
 def user_can_mark_paid(user):
     """Verifica si el usuario puede marcar órdenes como pagadas."""
-    return user.has_perm("orders.change_order")
+    return has_any_perm(user, "orders.change_order")
+
+
+def user_can_void_orders(user):
+    """Verifica si el usuario puede modificar líneas o anular comandas."""
+    return has_any_perm(user, "orders.delete_orderitem")
 
 
 def user_can_manage_inventory(user):
     """Verifica si el usuario puede gestionar inventario."""
-    return user.has_perm("orders.change_ingredient")
+    return has_any_perm(user, "orders.change_ingredient")
 
 
 def user_can_manage_products(user):
     """Verifica si el usuario puede gestionar productos."""
-    return user.has_perm("orders.change_product")
+    return has_any_perm(user, "orders.change_product")
 
 
 def user_can_manage_users(user):
     """Verifica si el usuario puede gestionar usuarios."""
-    return user.has_perm("auth.change_user")
+    return has_any_perm(user, "auth.change_user")
 
 
 def user_can_manage_menu(user):
     """Verifica si el usuario puede gestionar el menú (productos, categorías, áreas)."""
-    return (
-        user.has_perm("orders.change_product")
-        or user.has_perm("orders.change_productcategory")
-        or user.has_perm("orders.change_dispatcharea")
+    return has_any_perm(
+        user,
+        "orders.change_product",
+        "orders.change_productcategory",
+        "orders.change_dispatcharea",
     )
 
 
 def user_can_view_inventory(user):
     """Verifica si el usuario puede ver inventario."""
-    return user.has_perm("orders.view_ingredient") or user.has_perm(
-        "orders.view_ingredientmovement"
+    return has_any_perm(
+        user, "orders.view_ingredient", "orders.view_ingredientmovement"
     )
 
 
 def user_can_add_inventory_movement(user):
     """Verifica si el usuario puede registrar movimientos de inventario."""
-    return user.has_perm("orders.add_ingredientmovement")
+    return has_any_perm(user, "orders.add_ingredientmovement")
 
 
 def user_can_manage_inventory_full(user):
     """Verifica si el usuario puede gestionar inventario completamente."""
-    return user.has_perm("orders.change_ingredient")
+    return has_any_perm(user, "orders.change_ingredient")
 
 
 def user_can_view_reports(user):
     """Verifica si el usuario puede ver reportes."""
-    return user.has_perm("orders.view_order") or user.has_perm("orders.view_product")
+    return has_any_perm(user, "orders.view_order", "orders.view_product")
 
 
 def user_can_view_sales_report(user):
     """Verifica si el usuario puede ver reporte de ventas por producto."""
     if user.is_superuser:
         return True
-    allowed_groups = [GROUP_SUPERVISOR, GROUP_ADMINISTRADOR, GROUP_CAJERO]
-    return user.groups.filter(name__in=allowed_groups).exists()
+    return in_groups(user, GROUP_SUPERVISOR, GROUP_ADMINISTRADOR, GROUP_CAJERO)
 
 
 # ==========================